@@ -11,35 +11,71 @@ Strategy (in order, each one only runs if the previous one fails):
   1. yt-dlp Python API, anonymous - primary path for videos/reels.
   2. yt-dlp Python API, with cookies - only if a cookie file is configured AND
      tier 1 actually failed (many FB videos require a logged-in session).
-  3. yt-dlp CLI with --impersonate chrome, anonymous.
-  4. yt-dlp CLI with --impersonate chrome, with cookies.
+  3. yt-dlp with chrome impersonation (in-process, worker pool), anonymous.
+  4. yt-dlp with chrome impersonation (in-process, worker pool), with cookies.
   5. gallery-dl, anonymous - fallback for photo posts.
   6. gallery-dl, with cookies - final fallback.
+
+Before any of that, the post is pre-classified as "photo" or "video" -
+from the URL shape (/videos/, /reel/, /photo/...) or the page's OpenGraph
+tags as served to Facebook's own link-preview crawler. Photo posts then
+go to gallery-dl first, video posts run the yt-dlp tiers first - the other
+family still follows, in case the guess was wrong - and anything that
+can't be classified runs the full cascade in the order above.
+
+Links whose cascade failed for a terminal reason (deleted, private, login
+wall, geo-block) are remembered for a while by failure_cache.py, so
+repeat requests fail immediately instead of re-running every tier.
 """
 
-from typing import Optional, Union, Dict, List
+from typing import Callable, Optional, Dict, List, Tuple
 from urllib.parse import urlparse, urlunparse
 import os
-import subprocess
+import re
+import threading
 import yt_dlp
 import requests
 
 from Logic.utils.path import generate_target_dir
-
+from Logic.utils.media_result import MediaResult, scan_media, apply_ytdlp_info
+from Logic.utils.ytdlp_runner import run_ytdlp_impersonated_sync
+from Logic.utils.gallery_dl_runner import run_gallery_dl_sync
+from Logic.utils.failure_cache import get_known_failure, remember_failure
+from Logic.utils.tier_cascade import TierSkipped, run_tiers
+from Logic.utils.cookie_manager import get_cookie_pool
+
+# One cookies.txt, several comma-separated, or a directory of them (cookie_manager.py).
 FACEBOOK_COOKIES: Optional[str] = os.getenv("Facebook_cookies")
+_cookies = get_cookie_pool("facebook", FACEBOOK_COOKIES)
 
 USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"
 
-VALID_VIDEO_EXTENSIONS = (".mp4", ".mov", ".webm", ".avi")
-VALID_IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".webp", ".heic")
-VALID_MEDIA_EXTENSIONS = VALID_VIDEO_EXTENSIONS + VALID_IMAGE_EXTENSIONS
-
 REQUEST_TIMEOUT = 30
 GALLERY_DL_TIMEOUT = 60
 
+# Circuit breakers for the extractors this module drives (circuit_breaker.py).
+GALLERY_DL_BREAKER = "gallery-dl:facebook"
+YTDLP_BREAKER = "yt-dlp:facebook"
+IMPERSONATE_BREAKER = "yt-dlp-impersonate:facebook"
+
+# Pre-classification lookup - it only decides tier order, so give up fast
+# and never read more of the page than the <head> needs.
+CLASSIFY_TIMEOUT = 5
+CLASSIFY_MAX_BYTES = 512 * 1024
+# Facebook serves full OpenGraph tags (og:video etc.) to its own crawler.
+CRAWLER_USER_AGENT = "facebookexternalhit/1.1 (+http://www.facebook.com/externalhit_uatext.php)"
+
+VIDEO_PATH_MARKERS = ("/videos/", "/video.php", "/reel/", "/reels/", "/watch", "/share/v/", "/share/r/")
+PHOTO_PATH_MARKERS = ("/photo/", "/photo.php", "/photos/")
+
+_OG_TAG_RE = re.compile(
+    r'<meta[^>]+property=["\']og:(video|video:url|video:secure_url|image)["\'][^>]+content=["\']([^"\']+)',
+    re.IGNORECASE,
+)
+
 
 def _has_cookies() -> bool:
-    return bool(FACEBOOK_COOKIES) and os.path.isfile(FACEBOOK_COOKIES)
+    return _cookies.available()
 
 
 def _log(message: str, verbose: bool = False) -> None:
@@ -72,7 +108,56 @@ def _resolve_url(url: str, verbose: bool = False) -> str:
     return _clean_url(url)
 
 
-def _build_ydl_opts(target_dir: str, verbose: bool, use_cookies: bool = False) -> Dict:
+def _classify_content(url: str, verbose: bool = False) -> str:
+    """
+    Cheap guess at what a post contains: "photo", "video" or "unknown".
+
+    URL shape first (free), then one short GET of the page's OpenGraph
+    tags. A post image has to come from the scontent CDN to count - the
+    login wall page carries a generic static.xx.fbcdn.net logo as og:image.
+    Any failure is just "unknown", which keeps the full cascade.
+    """
+    path = urlparse(url).path.lower() + ("/watch" if "fb.watch" in url else "")
+    if any(marker in path for marker in VIDEO_PATH_MARKERS):
+        return "video"
+    if any(marker in path for marker in PHOTO_PATH_MARKERS):
+        return "photo"
+
+    try:
+        with requests.get(
+            url,
+            headers={"User-Agent": CRAWLER_USER_AGENT},
+            timeout=CLASSIFY_TIMEOUT,
+            stream=True,
+        ) as response:
+            response.raise_for_status()
+            head = b""
+            for chunk in response.iter_content(chunk_size=16384):
+                head += chunk
+                if b"</head>" in head or len(head) >= CLASSIFY_MAX_BYTES:
+                    break
+    except Exception as exc:
+        _log(f"[Facebook] Could not pre-classify post ({exc}) — running full cascade.", verbose)
+        return "unknown"
+
+    tags = _OG_TAG_RE.findall(head.decode("utf-8", errors="ignore"))
+    if any(prop.startswith("video") for prop, _ in tags):
+        return "video"
+    if any(prop == "image" and "scontent" in content for prop, content in tags):
+        return "photo"
+    return "unknown"
+
+
+def _order_tiers(tiers: List[Tuple[str, str, str, Callable]], kind: str) -> List[Tuple[str, str, str, Callable]]:
+    """Tiers of the classified kind's family first, the rest after - a wrong
+    guess only costs time, never the download. Unknown: the cascade as
+    listed."""
+    if kind in ("photo", "video"):
+        return [t for t in tiers if t[1] == kind] + [t for t in tiers if t[1] != kind]
+    return tiers
+
+
+def _build_ydl_opts(target_dir: str, verbose: bool, cookiefile: Optional[str] = None) -> Dict:
     opts: Dict = {
         "outtmpl": os.path.join(target_dir, "media_%(autonumber)03d.%(ext)s"),
         "quiet": not verbose,
@@ -85,168 +170,173 @@ def _build_ydl_opts(target_dir: str, verbose: bool, use_cookies: bool = False) -
         "socket_timeout": 15,
     }
 
-    if use_cookies and _has_cookies():
-        opts["cookiefile"] = FACEBOOK_COOKIES
+    if cookiefile:
+        opts["cookiefile"] = cookiefile
 
     return opts
 
 
-def _collect_media_files(target_dir: str) -> List[str]:
-    return [f for f in os.listdir(target_dir) if f.lower().endswith(VALID_MEDIA_EXTENSIONS)]
-
-
-def _download_video_cli(url: str, target_dir: str, verbose: bool = False, use_cookies: bool = False) -> Optional[str]:
+def _download_video_impersonated(
+    url: str,
+    target_dir: str,
+    verbose: bool = False,
+    use_cookies: bool = False,
+    errors: Optional[List[str]] = None,
+    cancel: Optional[threading.Event] = None,
+) -> Optional[MediaResult]:
     outtmpl = os.path.join(target_dir, "media_%(autonumber)03d.%(ext)s")
+    cookiefile = _cookies.acquire() if use_cookies else None
+    if use_cookies and not cookiefile:
+        raise TierSkipped("no usable cookie file")
 
-    cmd = [
-        "yt-dlp",
-        "--impersonate", "chrome",
-        "--format", "bestvideo*+bestaudio/best",
-        "--format-sort", "res,fps,tbr",
-        "--merge-output-format", "mp4",
-        "--output", outtmpl,
-        "--no-playlist",
-    ]
-    if use_cookies and _has_cookies():
-        cmd += ["--cookies", FACEBOOK_COOKIES]
-    cmd.append(url)
+    _log(f"[Facebook] Running impersonated yt-dlp ({'with cookies' if use_cookies else 'anonymous'}): {url}", verbose)
 
-    _log(f"[Facebook] Running CLI ({'with cookies' if use_cookies else 'anonymous'}): {' '.join(cmd)}", verbose)
+    error = run_ytdlp_impersonated_sync(url, outtmpl, cookiefile=cookiefile, cancel=cancel)
+    if error:
+        _log(f"[Facebook] Impersonated yt-dlp error: {error}", verbose)
+        if errors is not None:
+            errors.append(error)
 
-    try:
-        subprocess.run(cmd, capture_output=not verbose, text=True, timeout=120)
-    except subprocess.TimeoutExpired:
-        _log("[Facebook] yt-dlp CLI timed out after 120s", verbose)
-    except FileNotFoundError:
-        _log("[Facebook] yt-dlp CLI not found — is it installed?", verbose)
-        return None
-    except Exception as exc:
-        _log(f"[Facebook] yt-dlp CLI error: {exc}", verbose)
-
-    files = _collect_media_files(target_dir)
-    if not files:
-        return None
-    if len(files) > 1:
-        _log(f"[Facebook] ✅ CLI downloaded {len(files)} files → {target_dir}", verbose)
-        return target_dir
-
-    file_path = os.path.join(target_dir, files[0])
-    _log(f"[Facebook] ✅ CLI downloaded: {file_path}", verbose)
-    return file_path
-
-
-def _download_gallery_dl(url: str, target_dir: str, verbose: bool = False, use_cookies: bool = False) -> List[str]:
-    cmd = [
-        "gallery-dl",
-        "--dest", target_dir,
-        "-o", "filename={num:>03}_{filename}.{extension}",
-        "--no-mtime",
-    ]
-    if use_cookies and _has_cookies():
-        cmd += ["--cookies", FACEBOOK_COOKIES]
-    cmd.append(url)
-
-    _log(f"[Facebook] Running gallery-dl ({'with cookies' if use_cookies else 'anonymous'}): {' '.join(cmd)}", verbose)
-
-    try:
-        subprocess.run(cmd, capture_output=not verbose, text=True, timeout=GALLERY_DL_TIMEOUT)
-    except subprocess.TimeoutExpired:
-        _log("[Facebook] gallery-dl timed out", verbose)
-    except FileNotFoundError:
-        _log("[Facebook] gallery-dl not found — is it installed?", verbose)
-        return []
-    except Exception as exc:
-        _log(f"[Facebook] gallery-dl error: {exc}", verbose)
-
-    return _collect_media_files(target_dir)
-
-
-def _finalize(target_dir: str, verbose: bool) -> Optional[Union[str, Dict]]:
-    files = _collect_media_files(target_dir)
-    if not files:
+    result = _finalize(target_dir, verbose)
+    _cookies.report(cookiefile, bool(result), [error] if error else [])
+    return result
+
+
+def _download_gallery_dl(
+    url: str,
+    target_dir: str,
+    verbose: bool = False,
+    use_cookies: bool = False,
+    errors: Optional[List[str]] = None,
+    cancel: Optional[threading.Event] = None,
+) -> Optional[MediaResult]:
+    cookies = _cookies.acquire() if use_cookies else None
+    if use_cookies and not cookies:
+        raise TierSkipped("no usable cookie file")
+
+    _log(f"[Facebook] Running gallery-dl ({'with cookies' if use_cookies else 'anonymous'}): {url}", verbose)
+
+    result = run_gallery_dl_sync(
+        url,
+        target_dir,
+        cookies=cookies,
+        options={"filename": "{num:>03}_{filename}.{extension}"},
+        timeout=GALLERY_DL_TIMEOUT,
+        cancel=cancel,
+    )
+    if result.status != 0:
+        _log(f"[Facebook] gallery-dl failed (status {result.status}): {'; '.join(result.errors)}", verbose)
+        if errors is not None:
+            errors.extend(result.errors)
+
+    media = _finalize(target_dir, verbose)
+    _cookies.report(cookies, bool(media), result.errors)
+    return media
+
+
+def _finalize(target_dir: str, verbose: bool, info: Optional[Dict] = None) -> Optional[MediaResult]:
+    result = scan_media(target_dir)
+    if not result:
         return None
+    _log(f"[Facebook] ✅ Downloaded {len(result.items)} file(s) → {result.path}", verbose)
+    return apply_ytdlp_info(result, info)
 
-    if len(files) > 1:
-        _log(f"[Facebook] ✅ Downloaded {len(files)} files → {target_dir}", verbose)
-        return {
-            "type": "carousel",
-            "file_count": len(files),
-            "files": [os.path.join(target_dir, f) for f in files],
-            "path": target_dir,
-        }
 
-    file_path = os.path.join(target_dir, files[0])
-    _log(f"[Facebook] ✅ Downloaded: {file_path}", verbose)
-    return file_path
-
-
-def download_facebook(url: str, verbose: bool = False) -> Optional[Union[str, Dict]]:
+def download_facebook(
+    url: str,
+    verbose: bool = False,
+    cancel: Optional[threading.Event] = None,
+) -> Optional[MediaResult]:
     """
     Download a Facebook video/reel or photo post at the highest available quality.
 
     Returns:
-        str  — path to the video file (or directory, for multi-file output)
-        dict — carousel metadata (files, path, etc.)
-        None — every download strategy failed
+        MediaResult — the downloaded file(s), see media_result.py
+        None        — every download strategy failed (or cancel was set:
+                      the running tier's job is killed, no further tier
+                      is tried and nothing is cached as a failure)
     """
     _log(f"[Facebook] Processing URL: {url}", verbose)
 
     url = _resolve_url(url, verbose)
 
+    known_failure = get_known_failure("facebook", url)
+    if known_failure:
+        _log(f"[Facebook] ❌ Known dead link ({known_failure}) — skipping all tiers.", verbose)
+        return None
+
     target_dir = generate_target_dir("facebook")
     os.makedirs(target_dir, exist_ok=True)
     _log(f"[Facebook] Target directory: {target_dir}", verbose)
 
-    # Tier 1: yt-dlp Python API, anonymous (best for FB video/reels)
-    _log("[Facebook] Trying yt-dlp (Python API, anonymous)...", verbose)
-    try:
-        with yt_dlp.YoutubeDL(_build_ydl_opts(target_dir, verbose, use_cookies=False)) as ydl:
-            ydl.download([url])
-    except Exception as exc:
-        _log(f"[Facebook] yt-dlp Python API (anonymous) error: {exc}", verbose)
-
-    result = _finalize(target_dir, verbose)
-    if result:
-        return result
-
-    # Tier 2: yt-dlp Python API, with cookies - only reached if tier 1 failed
-    if _has_cookies():
-        _log("[Facebook] Retrying yt-dlp (Python API, with cookies)...", verbose)
-        try:
-            with yt_dlp.YoutubeDL(_build_ydl_opts(target_dir, verbose, use_cookies=True)) as ydl:
-                ydl.download([url])
-        except Exception as exc:
-            _log(f"[Facebook] yt-dlp Python API (with cookies) error: {exc}", verbose)
-
-        result = _finalize(target_dir, verbose)
-        if result:
+    kind = _classify_content(url, verbose)
+    errors: List[str] = []
+    _log(f"[Facebook] Pre-classified as: {kind}", verbose)
+
+    def ytdlp_tier(use_cookies: bool):
+        def run():
+            cookiefile = _cookies.acquire() if use_cookies else None
+            if use_cookies and not cookiefile:
+                raise TierSkipped("no usable cookie file")
+            tier_errors_from = len(errors)
+            info = None
+            try:
+                with yt_dlp.YoutubeDL(_build_ydl_opts(target_dir, verbose, cookiefile=cookiefile)) as ydl:
+                    info = ydl.extract_info(url, download=True)
+            except Exception as exc:
+                errors.append(str(exc))
+                _log(f"[Facebook] yt-dlp Python API ({'with cookies' if use_cookies else 'anonymous'}) error: {exc}", verbose)
+            result = _finalize(target_dir, verbose, info)
+            _cookies.report(cookiefile, bool(result), errors[tier_errors_from:])
             return result
+        return run
 
-    # Tier 3: CLI with impersonation, anonymous
-    _log("[Facebook] Trying yt-dlp CLI with impersonation (anonymous)...", verbose)
-    result = _download_video_cli(url, target_dir, verbose, use_cookies=False)
-    if result:
-        return result
+    def impersonated_tier(use_cookies: bool):
+        return lambda: _download_video_impersonated(
+            url, target_dir, verbose, use_cookies=use_cookies, errors=errors, cancel=cancel
+        )
 
-    # Tier 4: CLI with impersonation, with cookies
+    def gallery_dl_tier(use_cookies: bool):
+        def run():
+            return _download_gallery_dl(
+                url, target_dir, verbose, use_cookies=use_cookies, errors=errors, cancel=cancel
+            )
+        return run
+
+    # (label, family, breaker, tier) in full-cascade order. Cookie tiers are
+    # only listed when a cookie file is configured, and only run after their
+    # anonymous counterpart has already failed. Tiers sharing an extractor
+    # share its circuit breaker.
+    tiers = [
+        # Tier 1: yt-dlp Python API, anonymous (best for FB video/reels)
+        ("yt-dlp (Python API, anonymous)", "video", YTDLP_BREAKER, ytdlp_tier(False)),
+    ]
     if _has_cookies():
-        _log("[Facebook] Trying yt-dlp CLI with impersonation (with cookies)...", verbose)
-        result = _download_video_cli(url, target_dir, verbose, use_cookies=True)
-        if result:
-            return result
-
+        # Tier 2: yt-dlp Python API, with cookies
+        tiers.append(("yt-dlp (Python API, with cookies)", "video", YTDLP_BREAKER, ytdlp_tier(True)))
+    # Tier 3: impersonated yt-dlp (worker pool), anonymous
+    tiers.append(("impersonated yt-dlp (anonymous)", "video", IMPERSONATE_BREAKER, impersonated_tier(False)))
+    if _has_cookies():
+        # Tier 4: impersonated yt-dlp (worker pool), with cookies
+        tiers.append(("impersonated yt-dlp (with cookies)", "video", IMPERSONATE_BREAKER, impersonated_tier(True)))
     # Tier 5: gallery-dl, anonymous - fallback for photo-only posts
-    _log("[Facebook] Trying gallery-dl (anonymous)...", verbose)
-    files = _download_gallery_dl(url, target_dir, verbose, use_cookies=False)
-    if files:
-        return _finalize(target_dir, verbose)
-
-    # Tier 6: gallery-dl, with cookies - final fallback
+    tiers.append(("gallery-dl (anonymous)", "photo", GALLERY_DL_BREAKER, gallery_dl_tier(False)))
     if _has_cookies():
-        _log("[Facebook] Retrying gallery-dl (with cookies)...", verbose)
-        files = _download_gallery_dl(url, target_dir, verbose, use_cookies=True)
-        if files:
-            return _finalize(target_dir, verbose)
+        # Tier 6: gallery-dl, with cookies - final fallback
+        tiers.append(("gallery-dl (with cookies)", "photo", GALLERY_DL_BREAKER, gallery_dl_tier(True)))
+
+    result = run_tiers(
+        [(label, breaker_name, tier) for label, _family, breaker_name, tier in _order_tiers(tiers, kind)],
+        errors,
+        lambda message: _log(f"[Facebook] {message}", verbose),
+        cancel,
+    )
+    if result or (cancel is not None and cancel.is_set()):
+        return result
 
-    _log("[Facebook] ❌ All download strategies failed.", verbose)
+    failure = remember_failure("facebook", url, errors)
+    if failure:
+        _log(f"[Facebook] ❌ All download strategies failed ({failure}) — caching as a dead link.", verbose)
+    else:
+        _log("[Facebook] ❌ All download strategies failed.", verbose)
     return None
@@ -9,17 +9,28 @@ Strategy (in order, each only runs if the previous one fails):
      needed for content Instagram gates behind a login wall, and for
      stories/highlights.
   3. yt-dlp - different extractor entirely, last resort.
+
+Profile and highlight metadata (instaloader) is cached per username for a
+few minutes and shared across users, so the profile menu flow - search,
+details, highlights - costs one upstream lookup instead of three.
 """
 
 import os
-import shutil
+import time
 import asyncio
 import logging
 import instaloader
 import yt_dlp
-from typing import Optional, Dict, List
+from typing import Optional, Dict, List, NamedTuple, AsyncIterator, Tuple
 
 from Logic.utils.path import generate_target_dir
+from Logic.utils.media_result import MediaResult, scan_media, apply_ytdlp_info
+from Logic.utils.gallery_dl_runner import run_gallery_dl
+from Logic.utils.ttl_cache import TTLCache
+from Logic.utils.story_archive import gallery_dl_archive_options
+from Logic.utils.failure_cache import is_transient_failure
+from Logic.utils.circuit_breaker import get_breaker
+from Logic.utils.cookie_manager import get_cookie_pool
 
 logger = logging.getLogger(__name__)
 
@@ -28,10 +39,14 @@ logger = logging.getLogger(__name__)
 # NOTE: INSTA_COOKIES must be a Netscape/Mozilla format cookies.txt exported
 # from a logged-in browser session (e.g. "Get cookies.txt LOCALLY" extension).
 # An instaloader session file will NOT work here - gallery-dl and yt-dlp both
-# expect the Netscape cookie jar format.
+# expect the Netscape cookie jar format. Several comma-separated files, or a
+# directory of them, are rotated between (cookie_manager.py).
 INSTA_COOKIES: Optional[str] = os.getenv("Insta_cookies")
+_cookies = get_cookie_pool("instagram", INSTA_COOKIES)
 INSTA_USERNAME: Optional[str] = os.getenv("Insta_username")
 INSTA_PASSWORD = os.getenv("Insta_password")
+# Where the instaloader session is saved after a successful login.
+INSTA_SESSION_FILE: str = os.getenv("Insta_session_file", "data/insta_session")
 
 USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"
 MOBILE_USER_AGENT = (
@@ -39,30 +54,135 @@ MOBILE_USER_AGENT = (
     "Samsung; SM-G930F; herolte; samsungexynos8890; en_US)"
 )
 
-GALLERY_DL_BIN = shutil.which("gallery-dl") or "gallery-dl"
+# How long profile/highlight metadata stays cached, in seconds. Not-found and
+# private results are cached for the shorter negative TTL, so a profile that
+# gets created or made public shows up again reasonably soon.
+METADATA_CACHE_TTL_S = int(os.getenv("INSTA_METADATA_CACHE_TTL", "600"))
+METADATA_NEGATIVE_TTL_S = int(os.getenv("INSTA_METADATA_NEGATIVE_TTL", "120"))
+
+# "Download all highlights" fetches highlights as separate jobs, at most this
+# many at once - each one is a gallery-dl job in the shared worker pool.
+HIGHLIGHT_CONCURRENCY = int(os.getenv("INSTA_HIGHLIGHT_CONCURRENCY", "3"))
+
+METADATA_MAX_RETRIES = 3
+# After a failed Instagram login, lookups run anonymously and the login is
+# only tried again this many seconds later - retrying on every lookup is a
+# quick way to get the account checkpointed.
+LOGIN_RETRY_S = int(os.getenv("INSTA_LOGIN_RETRY_S", "600"))
+METADATA_RETRY_DELAY_S = 2
+
+# Circuit breaker for the gallery-dl tiers (circuit_breaker.py).
+GALLERY_DL_BREAKER = "gallery-dl:instagram"
 
 
 def _has_session() -> bool:
-    """True only if a cookie file path is actually set AND exists on disk."""
-    return bool(INSTA_COOKIES) and os.path.exists(INSTA_COOKIES)
+    """True only if at least one usable (not benched) cookie jar exists on disk."""
+    return _cookies.available()
+
+
+# --- Instaloader client (profile/highlight metadata lookups only) ---
+#
+# Built lazily in a background task rather than at import time, so a slow or
+# rate-limited Instagram login never holds up bot startup. The logged-in
+# session is persisted to INSTA_SESSION_FILE, so restarts reuse it instead of
+# logging in again - after checking Instagram still accepts it.
 
+_client: Optional[instaloader.Instaloader] = None
+_client_task: Optional[asyncio.Task] = None
+# Anonymous stand-in while a failed login waits for its retry.
+_fallback_client: Optional[instaloader.Instaloader] = None
+_retry_login_at = 0.0
 
-# Initialize Instaloader API (kept for profile/highlight metadata lookups only)
-L = instaloader.Instaloader(max_connection_attempts=1)
-L.context.user_agent = MOBILE_USER_AGENT
 
+def _new_client() -> instaloader.Instaloader:
+    client = instaloader.Instaloader(max_connection_attempts=1)
+    client.context.user_agent = MOBILE_USER_AGENT
+    return client
 
-if INSTA_USERNAME and INSTA_PASSWORD:
+
+def _session_is_valid(client: instaloader.Instaloader) -> bool:
     try:
-        L.login(INSTA_USERNAME, INSTA_PASSWORD)
-        logger.info("[Instagram] Successfully logged in with credentials.")
+        return bool(client.test_login())
     except Exception as e:
-        logger.error(f"[Instagram] Login failed: {e}")
-elif _has_session():
+        logger.warning(f"[Instagram] Could not check saved session: {e}")
+        return False
+
+
+def _build_client_sync() -> Tuple[instaloader.Instaloader, bool]:
+    """The client, and whether it is logged in as configured (True if no
+    login is configured at all)."""
+    client = _new_client()
+
+    if INSTA_USERNAME and os.path.exists(INSTA_SESSION_FILE):
+        try:
+            client.load_session_from_file(INSTA_USERNAME, filename=INSTA_SESSION_FILE)
+            if _session_is_valid(client):
+                logger.info("[Instagram] Reusing saved session.")
+                return client, True
+            logger.warning("[Instagram] Saved session expired, logging in again.")
+        except Exception as e:
+            logger.warning(f"[Instagram] Saved session unusable, logging in again: {e}")
+        client = _new_client()
+
+    if INSTA_USERNAME and INSTA_PASSWORD:
+        try:
+            client.login(INSTA_USERNAME, INSTA_PASSWORD)
+            logger.info("[Instagram] Successfully logged in with credentials.")
+        except Exception as e:
+            logger.error(f"[Instagram] Login failed: {e}")
+            return _new_client(), False
+        try:
+            os.makedirs(os.path.dirname(INSTA_SESSION_FILE) or ".", exist_ok=True)
+            client.save_session_to_file(filename=INSTA_SESSION_FILE)
+        except Exception as e:
+            logger.warning(f"[Instagram] Could not save session file: {e}")
+    elif _has_session():
+        try:
+            client.load_session_from_file(INSTA_USERNAME or "", filename=_cookies.acquire())
+        except Exception as e:
+            logger.warning(f"[Instagram] Failed to load session file: {e}")
+            return _new_client(), False
+
+    return client, True
+
+
+async def _init_client() -> instaloader.Instaloader:
+    global _client, _client_task, _fallback_client, _retry_login_at
+    client, logged_in = await asyncio.to_thread(_build_client_sync)
+    if logged_in:
+        _client, _fallback_client = client, None
+    else:
+        # Not kept: serve lookups anonymously until the login is retried.
+        _fallback_client = client
+        _retry_login_at = time.monotonic() + LOGIN_RETRY_S
+        _client_task = None
+    return client
+
+
+def start_instagram_client() -> None:
+    """Start building the Instaloader client in the background. Safe to call
+    more than once; call from the bot's startup handler to get the login out
+    of the way before the first profile lookup."""
+    global _client_task
+    if _client is None and _client_task is None:
+        _client_task = asyncio.create_task(_init_client())
+
+
+async def _get_client() -> instaloader.Instaloader:
+    global _client_task
+    if _client is not None:
+        return _client
+    if _fallback_client is not None and time.monotonic() < _retry_login_at:
+        return _fallback_client
+    start_instagram_client()
+    task = _client_task
     try:
-        L.load_session_from_file(INSTA_USERNAME or "", filename=INSTA_COOKIES)
-    except Exception as e:
-        logger.warning(f"[Instagram] Failed to load session file: {e}")
+        return await asyncio.shield(task)
+    except Exception:
+        if _client_task is task:
+            _client_task = None  # let the next lookup try again
+        raise
+
 
 # --- gallery-dl tier ---
 
@@ -70,63 +190,44 @@ async def _run_gallery_dl(
     url: str,
     target_dir: str,
     use_cookies: bool,
-    extra_opts: Optional[list] = None,
-) -> Optional[str]:
+    options: Optional[Dict] = None,
+) -> Optional[MediaResult]:
     os.makedirs(target_dir, exist_ok=True)
 
-    command = [GALLERY_DL_BIN, "-D", target_dir, "--no-mtime"]
-
-    if use_cookies and _has_session():
-        command += ["--cookies", INSTA_COOKIES]
+    cookies = _cookies.acquire() if use_cookies else None
+    if use_cookies and not cookies:
+        return None
 
-    if extra_opts:
-        command += extra_opts
+    breaker = get_breaker(GALLERY_DL_BREAKER)
+    if not breaker.allow():
+        logger.info(f"[Instagram] Skipping gallery-dl — {GALLERY_DL_BREAKER} circuit is open.")
+        return None
 
-    command.append(url)
+    logger.info(f"[Instagram] gallery-dl ({'cookies' if use_cookies else 'anonymous'}): {url}")
 
-    logger.info(f"[Instagram] gallery-dl ({'cookies' if use_cookies else 'anonymous'}): {' '.join(command)}")
+    result = await run_gallery_dl(url, target_dir, cookies=cookies, options=options, timeout=120.0)
 
-    try:
-        process = await asyncio.create_subprocess_exec(
-            *command,
-            stdout=asyncio.subprocess.PIPE,
-            stderr=asyncio.subprocess.PIPE,
-        )
+    breaker.record(result.status == 0 or not is_transient_failure(result.errors))
+    _cookies.report(cookies, result.status == 0, result.errors)
 
-        try:
-            stdout, stderr = await asyncio.wait_for(process.communicate(), timeout=120.0)
-        except asyncio.TimeoutError:
-            process.kill()
-            logger.warning("[Instagram] gallery-dl timed out after 120 seconds")
-            return None
-
-        if process.returncode != 0:
-            error_msg = stderr.decode().strip()
-            logger.info(f"[Instagram] gallery-dl failed (code {process.returncode}): {error_msg}")
-            return None
-
-        files = [f for f in os.listdir(target_dir) if not f.startswith(".")] if os.path.exists(target_dir) else []
-        if files:
-            logger.info(f"[Instagram] gallery-dl downloaded {len(files)} file(s)")
-            return target_dir
+    if result.status != 0:
+        logger.info(f"[Instagram] gallery-dl failed (status {result.status}): {'; '.join(result.errors)}")
         return None
 
-    except FileNotFoundError:
-        logger.error("[Instagram] gallery-dl binary not found - pip install gallery-dl")
-        return None
-    except Exception as e:
-        logger.error(f"[Instagram] gallery-dl exception: {e}")
-        return None
+    media = scan_media(target_dir)
+    if media:
+        logger.info(f"[Instagram] gallery-dl downloaded {len(media.items)} file(s)")
+    return media
 
 
 # --- yt-dlp tier (last resort) ---
 
-def _ydl_download_sync(url: str, opts: Dict) -> None:
+def _ydl_download_sync(url: str, opts: Dict) -> Optional[Dict]:
     with yt_dlp.YoutubeDL(opts) as ydl:
-        ydl.download([url])
+        return ydl.extract_info(url, download=True)
 
 
-async def _try_yt_dlp(url: str, target_dir: str) -> Optional[str]:
+async def _try_yt_dlp(url: str, target_dir: str) -> Optional[MediaResult]:
     os.makedirs(target_dir, exist_ok=True)
 
     opts: Dict = {
@@ -136,24 +237,26 @@ async def _try_yt_dlp(url: str, target_dir: str) -> Optional[str]:
         "user_agent": USER_AGENT,
         "noplaylist": True,
     }
-    if _has_session():
-        opts["cookiefile"] = INSTA_COOKIES
+    cookiefile = _cookies.acquire()
+    if cookiefile:
+        opts["cookiefile"] = cookiefile
 
     try:
         logger.info("[Instagram] yt-dlp fallback tier...")
-        await asyncio.to_thread(_ydl_download_sync, url, opts)
+        info = await asyncio.to_thread(_ydl_download_sync, url, opts)
     except Exception as e:
         logger.info(f"[Instagram] yt-dlp fallback failed: {e}")
+        _cookies.report(cookiefile, False, [str(e)])
         return None
 
-    files = [f for f in os.listdir(target_dir) if not f.startswith(".")]
-    if files:
-        logger.info(f"[Instagram] yt-dlp downloaded {len(files)} file(s)")
-        return target_dir
-    return None
+    media = apply_ytdlp_info(scan_media(target_dir), info)
+    _cookies.report(cookiefile, bool(media))
+    if media:
+        logger.info(f"[Instagram] yt-dlp downloaded {len(media.items)} file(s)")
+    return media
 
 
-async def _download_with_fallback_chain(target_dir: str, url: str) -> Optional[str]:
+async def _download_with_fallback_chain(target_dir: str, url: str) -> Optional[MediaResult]:
     """Shared tiered logic used by both posts and reels."""
     # Tier 1: anonymous gallery-dl - works for most public content
     result = await _run_gallery_dl(url, target_dir, use_cookies=False)
@@ -172,43 +275,53 @@ async def _download_with_fallback_chain(target_dir: str, url: str) -> Optional[s
 
 # --- Core Functions ---
 
-async def download_insta_post(url: str) -> Optional[str]:
+async def download_insta_post(url: str) -> Optional[MediaResult]:
     target_dir = generate_target_dir("insta_post")
     return await _download_with_fallback_chain(target_dir, url)
 
 
-async def download_insta_reel(url: str) -> Optional[str]:
+async def download_insta_reel(url: str) -> Optional[MediaResult]:
     target_dir = generate_target_dir("insta_reel")
     return await _download_with_fallback_chain(target_dir, url)
 
 
-async def download_insta_story(username: str) -> Optional[str]:
+async def download_insta_story(username: str, chat_id: Optional[int] = None) -> Optional[MediaResult]:
     """Download stories for a username. Stories require a logged-in session by
-    nature (they're not public), so this always needs cookies configured."""
+    nature (they're not public), so this always needs cookies configured.
+
+    With chat_id, only stories not yet sent to that chat are downloaded (see
+    story_archive.py) - returns None if there is nothing new."""
     if not _has_session():
         logger.warning("[Instagram] Stories require a cookies.txt file - none configured")
         return None
     target_dir = generate_target_dir(f"story_{username}")
     url = f"https://www.instagram.com/stories/{username}/"
-    return await _run_gallery_dl(url, target_dir, use_cookies=True)
+    options = await gallery_dl_archive_options(chat_id, username) if chat_id is not None else None
+    return await _run_gallery_dl(url, target_dir, use_cookies=True, options=options)
 
 
-async def download_insta_highlight(username: str, highlight_id: Optional[int] = None) -> Optional[str]:
+async def download_insta_highlight(
+    username: str,
+    highlight_id: Optional[int] = None,
+    target_dir: Optional[str] = None,
+) -> Optional[MediaResult]:
     """
     Download highlights for a username.
 
     Args:
         username: Instagram username
         highlight_id: Specific highlight index (int), None for all highlights
+        target_dir: Download directory; generated if not given. Pass one to
+            watch files arrive while the download is still running.
 
     Returns:
-        Path to downloaded content or None
+        MediaResult of the downloaded content or None
     """
     if not _has_session():
         logger.warning("[Instagram] Highlights require a cookies.txt file - none configured")
         return None
 
-    target_dir = generate_target_dir(f"highlight_{username}")
+    target_dir = target_dir or generate_target_dir(f"highlight_{username}")
 
     if highlight_id is not None:
         url = f"https://www.instagram.com/stories/highlights/{highlight_id}/"
@@ -216,75 +329,151 @@ async def download_insta_highlight(username: str, highlight_id: Optional[int] =
     else:
         url = f"https://www.instagram.com/{username}/"
         return await _run_gallery_dl(
-            url, target_dir, use_cookies=True, extra_opts=["-o", "include=highlights"]
+            url, target_dir, use_cookies=True, options={"include": "highlights"}
         )
 
 
+async def iter_highlight_downloads(
+    username: str,
+    highlights: List[Dict],
+    concurrency: int = HIGHLIGHT_CONCURRENCY,
+) -> AsyncIterator[Tuple[Dict, Optional[MediaResult]]]:
+    """
+    Download several highlights concurrently (bounded by `concurrency`) and
+    yield (highlight, result) for each one as soon as it finishes, fastest
+    first - result is None if that highlight failed.
+
+    highlights are the dicts returned by get_profile_highlights(). Any
+    downloads still running when the caller stops iterating are cancelled.
+    """
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    async def _one(hl: Dict) -> Tuple[Dict, Optional[MediaResult]]:
+        async with semaphore:
+            try:
+                return hl, await download_insta_highlight(username, hl["index"])
+            except Exception as e:
+                logger.error(f"[Instagram] Highlight {hl['index']} of @{username} failed: {e}")
+                return hl, None
+
+    tasks = [asyncio.create_task(_one(hl)) for hl in highlights]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
 # --- Metadata Functions ---
 
-async def search_instagram_profile(username: str) -> Optional[Dict]:
-    max_retries = 3
-    for attempt in range(max_retries):
+class _CachedProfile(NamedTuple):
+    profile: instaloader.Profile
+    summary: Dict
+
+
+# Keyed by lowercased username; None means "no such profile".
+_profile_cache = TTLCache(METADATA_CACHE_TTL_S, METADATA_NEGATIVE_TTL_S)
+# Keyed by lowercased username; None means "private / login required", []
+# no highlights or no such profile - both only cached for the negative TTL.
+_highlights_cache = TTLCache(METADATA_CACHE_TTL_S, METADATA_NEGATIVE_TTL_S)
+
+
+def _fetch_profile_sync(client: instaloader.Instaloader, username: str) -> _CachedProfile:
+    profile = instaloader.Profile.from_username(client.context, username)
+    summary = {
+        'username': profile.username,
+        'full_name': profile.full_name,
+        'biography': profile.biography,
+        'followers': profile.followers,
+        'following': profile.followees,
+        'posts_count': profile.mediacount,
+        'is_private': profile.is_private,
+        'is_verified': profile.is_verified,
+        'profile_pic_url': profile.profile_pic_url,
+        'userid': profile.userid,
+    }
+    return _CachedProfile(profile, summary)
+
+
+async def _load_profile(username: str) -> Optional[_CachedProfile]:
+    """Upstream lookup with retries. Returns None if the profile doesn't
+    exist; raises if Instagram kept failing, so the failure isn't cached."""
+    client = await _get_client()
+    for attempt in range(METADATA_MAX_RETRIES):
         try:
-            profile = await asyncio.to_thread(instaloader.Profile.from_username, L.context, username)
-            return {
-                'username': profile.username,
-                'full_name': profile.full_name,
-                'biography': profile.biography,
-                'followers': profile.followers,
-                'following': profile.followees,
-                'posts_count': profile.mediacount,
-                'is_private': profile.is_private,
-                'is_verified': profile.is_verified,
-                'profile_pic_url': profile.profile_pic_url,
-                'userid': profile.userid,
-            }
-        except Exception as e:
-            if attempt < max_retries - 1:
-                logger.info(f"[Instagram] Retry {attempt + 1}/{max_retries} for profile search")
-                await asyncio.sleep(2)
-                continue
-            logger.error(f"[Instagram] Profile search failed: {e}")
+            return await asyncio.to_thread(_fetch_profile_sync, client, username)
+        except instaloader.exceptions.ProfileNotExistsException:
+            logger.info(f"[Instagram] Profile @{username} does not exist")
             return None
+        except Exception:
+            if attempt < METADATA_MAX_RETRIES - 1:
+                logger.info(f"[Instagram] Retry {attempt + 1}/{METADATA_MAX_RETRIES} for profile lookup")
+                await asyncio.sleep(METADATA_RETRY_DELAY_S)
+                continue
+            raise
     return None
 
 
-async def get_profile_highlights(username: str) -> Optional[List[Dict]]:
-    """
-    Get list of highlights for a profile.
+async def _get_profile(username: str) -> Optional[_CachedProfile]:
+    return await _profile_cache.get_or_load(username.lower(), lambda: _load_profile(username))
+
+
+async def search_instagram_profile(username: str) -> Optional[Dict]:
+    try:
+        cached = await _get_profile(username)
+    except Exception as e:
+        logger.error(f"[Instagram] Profile search failed: {e}")
+        return None
+    return dict(cached.summary) if cached else None
 
-    Returns:
-        List of highlight dicts, empty list if none found, None if profile is private/error
-    """
-    max_retries = 3
-    for attempt in range(max_retries):
-        try:
-            profile = await asyncio.to_thread(instaloader.Profile.from_username, L.context, username)
 
-            if profile.is_private:
-                logger.info(f"[Instagram] Profile @{username} is private")
-                return None
+async def _load_highlights(username: str) -> Optional[List[Dict]]:
+    cached = await _get_profile(username)
+    if cached is None:
+        return []
 
-            highlights = []
-            hls = await asyncio.to_thread(list, L.get_highlights(profile))
+    if cached.profile.is_private:
+        logger.info(f"[Instagram] Profile @{username} is private")
+        return None
 
-            for hl in hls:
-                highlights.append({
+    client = await _get_client()
+    for attempt in range(METADATA_MAX_RETRIES):
+        try:
+            hls = await asyncio.to_thread(list, client.get_highlights(cached.profile))
+            return [
+                {
                     'index': hl.unique_id,
                     'title': hl.title,
                     'item_count': hl.itemcount,
-                })
-
-            return highlights
-
+                }
+                for hl in hls
+            ]
         except instaloader.exceptions.LoginRequiredException:
             logger.info(f"[Instagram] Login required to view @{username} highlights")
             return None
-        except Exception as e:
-            if attempt < max_retries - 1:
-                logger.info(f"[Instagram] Retry {attempt + 1}/{max_retries} for highlights fetch")
-                await asyncio.sleep(2)
+        except Exception:
+            if attempt < METADATA_MAX_RETRIES - 1:
+                logger.info(f"[Instagram] Retry {attempt + 1}/{METADATA_MAX_RETRIES} for highlights fetch")
+                await asyncio.sleep(METADATA_RETRY_DELAY_S)
                 continue
-            logger.error(f"[Instagram] Highlights fetch failed: {e}")
-            return []
-    return []
\ No newline at end of file
+            raise
+    return []
+
+
+async def get_profile_highlights(username: str) -> Optional[List[Dict]]:
+    """
+    Get list of highlights for a profile.
+
+    Returns:
+        List of highlight dicts (copies - safe to modify), empty list if
+        none found, None if profile is private/error
+    """
+    try:
+        highlights = await _highlights_cache.get_or_load(
+            username.lower(), lambda: _load_highlights(username), miss=lambda hls: not hls
+        )
+    except Exception as e:
+        logger.error(f"[Instagram] Highlights fetch failed: {e}")
+        return []
+    return [dict(hl) for hl in highlights] if highlights is not None else None
\ No newline at end of file
@@ -12,14 +12,18 @@ Strategy (in order, each only runs if the previous one fails):
 
 import os
 import re
-import shutil
 import asyncio
 import logging
-from typing import Optional, Dict
+from typing import Optional, Dict, Tuple
 
 import yt_dlp
 
 from Logic.utils.path import generate_target_dir
+from Logic.utils.media_result import MediaResult, scan_media, apply_ytdlp_info
+from Logic.utils.gallery_dl_runner import run_gallery_dl
+from Logic.utils.failure_cache import is_transient_failure
+from Logic.utils.circuit_breaker import get_breaker
+from Logic.utils.cookie_manager import get_cookie_pool
 
 logger = logging.getLogger(__name__)
 
@@ -27,19 +31,24 @@ logger = logging.getLogger(__name__)
 
 # NOTE: PIN_COOKIES must be a Netscape/Mozilla format cookies.txt exported
 # from a logged-in browser session. Only needed for private boards/pins.
+# Several comma-separated files, or a directory of them, are rotated
+# between (cookie_manager.py).
 PIN_COOKIES: Optional[str] = os.getenv("Pinterest_cookies")
+_cookies = get_cookie_pool("pinterest", PIN_COOKIES)
 USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"
 
-GALLERY_DL_BIN = shutil.which("gallery-dl") or "gallery-dl"
-
 # Boards/profiles can run into the thousands of pins - cap to keep runtime
-# and Telegram media-group uploads sane.
+# and Telegram media-group uploads sane. This is also the page size when
+# browsing further into a board ("next 30").
 MAX_GALLERY_ITEMS = 30
 
+# Circuit breaker for the gallery-dl tiers (circuit_breaker.py).
+GALLERY_DL_BREAKER = "gallery-dl:pinterest"
+
 
 def _has_cookies() -> bool:
-    """True only if a cookie file path is actually set AND exists on disk."""
-    return bool(PIN_COOKIES) and os.path.exists(PIN_COOKIES)
+    """True only if at least one usable (not benched) cookie jar exists on disk."""
+    return _cookies.available()
 
 
 def classify_pinterest_url(url: str) -> str:
@@ -79,63 +88,45 @@ async def _run_gallery_dl(
     url: str,
     target_dir: str,
     use_cookies: bool,
-    extra_opts: Optional[list] = None,
-) -> Optional[str]:
+    file_range: Optional[str] = None,
+) -> Tuple[Optional[MediaResult], int]:
+    """(downloaded media or None, files gallery-dl went for)."""
     os.makedirs(target_dir, exist_ok=True)
 
-    command = [GALLERY_DL_BIN, "-D", target_dir, "--no-mtime"]
+    cookies = _cookies.acquire() if use_cookies else None
+    if use_cookies and not cookies:
+        return None, 0
 
-    if use_cookies and _has_cookies():
-        command += ["--cookies", PIN_COOKIES]
+    breaker = get_breaker(GALLERY_DL_BREAKER)
+    if not breaker.allow():
+        logger.info(f"[Pinterest] Skipping gallery-dl — {GALLERY_DL_BREAKER} circuit is open.")
+        return None, 0
 
-    if extra_opts:
-        command += extra_opts
+    logger.info(f"[Pinterest] gallery-dl ({'cookies' if use_cookies else 'anonymous'}): {url}")
 
-    command.append(url)
+    result = await run_gallery_dl(url, target_dir, cookies=cookies, file_range=file_range, timeout=180.0)
 
-    logger.info(f"[Pinterest] gallery-dl ({'cookies' if use_cookies else 'anonymous'}): {' '.join(command)}")
+    breaker.record(result.status == 0 or not is_transient_failure(result.errors))
+    _cookies.report(cookies, result.status == 0, result.errors)
 
-    try:
-        process = await asyncio.create_subprocess_exec(
-            *command,
-            stdout=asyncio.subprocess.PIPE,
-            stderr=asyncio.subprocess.PIPE,
-        )
-
-        try:
-            stdout, stderr = await asyncio.wait_for(process.communicate(), timeout=180.0)
-        except asyncio.TimeoutError:
-            process.kill()
-            logger.warning("[Pinterest] gallery-dl timed out after 180 seconds")
-            return None
-
-        if process.returncode != 0:
-            error_msg = stderr.decode().strip()
-            logger.info(f"[Pinterest] gallery-dl failed (code {process.returncode}): {error_msg}")
-            return None
-
-        files = [f for f in os.listdir(target_dir) if not f.startswith(".")] if os.path.exists(target_dir) else []
-        if files:
-            logger.info(f"[Pinterest] gallery-dl downloaded {len(files)} file(s)")
-            return target_dir
-        return None
+    if result.status != 0:
+        logger.info(f"[Pinterest] gallery-dl failed (status {result.status}): {'; '.join(result.errors)}")
+        return None, result.handled
 
-    except FileNotFoundError:
-        logger.error("[Pinterest] gallery-dl binary not found - pip install gallery-dl")
-        return None
-    except Exception as e:
-        logger.error(f"[Pinterest] gallery-dl exception: {e}")
-        return None
+    media = scan_media(target_dir)
+    if media:
+        logger.info(f"[Pinterest] gallery-dl downloaded {len(media.items)} file(s)")
+    return media, result.handled
 
 
 # --- yt-dlp tier (video pins only, last resort) ---
 
-def _ydl_download_sync(url: str, opts: Dict) -> None:
+def _ydl_download_sync(url: str, opts: Dict) -> Optional[Dict]:
     with yt_dlp.YoutubeDL(opts) as ydl:
-        ydl.download([url])
+        return ydl.extract_info(url, download=True)
 
 
-async def _try_yt_dlp(url: str, target_dir: str) -> Optional[str]:
+async def _try_yt_dlp(url: str, target_dir: str) -> Optional[MediaResult]:
     os.makedirs(target_dir, exist_ok=True)
 
     opts: Dict = {
@@ -145,21 +136,23 @@ async def _try_yt_dlp(url: str, target_dir: str) -> Optional[str]:
         "user_agent": USER_AGENT,
         "noplaylist": True,
     }
-    if _has_cookies():
-        opts["cookiefile"] = PIN_COOKIES
+    cookiefile = _cookies.acquire()
+    if cookiefile:
+        opts["cookiefile"] = cookiefile
 
     try:
         logger.info("[Pinterest] yt-dlp fallback tier...")
-        await asyncio.to_thread(_ydl_download_sync, url, opts)
+        info = await asyncio.to_thread(_ydl_download_sync, url, opts)
     except Exception as e:
         logger.info(f"[Pinterest] yt-dlp fallback failed: {e}")
+        _cookies.report(cookiefile, False, [str(e)])
         return None
 
-    files = [f for f in os.listdir(target_dir) if not f.startswith(".")]
-    if files:
-        logger.info(f"[Pinterest] yt-dlp downloaded {len(files)} file(s)")
-        return target_dir
-    return None
+    media = apply_ytdlp_info(scan_media(target_dir), info)
+    _cookies.report(cookiefile, bool(media))
+    if media:
+        logger.info(f"[Pinterest] yt-dlp downloaded {len(media.items)} file(s)")
+    return media
 
 
 # --- Shared fallback chain ---
@@ -167,19 +160,27 @@ async def _try_yt_dlp(url: str, target_dir: str) -> Optional[str]:
 async def _download_with_fallback_chain(
     target_dir: str,
     url: str,
-    extra_opts: Optional[list] = None,
+    file_range: Optional[str] = None,
     allow_ytdlp: bool = True,
-) -> Optional[str]:
+) -> Optional[MediaResult]:
+    """With a file_range, the result's page_items is how many pins that
+    range held - and a page where only some pins failed still returns
+    the ones that downloaded."""
     # Tier 1: anonymous gallery-dl - works for the vast majority of public content
-    result = await _run_gallery_dl(url, target_dir, use_cookies=False, extra_opts=extra_opts)
-    if result:
-        return result
+    result, handled = await _run_gallery_dl(url, target_dir, use_cookies=False, file_range=file_range)
 
     # Tier 2: gallery-dl with cookies, if we have one - for private/gated content
-    if _has_cookies():
-        result = await _run_gallery_dl(url, target_dir, use_cookies=True, extra_opts=extra_opts)
+    if not result and _has_cookies():
+        result, handled_with_cookies = await _run_gallery_dl(url, target_dir, use_cookies=True, file_range=file_range)
+        handled = max(handled, handled_with_cookies)
+
+    if file_range:
+        result = result or scan_media(target_dir)
         if result:
-            return result
+            result.page_items = handled
+        return result
+    if result:
+        return result
 
     # Tier 3: yt-dlp - only useful for single video pins, last resort
     if allow_ytdlp:
@@ -190,27 +191,47 @@ async def _download_with_fallback_chain(
 
 # --- Core Functions ---
 
-async def download_pinterest_pin(url: str) -> Optional[str]:
+async def download_pinterest_pin(url: str) -> Optional[MediaResult]:
     """Download a single pin - covers both image and video pins."""
     target_dir = generate_target_dir("pinterest_pin")
     return await _download_with_fallback_chain(target_dir, url, allow_ytdlp=True)
 
 
-async def download_pinterest_board(url: str) -> Optional[str]:
-    """Download a board (or board section) as a gallery of images/videos."""
-    target_dir = generate_target_dir("pinterest_board")
-    extra_opts = ["--range", f"1-{MAX_GALLERY_ITEMS}"]
-    return await _download_with_fallback_chain(target_dir, url, extra_opts=extra_opts, allow_ytdlp=False)
+def _page_range(start: int) -> str:
+    """gallery-dl --range for the page of MAX_GALLERY_ITEMS pins at start (1-based)."""
+    return f"{start}-{start + MAX_GALLERY_ITEMS - 1}"
 
 
-async def download_pinterest_profile(url: str) -> Optional[str]:
-    """Download a user's public pins as a gallery."""
-    target_dir = generate_target_dir("pinterest_profile")
-    extra_opts = ["--range", f"1-{MAX_GALLERY_ITEMS}"]
-    return await _download_with_fallback_chain(target_dir, url, extra_opts=extra_opts, allow_ytdlp=False)
+async def download_pinterest_board(
+    url: str,
+    target_dir: Optional[str] = None,
+    start: int = 1,
+) -> Optional[MediaResult]:
+    """Download a board (or board section) as a gallery of images/videos.
+
+    Fetches one page of MAX_GALLERY_ITEMS pins beginning at pin number
+    `start`, so later pages never re-download earlier ones. Pass target_dir
+    to know where files land before the download finishes (used by the
+    uploader's pipelined mode)."""
+    target_dir = target_dir or generate_target_dir("pinterest_board")
+    return await _download_with_fallback_chain(
+        target_dir, url, file_range=_page_range(start), allow_ytdlp=False
+    )
+
+
+async def download_pinterest_profile(
+    url: str,
+    target_dir: Optional[str] = None,
+    start: int = 1,
+) -> Optional[MediaResult]:
+    """Download a user's public pins as a gallery. Paging and target_dir as for boards."""
+    target_dir = target_dir or generate_target_dir("pinterest_profile")
+    return await _download_with_fallback_chain(
+        target_dir, url, file_range=_page_range(start), allow_ytdlp=False
+    )
 
 
-async def download_pinterest_content(url: str) -> Optional[str]:
+async def download_pinterest_content(url: str) -> Optional[MediaResult]:
     """
     Single entry point - classifies the URL and routes it to the right
     download function.
@@ -4,11 +4,12 @@ import logging
 from typing import Optional
 
 from Logic.utils.path import generate_target_dir
+from Logic.utils.media_result import MediaResult, scan_media
 
 logger = logging.getLogger(__name__)
 
 
-def download_snapchat(url: str) -> Optional[str]:
+def download_snapchat(url: str) -> Optional[MediaResult]:
     target_dir = generate_target_dir("snapchat")
     os.makedirs(target_dir, exist_ok=True)
 
@@ -27,7 +28,7 @@ def download_snapchat(url: str) -> Optional[str]:
             timeout=120,
         )
         logger.info(f"[Snapchat] Success, target dir: {target_dir}")
-        return target_dir
+        return scan_media(target_dir)
 
     except subprocess.CalledProcessError as e:
         logger.error(f"[Snapchat] Download failed: {e.stderr.strip() if e.stderr else 'unknown error'}")
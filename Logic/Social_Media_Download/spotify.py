@@ -1,16 +1,22 @@
 import subprocess
 import os
+import urllib.error
 import urllib.request
 import re
 import json
 import glob
 import asyncio
 import logging
+from typing import Optional
 
 from Logic.utils.path import generate_target_dir
+from Logic.utils.media_result import MediaItem, MediaResult
+from Logic.utils.circuit_breaker import get_breaker
 
 logger = logging.getLogger(__name__)
 
+OEMBED_BREAKER = "spotify-oembed"
+
 
 def get_spotify_name(url: str) -> str:
     """
@@ -22,17 +28,24 @@ def get_spotify_name(url: str) -> str:
     """
     headers = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64)'}
 
-    # Primary: oEmbed JSON - far less fragile than regex-scraping HTML
-    try:
-        oembed_url = f"https://open.spotify.com/oembed?url={url}"
-        req = urllib.request.Request(oembed_url, headers=headers)
-        with urllib.request.urlopen(req, timeout=10) as response:
-            data = json.loads(response.read().decode('utf-8'))
+    # Primary: oEmbed JSON - far less fragile than regex-scraping HTML.
+    # Skipped while its circuit breaker is open (endpoint down/timing out).
+    breaker = get_breaker(OEMBED_BREAKER)
+    if breaker.allow():
+        try:
+            oembed_url = f"https://open.spotify.com/oembed?url={url}"
+            req = urllib.request.Request(oembed_url, headers=headers)
+            with urllib.request.urlopen(req, timeout=10) as response:
+                data = json.loads(response.read().decode('utf-8'))
+            breaker.record_success()
             title = data.get('title')
             if title:
                 return title
-    except Exception as e:
-        logger.info(f"[Spotify] oEmbed lookup failed, falling back to HTML scrape: {e}")
+        except Exception as e:
+            # A 4xx is about the link, not the endpoint - except 429, which
+            # is the endpoint pushing back.
+            breaker.record(isinstance(e, urllib.error.HTTPError) and e.code < 500 and e.code != 429)
+            logger.info(f"[Spotify] oEmbed lookup failed, falling back to HTML scrape: {e}")
 
     # Fallback: legacy <title> tag scrape
     try:
@@ -49,7 +62,7 @@ def get_spotify_name(url: str) -> str:
     return "Unknown Song"
 
 
-async def download_spotify_track(url: str, target_dir: str = None):
+async def download_spotify_track(url: str, target_dir: str = None) -> Optional[MediaResult]:
     if target_dir is None:
         target_dir = generate_target_dir("Spotify")
 
@@ -104,11 +117,12 @@ async def download_spotify_track(url: str, target_dir: str = None):
             performer = "Spotify"
             title = filename
 
-        return {
-            "path": latest_file,
-            "title": title.strip(),
-            "performer": performer.strip(),
-        }
+        return MediaResult(
+            [MediaItem(latest_file, "audio", size=os.path.getsize(latest_file))],
+            target_dir,
+            title=title.strip(),
+            performer=performer.strip(),
+        )
 
     except subprocess.CalledProcessError as e:
         logger.error(f"[Spotify] Download failed: {e.stderr.strip() if e.stderr else 'unknown error'}")
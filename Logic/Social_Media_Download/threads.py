@@ -26,7 +26,7 @@ turn, rather than piling on and exhausting the pod's memory. That's a
 meaningfully different guarantee than "instant service for everyone at
 once" - worth keeping in mind when reasoning about capacity.
 
-Three concrete things are done here to keep resource usage down:
+Four concrete things are done here to keep resource usage down:
   1. Concurrency cap (asyncio.Semaphore) - bounds simultaneous renders;
      excess requests queue instead of piling on.
   2. Resource blocking - font loads and known tracker/analytics domains
@@ -36,31 +36,51 @@ Three concrete things are done here to keep resource usage down:
   3. One shared Chromium process - launched once (lazily, on first use)
      and reused for every request via isolated browser *contexts*,
      instead of launching+closing a fresh browser per download.
+  4. Optional static bundle cache (THREADS_ASSET_CACHE=memory|disk) -
+     every render uses a fresh context, so without it the multi-MB
+     JS/CSS bundles from static.cdninstagram.com are re-downloaded for
+     every post. With it on, those script/stylesheet responses are served
+     from a shared size-bounded cache by the route handler; media and
+     API requests are never cached. See benchmarks/threads_asset_cache.py.
+
+Optional sharding: with THREADS_BROWSER_SHARDS=N (N > 0) the browser
+manager runs in N separate worker processes instead of a background
+thread of the bot process. Each shard owns its own Chromium and its own
+THREADS_MAX_CONCURRENT_BROWSERS semaphore, so total render capacity is
+N x that cap, Playwright's CPU work stops contending with the bot's own
+event loop, and a Chromium crash only takes down one shard (which is
+respawned on its next use). download_threads() dispatches each capture to
+the least-loaded shard. Leave it at 0 (default) to keep the original
+single in-process manager.
 
 Strategy (in order, each one only runs if the previous one fails):
   1. Headless Chromium capture via the shared browser manager below.
   2. yt-dlp Python API, anonymous - cheap safety net.
-  3. yt-dlp CLI with --impersonate chrome, anonymous - final fallback.
+  3. yt-dlp with chrome impersonation (in-process, worker pool), anonymous - final fallback.
 """
 
-from typing import Optional, Union, Dict, List
+from typing import Optional, Dict, List
 from urllib.parse import urlparse, urlunparse
+from collections import OrderedDict
 import os
+import json
+import time
 import asyncio
+import hashlib
+import itertools
 import threading
-import subprocess
+import multiprocessing
+import concurrent.futures
 import yt_dlp
 
 from Logic.utils.path import generate_target_dir
+from Logic.utils.media_result import MediaResult, scan_media, apply_ytdlp_info
+from Logic.utils.ytdlp_runner import run_ytdlp_impersonated_sync
 
 THREADS_COOKIES: Optional[str] = os.getenv("Threads_cookies")
 
 USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/126.0.0.0 Safari/537.36"
 
-VALID_VIDEO_EXTENSIONS = (".mp4", ".mov", ".webm", ".avi")
-VALID_IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".webp", ".heic")
-VALID_MEDIA_EXTENSIONS = VALID_VIDEO_EXTENSIONS + VALID_IMAGE_EXTENSIONS
-
 # Real post photos/videos are comfortably larger than this. Avatars, UI
 # icons, and sprite images generally aren't. Tune up if avatar/icon images
 # are slipping through in testing, or down if a legitimate small image is
@@ -75,6 +95,12 @@ POST_LOAD_SETTLE_MS = 2_000
 # Override via env var without a code change if you need to tune it.
 MAX_CONCURRENT_BROWSERS = int(os.getenv("THREADS_MAX_CONCURRENT_BROWSERS", "3"))
 
+# Number of browser worker processes. 0 keeps everything in-process (one
+# background thread + one Chromium); N > 0 shards renders across N
+# processes, each with its own Chromium and MAX_CONCURRENT_BROWSERS cap.
+# Sensible values are roughly the pod's CPU count.
+BROWSER_SHARDS = int(os.getenv("THREADS_BROWSER_SHARDS", "0"))
+
 # How long a single capture call will wait for its turn + actual render
 # time before giving up. Needs to be generous enough to cover real queueing
 # under load, not just the render itself.
@@ -118,6 +144,24 @@ import re
 _SMALL_SIZE_PATTERN = re.compile(r"[sp](\d+)x(\d+)")
 SMALL_IMAGE_DIMENSION_THRESHOLD = 200
 
+# Static bundle cache - off unless THREADS_ASSET_CACHE is "memory" or
+# "disk". Disk mode is shared by every browser shard (and survives
+# restarts); memory mode is per process. Entries are keyed by full URL -
+# Meta's bundle URLs are content-hashed, so a URL never changes meaning -
+# and still expire after the TTL so nothing is served forever.
+ASSET_CACHE_MODE = os.getenv("THREADS_ASSET_CACHE", "off").lower()
+ASSET_CACHE_DIR = os.getenv("THREADS_ASSET_CACHE_DIR", os.path.join("data", "threads_asset_cache"))
+ASSET_CACHE_MAX_BYTES = int(os.getenv("THREADS_ASSET_CACHE_MAX_MB", "128")) * 1024 * 1024
+ASSET_CACHE_TTL_S = int(os.getenv("THREADS_ASSET_CACHE_TTL_S", str(12 * 3600)))
+
+# Only these resource types are ever cached - never images/media/XHR.
+CACHEABLE_RESOURCE_TYPES = {"script", "stylesheet"}
+
+# Hop-by-hop / body-encoding headers that must not be replayed: the cached
+# body is stored already decoded, so replaying content-encoding or the
+# original content-length would corrupt it.
+_UNCACHEABLE_HEADERS = {"content-encoding", "content-length", "transfer-encoding", "connection", "set-cookie"}
+
 
 def _has_cookies() -> bool:
     return bool(THREADS_COOKIES) and os.path.isfile(THREADS_COOKIES)
@@ -133,8 +177,179 @@ def _clean_url(url: str) -> str:
     return urlunparse((parsed.scheme, parsed.netloc, parsed.path, "", "", ""))
 
 
-def _collect_media_files(target_dir: str) -> List[str]:
-    return [f for f in os.listdir(target_dir) if f.lower().endswith(VALID_MEDIA_EXTENSIONS)]
+class _StaticAssetCache:
+    """
+    Size-bounded, expiring cache of static script/stylesheet responses,
+    consulted by the browser route handler. Memory mode keeps an LRU of
+    bodies in process; disk mode stores each entry as <sha1>.body plus a
+    <sha1>.json sidecar under `directory`, written atomically so several
+    shard processes can share one directory safely. Disk reads and writes
+    are blocking file I/O, so _serve_cached_asset() runs them in a worker
+    thread rather than on the browser loop.
+    """
+
+    def __init__(
+        self,
+        mode: str,
+        directory: str = ASSET_CACHE_DIR,
+        max_bytes: int = ASSET_CACHE_MAX_BYTES,
+        ttl_s: int = ASSET_CACHE_TTL_S,
+        hosts: tuple = (STATIC_ASSET_HOST,),
+    ) -> None:
+        self.mode = mode
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.ttl_s = ttl_s
+        self.hosts = hosts
+        self.hits = 0
+        self.misses = 0
+        self.bytes_served = 0
+        self._memory: "OrderedDict[str, tuple]" = OrderedDict()
+        self._memory_bytes = 0
+        self._lock = threading.Lock()
+        if mode == "disk":
+            os.makedirs(directory, exist_ok=True)
+
+    def is_cacheable(self, request) -> bool:
+        if request.method != "GET" or request.resource_type not in CACHEABLE_RESOURCE_TYPES:
+            return False
+        host = urlparse(request.url).hostname or ""
+        return any(host == h or host.endswith("." + h) for h in self.hosts)
+
+    def _disk_paths(self, url: str) -> tuple:
+        key = hashlib.sha1(url.encode("utf-8")).hexdigest()
+        base = os.path.join(self.directory, key)
+        return base + ".body", base + ".json"
+
+    def get(self, url: str) -> Optional[tuple]:
+        """Return (status, headers, body) for a fresh entry, else None."""
+        now = time.time()
+        entry = None
+
+        if self.mode == "memory":
+            with self._lock:
+                cached = self._memory.get(url)
+                if cached is not None:
+                    if cached[0] > now:
+                        self._memory.move_to_end(url)
+                        entry = cached[1:]
+                    else:
+                        self._memory.pop(url)
+                        self._memory_bytes -= len(cached[3])
+        elif self.mode == "disk":
+            body_path, meta_path = self._disk_paths(url)
+            try:
+                with open(meta_path, "r", encoding="utf-8") as fh:
+                    meta = json.load(fh)
+                if meta["expires_at"] > now and meta["url"] == url:
+                    with open(body_path, "rb") as fh:
+                        entry = (meta["status"], meta["headers"], fh.read())
+                    os.utime(meta_path)  # LRU signal for eviction
+            except (OSError, ValueError, KeyError):
+                entry = None
+
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self.bytes_served += len(entry[2])
+        return entry
+
+    def put(self, url: str, status: int, headers: Dict[str, str], body: bytes) -> None:
+        if len(body) > self.max_bytes // 4:
+            return  # one huge bundle shouldn't flush everything else
+        expires_at = time.time() + self.ttl_s
+
+        if self.mode == "memory":
+            with self._lock:
+                old = self._memory.pop(url, None)
+                if old is not None:
+                    self._memory_bytes -= len(old[3])
+                self._memory[url] = (expires_at, status, headers, body)
+                self._memory_bytes += len(body)
+                while self._memory_bytes > self.max_bytes and self._memory:
+                    _, evicted = self._memory.popitem(last=False)
+                    self._memory_bytes -= len(evicted[3])
+        elif self.mode == "disk":
+            body_path, meta_path = self._disk_paths(url)
+            meta = {"url": url, "status": status, "headers": headers, "expires_at": expires_at}
+            try:
+                tmp_suffix = f".{os.getpid()}.{threading.get_ident()}.tmp"
+                with open(body_path + tmp_suffix, "wb") as fh:
+                    fh.write(body)
+                os.replace(body_path + tmp_suffix, body_path)
+                with open(meta_path + tmp_suffix, "w", encoding="utf-8") as fh:
+                    json.dump(meta, fh)
+                os.replace(meta_path + tmp_suffix, meta_path)
+            except OSError:
+                return
+            self._evict_disk()
+
+    def _evict_disk(self) -> None:
+        """Drop least-recently-used entries until the directory fits max_bytes."""
+        try:
+            entries = []
+            total = 0
+            for item in os.scandir(self.directory):
+                if not item.name.endswith(".body"):
+                    continue
+                stat = item.stat()
+                total += stat.st_size
+                entries.append((stat.st_mtime, item.path, stat.st_size))
+        except OSError:
+            return
+        if total <= self.max_bytes:
+            return
+        for _, body_path, size in sorted(entries):
+            for path in (body_path, body_path[:-len(".body")] + ".json"):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            total -= size
+            if total <= self.max_bytes:
+                break
+
+
+def _replayable_headers(headers: Dict[str, str]) -> Dict[str, str]:
+    return {k: v for k, v in headers.items() if k.lower() not in _UNCACHEABLE_HEADERS}
+
+
+async def _cache_call(cache: _StaticAssetCache, method, *args):
+    """Run a cache method - in a worker thread in disk mode, where it's
+    file I/O that would otherwise stall every render on the browser loop."""
+    if cache.mode == "disk":
+        return await asyncio.to_thread(method, *args)
+    return method(*args)
+
+
+async def _serve_cached_asset(route, cache: _StaticAssetCache) -> None:
+    """Fulfil a static bundle request from cache, fetching + storing it on a miss."""
+    request = route.request
+    cached = await _cache_call(cache, cache.get, request.url)
+    if cached is not None:
+        status, headers, body = cached
+        await route.fulfill(status=status, headers=headers, body=body)
+        return
+
+    try:
+        response = await route.fetch()
+        body = await response.body()
+    except Exception:
+        await route.continue_()
+        return
+
+    headers = _replayable_headers(response.headers)
+    await route.fulfill(status=response.status, headers=headers, body=body)
+    # Stored after fulfilling, so the page never waits on the write.
+    if response.status == 200:
+        await _cache_call(cache, cache.put, request.url, response.status, headers, body)
+
+
+_asset_cache: Optional[_StaticAssetCache] = (
+    _StaticAssetCache(ASSET_CACHE_MODE) if ASSET_CACHE_MODE in ("memory", "disk") else None
+)
 
 
 class _ThreadsBrowserManager:
@@ -200,6 +415,9 @@ class _ThreadsBrowserManager:
         if any(domain in request.url for domain in BLOCKED_DOMAINS):
             await route.abort()
             return
+        if _asset_cache is not None and _asset_cache.is_cacheable(request):
+            await _serve_cached_asset(route, _asset_cache)
+            return
         await route.continue_()
 
     async def _async_capture(self, url: str, target_dir: str, verbose: bool) -> List[str]:
@@ -320,9 +538,179 @@ class _ThreadsBrowserManager:
         self._loop.call_soon_threadsafe(self._loop.stop)
 
 
+def _shard_main(conn) -> None:
+    """
+    Entry point of a browser shard process. Owns a regular
+    _ThreadsBrowserManager (so one Chromium + one semaphore per shard) and
+    serves capture requests arriving over the pipe. Each request gets its
+    own thread, because capture() blocks for the whole render and the
+    manager's semaphore is what actually bounds concurrency.
+    """
+    manager = _ThreadsBrowserManager()
+    send_lock = threading.Lock()
+
+    def handle(job_id: int, url: str, target_dir: str, verbose: bool) -> None:
+        try:
+            files = manager.capture(url, target_dir, verbose)
+        except Exception as exc:
+            _log(f"[Threads] Shard capture error: {exc}", verbose)
+            files = []
+        try:
+            with send_lock:
+                conn.send((job_id, files))
+        except (OSError, EOFError):
+            pass
+
+    while True:
+        try:
+            request = conn.recv()
+        except (EOFError, OSError):
+            break
+        if request is None:
+            break
+        threading.Thread(target=handle, args=request, daemon=True).start()
+
+    manager.shutdown()
+
+
+class _BrowserShard:
+    """
+    Parent-side handle for one browser shard process. Requests are tagged
+    with an id and matched back to their caller by a reader thread, so a
+    single pipe carries many concurrent captures. Waiting captures are
+    tracked per pipe, so when a pipe closes - the process died, or was
+    already replaced by a respawn - every capture sent over it fails fast (returns no files, letting the
+    yt-dlp tiers take over) and the shard is respawned on its next use.
+    """
+
+    def __init__(self, index: int) -> None:
+        self.index = index
+        self.in_flight = 0
+        self._process = None
+        self._conn = None
+        # Waiting captures, keyed by the pipe their request went out on.
+        self._pending: Dict[object, Dict[int, concurrent.futures.Future]] = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._send_lock = threading.Lock()
+
+    def _ensure_started(self) -> None:
+        # Caller holds self._lock.
+        if self._process is not None and self._process.is_alive():
+            return
+
+        ctx = multiprocessing.get_context("spawn")
+        parent_conn, child_conn = ctx.Pipe()
+        process = ctx.Process(
+            target=_shard_main,
+            args=(child_conn,),
+            daemon=True,
+            name=f"threads-browser-shard-{self.index}",
+        )
+        process.start()
+        child_conn.close()
+
+        self._process = process
+        self._conn = parent_conn
+        self._pending[parent_conn] = {}
+        threading.Thread(
+            target=self._read_results,
+            args=(parent_conn,),
+            daemon=True,
+            name=f"threads-shard-reader-{self.index}",
+        ).start()
+
+    def _read_results(self, conn) -> None:
+        while True:
+            try:
+                job_id, files = conn.recv()
+            except (EOFError, OSError):
+                break
+            with self._lock:
+                future = self._pending.get(conn, {}).pop(job_id, None)
+            if future is not None and not future.done():
+                future.set_result(files)
+
+        # Shard exited or crashed - release everyone still waiting on this
+        # pipe, even if the shard has already been respawned on a new one.
+        with self._lock:
+            stale = list(self._pending.pop(conn, {}).values())
+            if self._conn is conn:
+                self._process = None
+                self._conn = None
+        for future in stale:
+            if not future.done():
+                future.set_exception(RuntimeError(f"browser shard {self.index} exited"))
+
+    def capture(self, url: str, target_dir: str, verbose: bool = False) -> List[str]:
+        future: concurrent.futures.Future = concurrent.futures.Future()
+        with self._lock:
+            self._ensure_started()
+            job_id = next(self._ids)
+            conn = self._conn
+            self._pending[conn][job_id] = future
+
+        try:
+            with self._send_lock:
+                conn.send((job_id, url, target_dir, verbose))
+            return future.result(timeout=CAPTURE_RESULT_TIMEOUT_S)
+        except Exception as exc:
+            _log(f"[Threads] Shard {self.index} capture failed or timed out: {exc}", verbose)
+            return []
+        finally:
+            with self._lock:
+                self._pending.get(conn, {}).pop(job_id, None)
+
+    def shutdown(self) -> None:
+        with self._lock:
+            process, conn = self._process, self._conn
+        if process is None:
+            return
+        try:
+            with self._send_lock:
+                conn.send(None)
+        except Exception:
+            pass
+        process.join(timeout=10)
+        if process.is_alive():
+            process.terminate()
+
+
+class _ShardedBrowserManager:
+    """
+    Same public surface as _ThreadsBrowserManager (capture/shutdown), but
+    spreads renders over several _BrowserShard processes, always picking
+    the shard with the fewest captures in flight.
+    """
+
+    def __init__(self, shard_count: int) -> None:
+        self._shards = [_BrowserShard(i) for i in range(shard_count)]
+        self._dispatch_lock = threading.Lock()
+
+    def capture(self, url: str, target_dir: str, verbose: bool = False) -> List[str]:
+        with self._dispatch_lock:
+            shard = min(self._shards, key=lambda s: s.in_flight)
+            shard.in_flight += 1
+        _log(f"[Threads] Dispatching to browser shard {shard.index} "
+             f"({shard.in_flight} in flight)", verbose)
+        try:
+            return shard.capture(url, target_dir, verbose)
+        finally:
+            with self._dispatch_lock:
+                shard.in_flight -= 1
+
+    def shutdown(self) -> None:
+        for shard in self._shards:
+            shard.shutdown()
+
+
 # One shared manager for the whole process - this is what makes browser
-# reuse across concurrent/successive calls actually work.
-_browser_manager = _ThreadsBrowserManager()
+# reuse across concurrent/successive calls actually work. Sharded mode
+# swaps in the multi-process manager behind the same capture()/shutdown().
+if BROWSER_SHARDS > 0:
+    _browser_manager = _ShardedBrowserManager(BROWSER_SHARDS)
+else:
+    _browser_manager = _ThreadsBrowserManager()
 
 
 def shutdown_threads_browser() -> None:
@@ -345,71 +733,43 @@ def _build_ydl_opts(target_dir: str, verbose: bool) -> Dict:
     }
 
 
-def _download_video_cli(url: str, target_dir: str, verbose: bool = False) -> Optional[str]:
+def _download_video_impersonated(
+    url: str,
+    target_dir: str,
+    verbose: bool = False,
+    cancel: Optional[threading.Event] = None,
+) -> Optional[MediaResult]:
     outtmpl = os.path.join(target_dir, "media_%(autonumber)03d.%(ext)s")
 
-    cmd = [
-        "yt-dlp",
-        "--impersonate", "chrome",
-        "--format", "bestvideo*+bestaudio/best",
-        "--format-sort", "res,fps,tbr",
-        "--merge-output-format", "mp4",
-        "--output", outtmpl,
-        "--no-playlist",
-        url,
-    ]
+    _log(f"[Threads] Running impersonated yt-dlp (anonymous): {url}", verbose)
 
-    _log(f"[Threads] Running CLI (anonymous): {' '.join(cmd)}", verbose)
+    error = run_ytdlp_impersonated_sync(url, outtmpl, cancel=cancel)
+    if error:
+        _log(f"[Threads] Impersonated yt-dlp error: {error}", verbose)
 
-    try:
-        subprocess.run(cmd, capture_output=not verbose, text=True, timeout=120)
-    except subprocess.TimeoutExpired:
-        _log("[Threads] yt-dlp CLI timed out after 120s", verbose)
-    except FileNotFoundError:
-        _log("[Threads] yt-dlp CLI not found — is it installed?", verbose)
-        return None
-    except Exception as exc:
-        _log(f"[Threads] yt-dlp CLI error: {exc}", verbose)
-
-    files = _collect_media_files(target_dir)
-    if not files:
-        return None
-    if len(files) > 1:
-        _log(f"[Threads] ✅ CLI downloaded {len(files)} files → {target_dir}", verbose)
-        return target_dir
+    return _finalize(target_dir, verbose)
 
-    file_path = os.path.join(target_dir, files[0])
-    _log(f"[Threads] ✅ CLI downloaded: {file_path}", verbose)
-    return file_path
 
-
-def _finalize(target_dir: str, verbose: bool) -> Optional[Union[str, Dict]]:
-    files = _collect_media_files(target_dir)
-    if not files:
+def _finalize(target_dir: str, verbose: bool, info: Optional[Dict] = None) -> Optional[MediaResult]:
+    result = scan_media(target_dir)
+    if not result:
         return None
-
-    if len(files) > 1:
-        _log(f"[Threads] ✅ Downloaded {len(files)} files → {target_dir}", verbose)
-        return {
-            "type": "carousel",
-            "file_count": len(files),
-            "files": [os.path.join(target_dir, f) for f in files],
-            "path": target_dir,
-        }
-
-    file_path = os.path.join(target_dir, files[0])
-    _log(f"[Threads] ✅ Downloaded: {file_path}", verbose)
-    return file_path
+    _log(f"[Threads] ✅ Downloaded {len(result.items)} file(s) → {result.path}", verbose)
+    return apply_ytdlp_info(result, info)
 
 
-def download_threads(url: str, verbose: bool = False) -> Optional[Union[str, Dict]]:
+def download_threads(
+    url: str,
+    verbose: bool = False,
+    cancel: Optional[threading.Event] = None,
+) -> Optional[MediaResult]:
     """
     Download a Threads video or photo post at the highest available quality.
 
     Returns:
-        str  — path to the video file (or directory, for multi-file output)
-        dict — carousel metadata (files, path, etc.)
-        None — every download strategy failed
+        MediaResult — the downloaded file(s), see media_result.py
+        None        — every download strategy failed (or cancel was set:
+                      the last-resort tier's job is killed / not started)
     """
     _log(f"[Threads] Processing URL: {url}", verbose)
 
@@ -434,19 +794,24 @@ def download_threads(url: str, verbose: bool = False) -> Optional[Union[str, Dic
 
     # Tier 2: yt-dlp Python API, anonymous - cheap safety net
     _log("[Threads] Trying yt-dlp (Python API, anonymous)...", verbose)
+    info = None
     try:
         with yt_dlp.YoutubeDL(_build_ydl_opts(target_dir, verbose)) as ydl:
-            ydl.download([url])
+            info = ydl.extract_info(url, download=True)
     except Exception as exc:
         _log(f"[Threads] yt-dlp Python API error: {exc}", verbose)
 
-    result = _finalize(target_dir, verbose)
+    result = _finalize(target_dir, verbose, info)
     if result:
         return result
 
-    # Tier 3: CLI with impersonation, anonymous - last resort
-    _log("[Threads] Trying yt-dlp CLI with impersonation (anonymous)...", verbose)
-    result = _download_video_cli(url, target_dir, verbose)
+    if cancel is not None and cancel.is_set():
+        _log("[Threads] Cancelled — not trying any further tiers.", verbose)
+        return None
+
+    # Tier 3: impersonated yt-dlp (worker pool), anonymous - last resort
+    _log("[Threads] Trying impersonated yt-dlp (anonymous)...", verbose)
+    result = _download_video_impersonated(url, target_dir, verbose, cancel=cancel)
     if result:
         return result
 
@@ -7,42 +7,74 @@ Video strategy (in order, each one only runs if the previous one fails):
   2. yt-dlp Python API, anonymous - used when TikWM is unreachable or its URLs fail.
   3. yt-dlp Python API, with cookies - only if a cookie file is configured AND
      tier 2 actually failed. Cookies are never attached on a first attempt.
-  4. yt-dlp CLI with --impersonate chrome, anonymous - last resort.
-  5. yt-dlp CLI with --impersonate chrome, with cookies - final fallback.
+  4. yt-dlp with chrome impersonation (in-process, worker pool), anonymous - last resort.
+  5. yt-dlp with chrome impersonation (in-process, worker pool), with cookies - final fallback.
 
 Carousels (photo posts) are downloaded directly from TikWM image URLs.
+
+TikWM mirrors are tried fastest-healthy-first: each one's latency and error
+rate are tracked as an EWMA (mirror_stats.py), fed by real requests and by
+a background health probe started from the bot's startup handler.
+
+Every external dependency above sits behind a circuit breaker, so while a
+mirror or extractor is down its tier is skipped instead of timing out on
+every request.
 """
 
-from typing import Optional, Union, Dict, List
+from typing import Optional, Dict, List
 from urllib.parse import urlparse, urlunparse
 import os
-import subprocess
+import time
+import asyncio
+import threading
 import yt_dlp
 import requests
 
 from Logic.utils.path import generate_target_dir
-
+from Logic.utils.media_result import MediaResult, scan_media, apply_ytdlp_info
+from Logic.utils.ytdlp_runner import run_ytdlp_impersonated_sync
+from Logic.utils.circuit_breaker import get_breaker
+from Logic.utils.tier_cascade import TierSkipped, run_tiers
+from Logic.utils.mirror_stats import MirrorStats
+from Logic.utils.cookie_manager import get_cookie_pool
+
+# One cookies.txt, several comma-separated, or a directory of them (cookie_manager.py).
 TIKTOK_COOKIES: Optional[str] = os.getenv("Tiktok_cookies")
+_cookies = get_cookie_pool("tiktok", TIKTOK_COOKIES)
 
-# Multiple mirrors so a single blocked/down endpoint doesn't kill the request
+# Multiple mirrors so a single blocked/down endpoint doesn't kill the request.
+# More can be added via env var, comma-separated API URLs.
 TIKWM_API_MIRRORS = [
     "https://www.tikwm.com/api/",
     "https://tikwm.com/api/",
 ]
+for _mirror in os.getenv("TIKWM_EXTRA_MIRRORS", "").split(","):
+    _mirror = _mirror.strip()
+    if _mirror and _mirror not in TIKWM_API_MIRRORS:
+        TIKWM_API_MIRRORS.append(_mirror)
 TIKWM_API_PARAMS = {"count": 12, "cursor": 0, "web": 1, "hd": 1}
 
 USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"
 
-VALID_VIDEO_EXTENSIONS = (".mp4", ".mov", ".webm", ".avi")
-VALID_IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".webp", ".heic")
-VALID_MEDIA_EXTENSIONS = VALID_VIDEO_EXTENSIONS + VALID_IMAGE_EXTENSIONS
-
 REQUEST_TIMEOUT = 30
 CHUNK_SIZE = 8192
 
+# Background health probe of every TikWM mirror, every N seconds (0 = off).
+TIKWM_PROBE_INTERVAL_S = int(os.getenv("TIKWM_PROBE_INTERVAL_S", "300"))
+PROBE_TIMEOUT = 10
+
+# A failed mirror costs roughly a full timeout before we move on.
+_mirror_stats = MirrorStats(TIKWM_API_MIRRORS, failure_cost_s=REQUEST_TIMEOUT)
+_probe_task: Optional[asyncio.Task] = None
+
+# Circuit breakers for the yt-dlp tiers (circuit_breaker.py). Each TikWM
+# mirror gets its own breaker too, named after its host.
+YTDLP_BREAKER = "yt-dlp:tiktok"
+IMPERSONATE_BREAKER = "yt-dlp-impersonate:tiktok"
+
 
 def _has_cookies() -> bool:
-    return bool(TIKTOK_COOKIES) and os.path.isfile(TIKTOK_COOKIES)
+    return _cookies.available()
 
 
 def _log(message: str, verbose: bool = False) -> None:
@@ -76,10 +108,10 @@ def _resolve_url(url: str, verbose: bool = False) -> str:
     return _clean_url(url)
 
 
-def _build_ydl_opts(target_dir: str, verbose: bool, use_cookies: bool = False) -> Dict:
+def _build_ydl_opts(target_dir: str, verbose: bool, cookiefile: Optional[str] = None) -> Dict:
     """yt-dlp options tuned to always pick the best available video+audio streams.
-    Cookies are only attached when use_cookies=True - callers decide that based
-    on whether an anonymous attempt already failed, not by default."""
+    Cookies are only attached when a cookiefile is passed - callers decide that
+    based on whether an anonymous attempt already failed, not by default."""
     opts: Dict = {
         "outtmpl": os.path.join(target_dir, "media_%(autonumber)03d.%(ext)s"),
         "quiet": not verbose,
@@ -92,16 +124,12 @@ def _build_ydl_opts(target_dir: str, verbose: bool, use_cookies: bool = False) -
         "socket_timeout": 15,
     }
 
-    if use_cookies and _has_cookies():
-        opts["cookiefile"] = TIKTOK_COOKIES
+    if cookiefile:
+        opts["cookiefile"] = cookiefile
 
     return opts
 
 
-def _collect_media_files(target_dir: str) -> List[str]:
-    return [f for f in os.listdir(target_dir) if f.lower().endswith(VALID_MEDIA_EXTENSIONS)]
-
-
 def _stream_to_file(url: str, filepath: str) -> bool:
     """
     Stream url to filepath. Validates the response is actually media (not an
@@ -127,7 +155,7 @@ def _stream_to_file(url: str, filepath: str) -> bool:
     return True
 
 
-def _download_carousel(post_data: Dict, target_dir: str, verbose: bool = False) -> Optional[Dict]:
+def _download_carousel(post_data: Dict, target_dir: str, verbose: bool = False) -> Optional[MediaResult]:
     """Download every image in a TikTok photo carousel via TikWM image URLs."""
     _log("[TikTok] Downloading carousel...", verbose)
 
@@ -149,72 +177,58 @@ def _download_carousel(post_data: Dict, target_dir: str, verbose: bool = False)
         _log("[TikTok] No carousel images downloaded", verbose)
         return None
 
-    return {
-        "type": "carousel",
-        "author": post_data["author"]["unique_id"],
-        "title": post_data.get("title", "post")[:50],
-        "likes": post_data.get("digg_count", 0),
-        "comments": post_data.get("comment_count", 0),
-        "shares": post_data.get("share_count", 0),
-        "file_count": len(downloaded_files),
-        "files": downloaded_files,
-        "path": target_dir,
-    }
-
-
-def _download_video_cli(url: str, target_dir: str, verbose: bool = False, use_cookies: bool = False) -> Optional[str]:
-    """yt-dlp CLI with browser impersonation, which gets past TikTok IP blocks
-    the Python API can't avoid. Tried anonymous first; cookies only attached
-    when called with use_cookies=True (i.e. anonymous CLI already failed)."""
+    result = scan_media(target_dir)
+    if result:
+        result.title = post_data.get("title", "post")[:50]
+    return result
+
+
+def _download_video_impersonated(
+    url: str,
+    target_dir: str,
+    verbose: bool = False,
+    use_cookies: bool = False,
+    errors: Optional[List[str]] = None,
+    cancel: Optional[threading.Event] = None,
+) -> Optional[MediaResult]:
+    """yt-dlp with browser impersonation (run in the shared worker pool), which
+    gets past TikTok IP blocks the plain Python API tier can't avoid. Tried
+    anonymous first; cookies only attached when called with use_cookies=True
+    (i.e. the anonymous impersonated attempt already failed)."""
     outtmpl = os.path.join(target_dir, "media_%(autonumber)03d.%(ext)s")
+    cookiefile = _cookies.acquire() if use_cookies else None
+    if use_cookies and not cookiefile:
+        raise TierSkipped("no usable cookie file")
 
-    cmd = [
-        "yt-dlp",
-        "--impersonate", "chrome",
-        "--format", "bestvideo*+bestaudio/best",
-        "--format-sort", "res,fps,tbr",
-        "--merge-output-format", "mp4",
-        "--output", outtmpl,
-        "--no-playlist",
-    ]
-    if use_cookies and _has_cookies():
-        cmd += ["--cookies", TIKTOK_COOKIES]
-    cmd.append(url)
-
-    _log(f"[TikTok] Running CLI ({'with cookies' if use_cookies else 'anonymous'}): {' '.join(cmd)}", verbose)
-
-    try:
-        subprocess.run(cmd, capture_output=not verbose, text=True, timeout=120)
-    except subprocess.TimeoutExpired:
-        _log("[TikTok] yt-dlp CLI timed out after 120s", verbose)
-    except FileNotFoundError:
-        _log("[TikTok] yt-dlp CLI not found — is it installed?", verbose)
-        return None
-    except Exception as exc:
-        _log(f"[TikTok] yt-dlp CLI error: {exc}", verbose)
+    _log(f"[TikTok] Running impersonated yt-dlp ({'with cookies' if use_cookies else 'anonymous'}): {url}", verbose)
 
-    files = _collect_media_files(target_dir)
-    if not files:
-        return None
-    if len(files) > 1:
-        _log(f"[TikTok] ✅ CLI downloaded {len(files)} files → {target_dir}", verbose)
-        return target_dir
+    error = run_ytdlp_impersonated_sync(url, outtmpl, cookiefile=cookiefile, cancel=cancel)
+    if error:
+        _log(f"[TikTok] Impersonated yt-dlp error: {error}", verbose)
+        if errors is not None:
+            errors.append(error)
 
-    file_path = os.path.join(target_dir, files[0])
-    _log(f"[TikTok] ✅ CLI downloaded: {file_path}", verbose)
-    return file_path
+    result = scan_media(target_dir)
+    _cookies.report(cookiefile, bool(result), [error] if error else [])
+    if result:
+        _log(f"[TikTok] ✅ Impersonated yt-dlp downloaded {len(result.items)} file(s) → {result.path}", verbose)
+    return result
 
 
 def _download_video(
-    url: str, target_dir: str, verbose: bool = False, post_data: Optional[Dict] = None,
-) -> Optional[str]:
+    url: str,
+    target_dir: str,
+    verbose: bool = False,
+    post_data: Optional[Dict] = None,
+    cancel: Optional[threading.Event] = None,
+) -> Optional[MediaResult]:
     """
     Download a TikTok video, trying highest-quality / least-invasive sources first:
       1. TikWM direct CDN URL (hdplay, then play) - no cookies, ever
       2. yt-dlp Python API, anonymous
       3. yt-dlp Python API, with cookies (only if tier 2 failed and cookies exist)
-      4. yt-dlp CLI with --impersonate chrome, anonymous
-      5. yt-dlp CLI with --impersonate chrome, with cookies (only if tier 4 failed and cookies exist)
+      4. yt-dlp with chrome impersonation (in-process, worker pool), anonymous
+      5. yt-dlp with chrome impersonation (in-process, worker pool), with cookies (only if tier 4 failed and cookies exist)
     """
     _log("[TikTok] Downloading video...", verbose)
 
@@ -234,67 +248,77 @@ def _download_video(
             try:
                 if _stream_to_file(video_url, filepath):
                     _log(f"[TikTok] ✅ Downloaded via TikWM ({quality_key}): {filepath}", verbose)
-                    return filepath
+                    result = scan_media(filepath)
+                    if result and post_data.get("duration"):
+                        result.items[0].duration = int(post_data["duration"])
+                    return result
             except Exception as exc:
                 _log(f"[TikTok] TikWM {quality_key} error: {exc}", verbose)
 
         _log("[TikTok] TikWM direct URLs failed — falling back to yt-dlp.", verbose)
 
-    # Tier 2: yt-dlp Python API, anonymous
-    _log("[TikTok] Downloading with yt-dlp (Python API, anonymous)...", verbose)
-    try:
-        with yt_dlp.YoutubeDL(_build_ydl_opts(target_dir, verbose, use_cookies=False)) as ydl:
-            ydl.download([url])
-    except Exception as exc:
-        _log(f"[TikTok] yt-dlp Python API (anonymous) error: {exc}", verbose)
-
-    files = _collect_media_files(target_dir)
-    if files:
-        if len(files) > 1:
-            _log(f"[TikTok] ✅ Downloaded {len(files)} files → {target_dir}", verbose)
-            return target_dir
-        file_path = os.path.join(target_dir, files[0])
-        _log(f"[TikTok] ✅ Downloaded: {file_path}", verbose)
-        return file_path
-
-    # Tier 3: yt-dlp Python API, with cookies - only reached if tier 2 failed
-    if _has_cookies():
-        _log("[TikTok] Retrying yt-dlp (Python API, with cookies)...", verbose)
-        try:
-            with yt_dlp.YoutubeDL(_build_ydl_opts(target_dir, verbose, use_cookies=True)) as ydl:
-                ydl.download([url])
-        except Exception as exc:
-            _log(f"[TikTok] yt-dlp Python API (with cookies) error: {exc}", verbose)
-
-        files = _collect_media_files(target_dir)
-        if files:
-            if len(files) > 1:
-                _log(f"[TikTok] ✅ Downloaded {len(files)} files → {target_dir}", verbose)
-                return target_dir
-            file_path = os.path.join(target_dir, files[0])
-            _log(f"[TikTok] ✅ Downloaded: {file_path}", verbose)
-            return file_path
-
-    # Tier 4: CLI with impersonation, anonymous
-    _log("[TikTok] Trying yt-dlp CLI with impersonation (anonymous)...", verbose)
-    result = _download_video_cli(url, target_dir, verbose, use_cookies=False)
-    if result:
-        return result
+    errors: List[str] = []
 
-    # Tier 5: CLI with impersonation, with cookies - final fallback
+    def ytdlp_tier(use_cookies: bool):
+        def run() -> Optional[MediaResult]:
+            cookiefile = _cookies.acquire() if use_cookies else None
+            if use_cookies and not cookiefile:
+                raise TierSkipped("no usable cookie file")
+            tier_errors_from = len(errors)
+            info = None
+            try:
+                with yt_dlp.YoutubeDL(_build_ydl_opts(target_dir, verbose, cookiefile=cookiefile)) as ydl:
+                    info = ydl.extract_info(url, download=True)
+            except Exception as exc:
+                errors.append(str(exc))
+                _log(f"[TikTok] yt-dlp Python API ({'with cookies' if use_cookies else 'anonymous'}) error: {exc}", verbose)
+
+            result = scan_media(target_dir)
+            _cookies.report(cookiefile, bool(result), errors[tier_errors_from:])
+            if not result:
+                return None
+            _log(f"[TikTok] ✅ Downloaded {len(result.items)} file(s) → {result.path}", verbose)
+            return apply_ytdlp_info(result, info)
+        return run
+
+    def impersonated_tier(use_cookies: bool):
+        return lambda: _download_video_impersonated(
+            url, target_dir, verbose, use_cookies=use_cookies, errors=errors, cancel=cancel
+        )
+
+    # (label, breaker, tier) - cookie tiers only run if a cookie file
+    # exists, and only after the anonymous attempt failed.
+    tiers = [
+        # Tier 2: yt-dlp Python API, anonymous
+        ("yt-dlp (Python API, anonymous)", YTDLP_BREAKER, ytdlp_tier(False)),
+    ]
+    if _has_cookies():
+        # Tier 3: yt-dlp Python API, with cookies
+        tiers.append(("yt-dlp (Python API, with cookies)", YTDLP_BREAKER, ytdlp_tier(True)))
+    # Tier 4: impersonated yt-dlp (worker pool), anonymous
+    tiers.append(("impersonated yt-dlp (anonymous)", IMPERSONATE_BREAKER, impersonated_tier(False)))
     if _has_cookies():
-        _log("[TikTok] Trying yt-dlp CLI with impersonation (with cookies)...", verbose)
-        result = _download_video_cli(url, target_dir, verbose, use_cookies=True)
-        if result:
-            return result
+        # Tier 5: impersonated yt-dlp (worker pool), with cookies - final fallback
+        tiers.append(("impersonated yt-dlp (with cookies)", IMPERSONATE_BREAKER, impersonated_tier(True)))
+
+    result = run_tiers(tiers, errors, lambda message: _log(f"[TikTok] {message}", verbose), cancel)
+    if result or (cancel is not None and cancel.is_set()):
+        return result
 
     _log("[TikTok] ❌ All download strategies failed.", verbose)
     return None
 
 
 def _query_tikwm(url: str, verbose: bool = False) -> Optional[Dict]:
-    """Query TikWM API mirrors in order until one returns valid post data."""
-    for mirror in TIKWM_API_MIRRORS:
+    """Query TikWM API mirrors, fastest healthy one first, until one returns
+    valid post data. Mirrors whose circuit breaker is open are skipped."""
+    for mirror in _mirror_stats.ordered():
+        breaker = get_breaker(f"tikwm:{urlparse(mirror).netloc}")
+        if not breaker.allow():
+            _log(f"[TikTok] Skipping {mirror} — circuit is open.", verbose)
+            continue
+
+        started = time.monotonic()
         try:
             response = requests.post(
                 mirror,
@@ -303,9 +327,15 @@ def _query_tikwm(url: str, verbose: bool = False) -> Optional[Dict]:
                 timeout=REQUEST_TIMEOUT,
             )
             if response.status_code != 200:
+                breaker.record_failure()
+                _mirror_stats.record(mirror, time.monotonic() - started, ok=False)
                 continue
 
             data = response.json()
+            # Any well-formed answer means the mirror is up, even a
+            # content-level error (bad/private link).
+            breaker.record_success()
+            _mirror_stats.record(mirror, time.monotonic() - started, ok=True)
             if data.get("code") != 0:
                 _log(f"[TikTok] {mirror} error: {data.get('msg', 'Unknown')}", verbose)
                 continue
@@ -313,6 +343,8 @@ def _query_tikwm(url: str, verbose: bool = False) -> Optional[Dict]:
             return data["data"]
 
         except requests.exceptions.RequestException as exc:
+            breaker.record_failure()
+            _mirror_stats.record(mirror, time.monotonic() - started, ok=False)
             _log(f"[TikTok] {mirror} unreachable ({exc})", verbose)
             continue
 
@@ -320,14 +352,61 @@ def _query_tikwm(url: str, verbose: bool = False) -> Optional[Dict]:
     return None
 
 
-def download_tiktok(url: str, verbose: bool = False) -> Optional[Union[str, Dict]]:
+def _probe_mirror(mirror: str) -> None:
+    """Time one empty API call. TikWM answers it with a JSON "url parsing
+    failed" error - any JSON answer counts as healthy."""
+    started = time.monotonic()
+    try:
+        response = requests.post(
+            mirror,
+            data={"url": ""},
+            headers={"User-Agent": USER_AGENT},
+            timeout=PROBE_TIMEOUT,
+        )
+        ok = response.status_code == 200
+        if ok:
+            response.json()
+    except (requests.exceptions.RequestException, ValueError):
+        ok = False
+    _mirror_stats.record(mirror, time.monotonic() - started, ok=ok)
+
+
+def probe_tikwm_mirrors() -> None:
+    """Probe every TikWM mirror once and update its latency/error stats."""
+    for mirror in TIKWM_API_MIRRORS:
+        _probe_mirror(mirror)
+
+
+async def _probe_loop() -> None:
+    while True:
+        try:
+            await asyncio.to_thread(probe_tikwm_mirrors)
+        except Exception as exc:
+            print(f"[TikTok] Mirror health probe failed: {exc}")
+        await asyncio.sleep(TIKWM_PROBE_INTERVAL_S)
+
+
+def start_tikwm_health_probes() -> None:
+    """Start probing the TikWM mirrors in the background. Call from the
+    bot's startup handler; safe to call more than once."""
+    global _probe_task
+    if TIKWM_PROBE_INTERVAL_S > 0 and _probe_task is None:
+        _probe_task = asyncio.create_task(_probe_loop())
+
+
+def download_tiktok(
+    url: str,
+    verbose: bool = False,
+    cancel: Optional[threading.Event] = None,
+) -> Optional[MediaResult]:
     """
     Download a TikTok video or photo carousel at the highest available quality.
 
     Returns:
-        str  — path to the video file (or directory, for multi-file output)
-        dict — carousel metadata (files, path, etc.)
-        None — every download strategy failed
+        MediaResult — the downloaded file(s), see media_result.py
+        None        — every download strategy failed (or cancel was set:
+                      the running tier's job is killed and no further
+                      tier is tried)
     """
     _log(f"[TikTok] Processing URL: {url}", verbose)
 
@@ -344,11 +423,11 @@ def download_tiktok(url: str, verbose: bool = False) -> Optional[Union[str, Dict
         return None
 
     if post_data is None:
-        return _download_video(url, target_dir, verbose)
+        return _download_video(url, target_dir, verbose, cancel=cancel)
 
     if post_data.get("images"):
         _log("[TikTok] Content type: Photo carousel", verbose)
         return _download_carousel(post_data, target_dir, verbose)
 
     _log("[TikTok] Content type: Video", verbose)
-    return _download_video(url, target_dir, verbose, post_data=post_data)
\ No newline at end of file
+    return _download_video(url, target_dir, verbose, post_data=post_data, cancel=cancel)
\ No newline at end of file
@@ -11,38 +11,67 @@ Strategy (in order, each one only runs if the previous one fails):
   2. yt-dlp Python API, anonymous - best support for video tweets.
   3. yt-dlp Python API, with cookies - only if a cookie file is configured AND
      tier 2 actually failed. Cookies are never attached on a first attempt.
-  4. yt-dlp CLI with --impersonate chrome, anonymous - last resort for
-     video tweets blocked at the API level.
-  5. yt-dlp CLI with --impersonate chrome, with cookies - final fallback.
+  4. yt-dlp with chrome impersonation (in-process, worker pool), anonymous -
+     last resort for video tweets blocked at the API level.
+  5. yt-dlp with chrome impersonation (in-process, worker pool), with cookies - final fallback.
+
+Before any of that, the tweet is pre-classified as "photo" or "video" -
+from the URL shape (/photo/N, /video/N) or X's public syndication endpoint
+(one small JSON request). Photo tweets then run the gallery-dl tiers first,
+video tweets the yt-dlp tiers first - the other family still follows, in
+case the guess was wrong - and anything that can't be classified runs the
+full cascade in the order above.
+
+Links whose cascade failed for a terminal reason (deleted, private, login
+wall, geo-block) are remembered for a while by failure_cache.py, so
+repeat requests fail immediately instead of re-running every tier.
 
 Multi-image posts are collected from whatever gallery-dl pulls into the
-target directory and returned as a carousel dict, matching tiktok.py's
-carousel contract.
+target directory and returned as one MediaResult (media_result.py), like
+every other downloader.
 """
 
-from typing import Optional, Union, Dict, List
+from typing import Callable, Optional, Dict, List, Tuple
 from urllib.parse import urlparse, urlunparse
 import os
-import subprocess
+import re
+import threading
+import math
 import yt_dlp
 import requests
 
 from Logic.utils.path import generate_target_dir
-
+from Logic.utils.media_result import MediaResult, scan_media, apply_ytdlp_info
+from Logic.utils.ytdlp_runner import run_ytdlp_impersonated_sync
+from Logic.utils.gallery_dl_runner import run_gallery_dl_sync
+from Logic.utils.failure_cache import get_known_failure, remember_failure
+from Logic.utils.tier_cascade import TierSkipped, run_tiers
+from Logic.utils.cookie_manager import get_cookie_pool
+
+# One cookies.txt, several comma-separated, or a directory of them (cookie_manager.py).
 X_COOKIES: Optional[str] = os.getenv("X_cookies")
+_cookies = get_cookie_pool("x", X_COOKIES)
 
 USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"
 
-VALID_VIDEO_EXTENSIONS = (".mp4", ".mov", ".webm", ".avi")
-VALID_IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".webp", ".heic", ".gif")
-VALID_MEDIA_EXTENSIONS = VALID_VIDEO_EXTENSIONS + VALID_IMAGE_EXTENSIONS
-
 REQUEST_TIMEOUT = 30
 GALLERY_DL_TIMEOUT = 60
 
+# Circuit breakers for the extractors this module drives (circuit_breaker.py).
+GALLERY_DL_BREAKER = "gallery-dl:x"
+YTDLP_BREAKER = "yt-dlp:x"
+IMPERSONATE_BREAKER = "yt-dlp-impersonate:x"
+
+# Pre-classification lookup - it only decides tier order, so give up fast.
+CLASSIFY_TIMEOUT = 5
+SYNDICATION_URL = "https://cdn.syndication.twimg.com/tweet-result"
+
+_STATUS_ID_RE = re.compile(r"/status(?:es)?/(\d+)")
+_MEDIA_PATH_RE = re.compile(r"/status(?:es)?/\d+/(photo|video)/\d+")
+
 
 def _has_cookies() -> bool:
-    return bool(X_COOKIES) and os.path.isfile(X_COOKIES)
+    return _cookies.available()
 
 
 def _log(message: str, verbose: bool = False) -> None:
@@ -79,10 +108,102 @@ def _resolve_url(url: str, verbose: bool = False) -> str:
     return _clean_url(url)
 
 
-def _build_ydl_opts(target_dir: str, verbose: bool, use_cookies: bool = False) -> Dict:
+def _js_base36(value: float) -> str:
+    """Number.prototype.toString(36) for a positive float, digit for digit
+    (V8's DoubleToRadixCString) - the syndication token is derived from it."""
+    chars = "0123456789abcdefghijklmnopqrstuvwxyz"
+    integer = math.floor(value)
+    fraction = value - integer
+    delta = max(0.5 * (math.nextafter(value, math.inf) - value), math.nextafter(0.0, 1.0))
+
+    digits: List[int] = []
+    if fraction >= delta:
+        while True:
+            fraction *= 36
+            delta *= 36
+            digit = int(fraction)
+            digits.append(digit)
+            fraction -= digit
+            if (fraction > 0.5 or (fraction == 0.5 and digit & 1)) and fraction + delta > 1:
+                # Round up, carrying into earlier digits / the integer part.
+                while True:
+                    if not digits:
+                        integer += 1
+                        break
+                    last = digits.pop() + 1
+                    if last < 36:
+                        digits.append(last)
+                        break
+                break
+            if fraction < delta:
+                break
+
+    integer_part = ""
+    n = int(integer)
+    while True:
+        n, r = divmod(n, 36)
+        integer_part = chars[r] + integer_part
+        if n == 0:
+            break
+    return integer_part + ("." + "".join(chars[d] for d in digits) if digits else "")
+
+
+def _syndication_token(tweet_id: str) -> str:
+    """Same token X's own embed widget sends along with a tweet id."""
+    return re.sub(r"(0+|\.)", "", _js_base36(int(tweet_id) / 1e15 * math.pi))
+
+
+def _classify_content(url: str, verbose: bool = False) -> str:
+    """
+    Cheap guess at what a tweet contains: "photo", "video" or "unknown".
+
+    URL shape first (free), then X's syndication endpoint - the same JSON
+    the official embed widget uses, one request with a short timeout. Any
+    failure is just "unknown", which keeps the full cascade.
+    """
+    shape = _MEDIA_PATH_RE.search(url)
+    if shape:
+        return shape.group(1)
+
+    match = _STATUS_ID_RE.search(url)
+    if not match:
+        return "unknown"
+
+    tweet_id = match.group(1)
+    try:
+        response = requests.get(
+            SYNDICATION_URL,
+            params={"id": tweet_id, "token": _syndication_token(tweet_id)},
+            headers={"User-Agent": USER_AGENT},
+            timeout=CLASSIFY_TIMEOUT,
+        )
+        response.raise_for_status()
+        media = response.json().get("mediaDetails") or []
+    except Exception as exc:
+        _log(f"[X] Could not pre-classify tweet ({exc}) — running full cascade.", verbose)
+        return "unknown"
+
+    media_types = {item.get("type") for item in media}
+    if media_types & {"video", "animated_gif"}:
+        return "video"
+    if "photo" in media_types:
+        return "photo"
+    return "unknown"
+
+
+def _order_tiers(tiers: List[Tuple[str, str, str, Callable]], kind: str) -> List[Tuple[str, str, str, Callable]]:
+    """Tiers of the classified kind's family first, the rest after - a wrong
+    guess only costs time, never the download. Unknown: the cascade as
+    listed."""
+    if kind in ("photo", "video"):
+        return [t for t in tiers if t[1] == kind] + [t for t in tiers if t[1] != kind]
+    return tiers
+
+
+def _build_ydl_opts(target_dir: str, verbose: bool, cookiefile: Optional[str] = None) -> Dict:
     """yt-dlp options tuned to always pick the best available video+audio streams.
-    Cookies are only attached when use_cookies=True - callers decide that based
-    on whether an anonymous attempt already failed, not by default."""
+    Cookies are only attached when a cookiefile is passed - callers decide that
+    based on whether an anonymous attempt already failed, not by default."""
     opts: Dict = {
         "outtmpl": os.path.join(target_dir, "media_%(autonumber)03d.%(ext)s"),
         "quiet": not verbose,
@@ -95,178 +216,183 @@ def _build_ydl_opts(target_dir: str, verbose: bool, use_cookies: bool = False) -
         "socket_timeout": 15,
     }
 
-    if use_cookies and _has_cookies():
-        opts["cookiefile"] = X_COOKIES
+    if cookiefile:
+        opts["cookiefile"] = cookiefile
 
     return opts
 
 
-def _collect_media_files(target_dir: str) -> List[str]:
-    return [f for f in os.listdir(target_dir) if f.lower().endswith(VALID_MEDIA_EXTENSIONS)]
-
-
-def _download_gallery_dl(url: str, target_dir: str, verbose: bool = False, use_cookies: bool = False) -> List[str]:
+def _download_gallery_dl(
+    url: str,
+    target_dir: str,
+    verbose: bool = False,
+    use_cookies: bool = False,
+    errors: Optional[List[str]] = None,
+    cancel: Optional[threading.Event] = None,
+) -> Optional[MediaResult]:
     """Run gallery-dl anonymously (or with cookies) into target_dir. Best tool
     for X photo posts / image carousels; also picks up some videos."""
-    cmd = [
-        "gallery-dl",
-        "--dest", target_dir,
-        "-o", "filename={num:>03}_{filename}.{extension}",
-        "--no-mtime",
-    ]
-    if use_cookies and _has_cookies():
-        cmd += ["--cookies", X_COOKIES]
-    cmd.append(url)
-
-    _log(f"[X] Running gallery-dl ({'with cookies' if use_cookies else 'anonymous'}): {' '.join(cmd)}", verbose)
-
-    try:
-        subprocess.run(cmd, capture_output=not verbose, text=True, timeout=GALLERY_DL_TIMEOUT)
-    except subprocess.TimeoutExpired:
-        _log("[X] gallery-dl timed out", verbose)
-    except FileNotFoundError:
-        _log("[X] gallery-dl not found — is it installed?", verbose)
-        return []
-    except Exception as exc:
-        _log(f"[X] gallery-dl error: {exc}", verbose)
-
-    return _collect_media_files(target_dir)
-
-
-def _download_video_cli(url: str, target_dir: str, verbose: bool = False, use_cookies: bool = False) -> Optional[str]:
-    """yt-dlp CLI with browser impersonation, for when the Python API gets
-    blocked. Tried anonymous first; cookies only attached when called with
-    use_cookies=True (i.e. anonymous CLI already failed)."""
+    cookies = _cookies.acquire() if use_cookies else None
+    if use_cookies and not cookies:
+        raise TierSkipped("no usable cookie file")
+
+    _log(f"[X] Running gallery-dl ({'with cookies' if use_cookies else 'anonymous'}): {url}", verbose)
+
+    result = run_gallery_dl_sync(
+        url,
+        target_dir,
+        cookies=cookies,
+        options={"filename": "{num:>03}_{filename}.{extension}"},
+        timeout=GALLERY_DL_TIMEOUT,
+        cancel=cancel,
+    )
+    if result.status != 0:
+        _log(f"[X] gallery-dl failed (status {result.status}): {'; '.join(result.errors)}", verbose)
+        if errors is not None:
+            errors.extend(result.errors)
+
+    media = _finalize(target_dir, verbose)
+    _cookies.report(cookies, bool(media), result.errors)
+    return media
+
+
+def _download_video_impersonated(
+    url: str,
+    target_dir: str,
+    verbose: bool = False,
+    use_cookies: bool = False,
+    errors: Optional[List[str]] = None,
+    cancel: Optional[threading.Event] = None,
+) -> Optional[MediaResult]:
+    """yt-dlp with browser impersonation (run in the shared worker pool), for
+    when the plain Python API tier gets blocked. Tried anonymous first;
+    cookies only attached when called with use_cookies=True (i.e. the
+    anonymous impersonated attempt already failed)."""
     outtmpl = os.path.join(target_dir, "media_%(autonumber)03d.%(ext)s")
+    cookiefile = _cookies.acquire() if use_cookies else None
+    if use_cookies and not cookiefile:
+        raise TierSkipped("no usable cookie file")
 
-    cmd = [
-        "yt-dlp",
-        "--impersonate", "chrome",
-        "--format", "bestvideo*+bestaudio/best",
-        "--format-sort", "res,fps,tbr",
-        "--merge-output-format", "mp4",
-        "--output", outtmpl,
-        "--no-playlist",
-    ]
-    if use_cookies and _has_cookies():
-        cmd += ["--cookies", X_COOKIES]
-    cmd.append(url)
+    _log(f"[X] Running impersonated yt-dlp ({'with cookies' if use_cookies else 'anonymous'}): {url}", verbose)
 
-    _log(f"[X] Running CLI ({'with cookies' if use_cookies else 'anonymous'}): {' '.join(cmd)}", verbose)
+    error = run_ytdlp_impersonated_sync(url, outtmpl, cookiefile=cookiefile, cancel=cancel)
+    if error:
+        _log(f"[X] Impersonated yt-dlp error: {error}", verbose)
+        if errors is not None:
+            errors.append(error)
 
-    try:
-        subprocess.run(cmd, capture_output=not verbose, text=True, timeout=120)
-    except subprocess.TimeoutExpired:
-        _log("[X] yt-dlp CLI timed out after 120s", verbose)
-    except FileNotFoundError:
-        _log("[X] yt-dlp CLI not found — is it installed?", verbose)
-        return None
-    except Exception as exc:
-        _log(f"[X] yt-dlp CLI error: {exc}", verbose)
-
-    files = _collect_media_files(target_dir)
-    if not files:
-        return None
-    if len(files) > 1:
-        _log(f"[X] ✅ CLI downloaded {len(files)} files → {target_dir}", verbose)
-        return target_dir
-
-    file_path = os.path.join(target_dir, files[0])
-    _log(f"[X] ✅ CLI downloaded: {file_path}", verbose)
-    return file_path
+    result = _finalize(target_dir, verbose)
+    _cookies.report(cookiefile, bool(result), [error] if error else [])
+    return result
 
 
-def _finalize(target_dir: str, verbose: bool) -> Optional[Union[str, Dict]]:
-    """Turn whatever landed in target_dir into the tiktok.py-style return
-    contract: single video path, carousel dict, or None."""
-    files = _collect_media_files(target_dir)
-    if not files:
+def _finalize(target_dir: str, verbose: bool, info: Optional[Dict] = None) -> Optional[MediaResult]:
+    """Turn whatever landed in target_dir into a MediaResult - a single file
+    or a carousel - with what yt-dlp's info dict (if any) knew about each
+    video. None if nothing landed."""
+    result = scan_media(target_dir)
+    if not result:
         return None
+    _log(f"[X] ✅ Downloaded {len(result.items)} file(s) → {result.path}", verbose)
+    return apply_ytdlp_info(result, info)
 
-    image_count = sum(1 for f in files if f.lower().endswith(VALID_IMAGE_EXTENSIONS))
-    video_count = sum(1 for f in files if f.lower().endswith(VALID_VIDEO_EXTENSIONS))
-
-    if len(files) > 1 or (image_count > 0 and video_count == 0 and image_count > 1):
-        _log(f"[X] ✅ Downloaded {len(files)} files → {target_dir}", verbose)
-        return {
-            "type": "carousel",
-            "file_count": len(files),
-            "files": [os.path.join(target_dir, f) for f in files],
-            "path": target_dir,
-        }
 
-    file_path = os.path.join(target_dir, files[0])
-    _log(f"[X] ✅ Downloaded: {file_path}", verbose)
-    return file_path
-
-
-def download_x(url: str, verbose: bool = False) -> Optional[Union[str, Dict]]:
+def download_x(
+    url: str,
+    verbose: bool = False,
+    cancel: Optional[threading.Event] = None,
+) -> Optional[MediaResult]:
     """
     Download an X (Twitter) video or photo post at the highest available quality.
 
     Returns:
-        str  — path to the video file (or directory, for multi-file output)
-        dict — carousel metadata (files, path, etc.)
-        None — every download strategy failed
+        MediaResult — the downloaded file(s), see media_result.py
+        None        — every download strategy failed (or cancel was set:
+                      the running tier's job is killed, no further tier
+                      is tried and nothing is cached as a failure)
     """
     _log(f"[X] Processing URL: {url}", verbose)
 
     url = _resolve_url(url, verbose)
 
+    known_failure = get_known_failure("x", url)
+    if known_failure:
+        _log(f"[X] ❌ Known dead link ({known_failure}) — skipping all tiers.", verbose)
+        return None
+
     target_dir = generate_target_dir("x")
     os.makedirs(target_dir, exist_ok=True)
     _log(f"[X] Target directory: {target_dir}", verbose)
 
-    # Tier 1: gallery-dl, anonymous (best for photo posts / carousels)
-    _log("[X] Trying gallery-dl (anonymous)...", verbose)
-    files = _download_gallery_dl(url, target_dir, verbose, use_cookies=False)
-    if files:
-        return _finalize(target_dir, verbose)
-
-    # Tier 2: yt-dlp Python API, anonymous (best for video tweets)
-    _log("[X] Trying yt-dlp (Python API, anonymous)...", verbose)
-    try:
-        with yt_dlp.YoutubeDL(_build_ydl_opts(target_dir, verbose, use_cookies=False)) as ydl:
-            ydl.download([url])
-    except Exception as exc:
-        _log(f"[X] yt-dlp Python API (anonymous) error: {exc}", verbose)
+    kind = _classify_content(url, verbose)
+    errors: List[str] = []
+    _log(f"[X] Pre-classified as: {kind}", verbose)
 
-    result = _finalize(target_dir, verbose)
-    if result:
-        return result
-
-    # Tier 3: yt-dlp Python API, with cookies - only reached if tier 2 failed
-    if _has_cookies():
-        _log("[X] Retrying yt-dlp (Python API, with cookies)...", verbose)
-        try:
-            with yt_dlp.YoutubeDL(_build_ydl_opts(target_dir, verbose, use_cookies=True)) as ydl:
-                ydl.download([url])
-        except Exception as exc:
-            _log(f"[X] yt-dlp Python API (with cookies) error: {exc}", verbose)
-
-        result = _finalize(target_dir, verbose)
-        if result:
+    def gallery_dl_tier(use_cookies: bool):
+        def run():
+            return _download_gallery_dl(
+                url, target_dir, verbose, use_cookies=use_cookies, errors=errors, cancel=cancel
+            )
+        return run
+
+    def ytdlp_tier(use_cookies: bool):
+        def run():
+            cookiefile = _cookies.acquire() if use_cookies else None
+            if use_cookies and not cookiefile:
+                raise TierSkipped("no usable cookie file")
+            tier_errors_from = len(errors)
+            info = None
+            try:
+                with yt_dlp.YoutubeDL(_build_ydl_opts(target_dir, verbose, cookiefile=cookiefile)) as ydl:
+                    info = ydl.extract_info(url, download=True)
+            except Exception as exc:
+                errors.append(str(exc))
+                _log(f"[X] yt-dlp Python API ({'with cookies' if use_cookies else 'anonymous'}) error: {exc}", verbose)
+            result = _finalize(target_dir, verbose, info)
+            _cookies.report(cookiefile, bool(result), errors[tier_errors_from:])
             return result
-
-    # Tier 4: gallery-dl retry with cookies, in case tier 1 only failed due to auth
+        return run
+
+    def impersonated_tier(use_cookies: bool):
+        return lambda: _download_video_impersonated(
+            url, target_dir, verbose, use_cookies=use_cookies, errors=errors, cancel=cancel
+        )
+
+    # (label, family, breaker, tier) in full-cascade order. Cookie tiers are
+    # only listed when a cookie file is configured, and only run after their
+    # anonymous counterpart has already failed. Tiers sharing an extractor
+    # share its circuit breaker.
+    tiers = [
+        # Tier 1: gallery-dl, anonymous (best for photo posts / carousels)
+        ("gallery-dl (anonymous)", "photo", GALLERY_DL_BREAKER, gallery_dl_tier(False)),
+        # Tier 2: yt-dlp Python API, anonymous (best for video tweets)
+        ("yt-dlp (Python API, anonymous)", "video", YTDLP_BREAKER, ytdlp_tier(False)),
+    ]
     if _has_cookies():
-        _log("[X] Retrying gallery-dl (with cookies)...", verbose)
-        files = _download_gallery_dl(url, target_dir, verbose, use_cookies=True)
-        if files:
-            return _finalize(target_dir, verbose)
-
-    # Tier 5: CLI with impersonation, anonymous
-    _log("[X] Trying yt-dlp CLI with impersonation (anonymous)...", verbose)
-    result = _download_video_cli(url, target_dir, verbose, use_cookies=False)
-    if result:
-        return result
-
-    # Tier 6: CLI with impersonation, with cookies - final fallback
+        tiers += [
+            # Tier 3: yt-dlp Python API, with cookies
+            ("yt-dlp (Python API, with cookies)", "video", YTDLP_BREAKER, ytdlp_tier(True)),
+            # Tier 4: gallery-dl with cookies, in case tier 1 only failed due to auth
+            ("gallery-dl (with cookies)", "photo", GALLERY_DL_BREAKER, gallery_dl_tier(True)),
+        ]
+    # Tier 5: impersonated yt-dlp (worker pool), anonymous
+    tiers.append(("impersonated yt-dlp (anonymous)", "video", IMPERSONATE_BREAKER, impersonated_tier(False)))
     if _has_cookies():
-        _log("[X] Trying yt-dlp CLI with impersonation (with cookies)...", verbose)
-        result = _download_video_cli(url, target_dir, verbose, use_cookies=True)
-        if result:
-            return result
+        # Tier 6: impersonated yt-dlp (worker pool), with cookies - final fallback
+        tiers.append(("impersonated yt-dlp (with cookies)", "video", IMPERSONATE_BREAKER, impersonated_tier(True)))
+
+    result = run_tiers(
+        [(label, breaker_name, tier) for label, _family, breaker_name, tier in _order_tiers(tiers, kind)],
+        errors,
+        lambda message: _log(f"[X] {message}", verbose),
+        cancel,
+    )
+    if result or (cancel is not None and cancel.is_set()):
+        return result
 
-    _log("[X] ❌ All download strategies failed.", verbose)
+    failure = remember_failure("x", url, errors)
+    if failure:
+        _log(f"[X] ❌ All download strategies failed ({failure}) — caching as a dead link.", verbose)
+    else:
+        _log("[X] ❌ All download strategies failed.", verbose)
     return None
@@ -4,8 +4,10 @@ Module for downloading YouTube videos, shorts, and audio.
 Supports quality selection, audio extraction, and metadata retrieval.
 
 Cookie strategy: always attempt the download anonymously first. Cookies
-(Youtube_cookies env var, pointing at a cookies.txt file) are only used as
-a retry when yt-dlp reports an actual auth/bot-check error - not by default.
+(Youtube_cookies env var, pointing at a cookies.txt file, several
+comma-separated, or a directory of them - see cookie_manager.py) are only
+used as a retry when yt-dlp reports an actual auth/bot-check error - not by
+default.
 Most public videos never need cookies at all; using them unconditionally
 just adds unnecessary risk of the cookie session itself getting flagged.
 
@@ -21,10 +23,13 @@ import yt_dlp
 import os
 
 from Logic.utils.path import generate_target_dir
+from Logic.utils.media_result import MediaResult, scan_media, apply_ytdlp_info
+from Logic.utils.cookie_manager import get_cookie_pool
 
 # Constants
 
 YOUTUBE_COOKIES: Optional[str] = os.getenv("Youtube_cookies")
+_cookies = get_cookie_pool("youtube", YOUTUBE_COOKIES)
 
 # yt-dlp options for metadata retrieval
 YDL_INFO_OPTS = {
@@ -68,7 +73,7 @@ AUTH_ERROR_MARKERS = (
 
 
 def _has_cookies() -> bool:
-    return bool(YOUTUBE_COOKIES) and os.path.exists(YOUTUBE_COOKIES)
+    return _cookies.available()
 
 
 def _is_auth_error(exc: Exception) -> bool:
@@ -94,6 +99,64 @@ def _build_quality_format(quality: str) -> str:
     )
 
 
+def _format_size(fmt: Dict) -> Optional[int]:
+    return fmt.get("filesize") or fmt.get("filesize_approx")
+
+
+class _SizeCappedFormat:
+    """
+    yt-dlp format selector (the "format" option may be a callable) for
+    _build_quality_format(quality), but taking the best video+audio pair
+    whose combined size fits max_filesize - so an upload limit picks a
+    smaller rendition up front instead of downloading one that gets
+    refused or re-encoded.
+
+    Sizes are yt-dlp's filesize, else filesize_approx; a format of unknown
+    size is assumed to fit. If nothing fits, the usual selection is made.
+    """
+
+    def __init__(self, quality: str, max_filesize: int):
+        self.quality = quality
+        self.max_filesize = max_filesize
+        self._parser = None
+
+    def _select(self, spec: str, ctx: Dict):
+        # A plain YoutubeDL only to parse specs - it builds the merged
+        # video+audio format exactly as a format string would.
+        if self._parser is None:
+            self._parser = yt_dlp.YoutubeDL({"quiet": True, "no_warnings": True})
+        return self._parser.build_format_selector(spec)(ctx)
+
+    def _fits(self, *formats: Dict) -> bool:
+        sizes = [_format_size(f) for f in formats]
+        return None in sizes or sum(sizes) <= self.max_filesize
+
+    def __call__(self, ctx: Dict):
+        formats = ctx["formats"]  # worst to best
+        max_height = int(self.quality) if str(self.quality).isdigit() else None
+        videos = [
+            f for f in formats
+            if f.get("ext") == "mp4" and f.get("acodec") == "none" and f.get("vcodec") not in (None, "none")
+            and (max_height is None or (f.get("height") or 0) <= max_height)
+        ]
+        audios = [
+            f for f in formats
+            if f.get("ext") == "m4a" and f.get("vcodec") == "none" and f.get("acodec") not in (None, "none")
+        ]
+        if audios:
+            audio = audios[-1]
+            for video in reversed(videos):
+                if self._fits(video, audio):
+                    yield from self._select(f"{video['format_id']}+{audio['format_id']}", ctx)
+                    return
+        for fmt in reversed(formats):
+            if (fmt.get("ext") == "mp4" and fmt.get("vcodec") not in (None, "none")
+                    and fmt.get("acodec") not in (None, "none") and self._fits(fmt)):
+                yield from self._select(fmt["format_id"], ctx)
+                return
+        yield from self._select(_build_quality_format(self.quality), ctx)
+
+
 def _get_audio_path(filename: str) -> str:
     """
     Get expected MP3 audio file path from base filename.
@@ -141,35 +204,41 @@ def get_video_info(url: str) -> Tuple[Dict, bool, int, str, Optional[str], int]:
         - thumbnail (Optional[str]): Thumbnail URL
         - duration (int): Video duration in seconds
     """
-    attempts = [dict(YDL_INFO_OPTS)]
+    attempts = [False]
     if _has_cookies():
-        with_cookies = dict(YDL_INFO_OPTS)
-        with_cookies["cookiefile"] = YOUTUBE_COOKIES
-        attempts.append(with_cookies)
+        attempts.append(True)
 
     last_exc = None
-    for i, opts in enumerate(attempts):
+    for i, use_cookies in enumerate(attempts):
+        opts = dict(YDL_INFO_OPTS)
+        cookiefile = _cookies.acquire() if use_cookies else None
+        if use_cookies and not cookiefile:
+            break
+        if cookiefile:
+            opts["cookiefile"] = cookiefile
         try:
             with yt_dlp.YoutubeDL(opts) as ydl:
-                tag = "with cookies" if "cookiefile" in opts else "anonymous"
+                tag = "with cookies" if use_cookies else "anonymous"
                 print(f"[YouTube] Fetching info ({tag}) for: {url}")
 
                 info = ydl.extract_info(url, download=False)
+            _cookies.report(cookiefile, True)
 
-                title = info.get("title", "Unknown Title")
-                thumbnail = info.get("thumbnail")
-                duration = info.get("duration", 0)
-                size = info.get("filesize") or info.get("filesize_approx") or 0
-                is_short = "shorts" in url or duration < SHORTS_DURATION_THRESHOLD
+            title = info.get("title", "Unknown Title")
+            thumbnail = info.get("thumbnail")
+            duration = info.get("duration", 0)
+            size = info.get("filesize") or info.get("filesize_approx") or 0
+            is_short = "shorts" in url or duration < SHORTS_DURATION_THRESHOLD
 
-                print(
-                    f"[YouTube] ✅ Retrieved info: {title} "
-                    f"({duration}s, {'Short' if is_short else 'Regular'})"
-                )
-                return info, is_short, size, title, thumbnail, duration
+            print(
+                f"[YouTube] ✅ Retrieved info: {title} "
+                f"({duration}s, {'Short' if is_short else 'Regular'})"
+            )
+            return info, is_short, size, title, thumbnail, duration
 
         except Exception as e:
             last_exc = e
+            _cookies.report(cookiefile, False, [str(e)])
             is_last_attempt = i == len(attempts) - 1
             if not is_last_attempt and _is_auth_error(e):
                 print(f"[YouTube] Anonymous info fetch needs auth ({e}) — retrying with cookies")
@@ -182,7 +251,12 @@ def get_video_info(url: str) -> Tuple[Dict, bool, int, str, Optional[str], int]:
 
 # Video/Audio Download
 
-def download_youtube(url: str, quality: str = "720", is_audio: bool = False) -> Optional[Dict]:
+def download_youtube(
+    url: str,
+    quality: str = "720",
+    is_audio: bool = False,
+    max_filesize: Optional[int] = None,
+) -> Optional[MediaResult]:
     """
     Download YouTube video or audio.
 
@@ -194,9 +268,13 @@ def download_youtube(url: str, quality: str = "720", is_audio: bool = False) ->
         url: YouTube video URL
         quality: Video quality (default: "720")
         is_audio: If True, extract audio only as MP3 (default: False)
+        max_filesize: Prefer a video+audio pair that fits in this many
+            bytes together (e.g. the upload limit), falling back to the
+            usual selection
 
     Returns:
-        Optional[Dict]: same structure as before (see original docstring).
+        Optional[MediaResult]: the video with its size/duration/thumbnail,
+        or the MP3 with title, performer and cover art.
     """
     print(f"[YouTube] Starting download...")
     print(f"[YouTube] URL: {url}")
@@ -205,7 +283,7 @@ def download_youtube(url: str, quality: str = "720", is_audio: bool = False) ->
     target_dir = generate_target_dir("youtube")
     os.makedirs(target_dir, exist_ok=True)
 
-    def _build_opts(use_cookies: bool) -> Dict:
+    def _build_opts(cookiefile: Optional[str]) -> Dict:
         opts = {
             "outtmpl": os.path.join(target_dir, "%(title)s.%(ext)s"),
             "noplaylist": True,
@@ -216,9 +294,12 @@ def download_youtube(url: str, quality: str = "720", is_audio: bool = False) ->
         if is_audio:
             opts.update({"format": "bestaudio/best", "postprocessors": AUDIO_POSTPROCESSORS})
         else:
-            opts["format"] = _build_quality_format(quality)
-        if use_cookies:
-            opts["cookiefile"] = YOUTUBE_COOKIES
+            opts["format"] = (
+                _SizeCappedFormat(quality, max_filesize) if max_filesize
+                else _build_quality_format(quality)
+            )
+        if cookiefile:
+            opts["cookiefile"] = cookiefile
         return opts
 
     attempts = [False]
@@ -227,31 +308,39 @@ def download_youtube(url: str, quality: str = "720", is_audio: bool = False) ->
 
     last_exc = None
     for i, use_cookies in enumerate(attempts):
+        cookiefile = _cookies.acquire() if use_cookies else None
+        if use_cookies and not cookiefile:
+            break
         try:
-            ydl_opts = _build_opts(use_cookies)
+            ydl_opts = _build_opts(cookiefile)
             with yt_dlp.YoutubeDL(ydl_opts) as ydl:
                 tag = "with cookies" if use_cookies else "anonymous"
                 print(f"[YouTube] Downloading ({tag})...")
                 info = ydl.extract_info(url, download=True)
                 filename = ydl.prepare_filename(info)
+            _cookies.report(cookiefile, True)
 
             print(f"[YouTube] ✅ Download complete: {filename}")
 
             if is_audio:
-                audio_path = _get_audio_path(filename)
-                thumb_path = _get_thumbnail_path(filename)
-                return {
-                    "path": audio_path,
-                    "title": info.get("title", "Unknown Title"),
-                    "performer": info.get("uploader", "Unknown Artist"),
-                    "thumb": thumb_path,
-                    "folder": target_dir,
-                }
+                result = scan_media(_get_audio_path(filename))
+                if result:
+                    audio = result.items[0]
+                    audio.duration = int(info["duration"]) if info.get("duration") else None
+                    audio.thumbnail = _get_thumbnail_path(filename)
+                    result.title = info.get("title", "Unknown Title")
+                    result.performer = info.get("uploader", "Unknown Artist")
+                    result.thumbnail_url = info.get("thumbnail")
+                return result
             else:
-                return {"path": filename}
+                # The merged file, if yt-dlp had to merge video+audio.
+                downloads = info.get("requested_downloads") or [{}]
+                video_path = downloads[0].get("filepath") or filename
+                return apply_ytdlp_info(scan_media(video_path), info)
 
         except Exception as e:
             last_exc = e
+            _cookies.report(cookiefile, False, [str(e)])
             is_last_attempt = i == len(attempts) - 1
             if not is_last_attempt and _is_auth_error(e):
                 print(f"[YouTube] Anonymous download needs auth ({e}) — retrying with cookies")
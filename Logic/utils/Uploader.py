@@ -4,70 +4,114 @@ Handles uploading media files to Telegram with proper error handling and cleanup
 """
 
 import os
-import glob
-import json
-import subprocess
 import asyncio
-from typing import Optional, Dict
+from typing import Optional, Awaitable, Callable, Dict, List, Union
 from pathlib import Path
 from aiogram import types
+from aiogram.exceptions import TelegramBadRequest
 from aiogram.types import FSInputFile, InputMediaPhoto, InputMediaVideo
 from languages import get_text
+from Logic.utils.bot_api import LOCAL_BOT_API, upload_file
 from Logic.utils.cleanUp import cleanup 
+from Logic.utils.helpers import _delete_message_safely
+from Logic.utils import media_index
+from Logic.utils.media_probe import probe_videos
+from Logic.utils.media_result import MediaItem, MediaResult, scan_media
+from Logic.utils.storage_chat import stash_media_group
+from Logic.utils.video_compress import compress_video
+from Logic.utils.video_split import split_video
 
 # Telegram Bot API limits
-MAX_CHUNK_SIZE = 45 * 1024 * 1024  # 45MB per media group
-MAX_SINGLE_FILE = 50 * 1024 * 1024 # 50MB per file
 MAX_GROUP_SIZE = 10                 # Max 10 items per media group
+if LOCAL_BOT_API:
+    # Local server (bot_api.py): files go by path, so a media group's
+    # request stays tiny and only the per-file cap applies.
+    MAX_SINGLE_FILE = 2000 * 1024 * 1024                # 2000MB per file
+    MAX_CHUNK_SIZE = MAX_GROUP_SIZE * MAX_SINGLE_FILE
+else:
+    MAX_CHUNK_SIZE = 45 * 1024 * 1024  # 45MB per media group
+    MAX_SINGLE_FILE = 50 * 1024 * 1024 # 50MB per file
 
-# ffmpeg/ffprobe binaries - overridable per environment (e.g. SpoonLab uses
-# the .exe binaries checked into the repo root, spoonserver would point
-# these at a Linux install). Defaults to whatever's on PATH.
-FFMPEG_BIN = os.getenv("FFMPEG_PATH", "ffmpeg")
-FFPROBE_BIN = os.getenv("FFPROBE_PATH", "ffprobe")
+# What to do with a video over MAX_SINGLE_FILE:
+#   "off"      - refuse it (file_too_large) / leave it out of a media group
+#   "compress" - re-encode it to fit (video_compress.py)
+#   "split"    - cut it into parts that fit, no re-encode (video_split.py)
+# Either way a video that can't be made to fit is refused as before.
+OVERSIZE_VIDEO_MODE = os.getenv("OVERSIZE_VIDEO_MODE", "off").lower()
+
+# Size downloaders that can choose a format (yt.py) should aim under, so a
+# smaller rendition is fetched instead of re-encoding a big one. Only in
+# compress mode: otherwise the quality the user picked is kept as is.
+DOWNLOAD_SIZE_HINT = MAX_SINGLE_FILE if OVERSIZE_VIDEO_MODE == "compress" else None
+
+# Called with the items a safe_upload() call just sent and the messages
+# carrying them (same order), e.g. to remember their file_ids for
+# re-sending later without re-uploading. May be a coroutine function.
+OnSent = Callable[[List[MediaItem], List[types.Message]], Optional[Awaitable[None]]]
+
+# Pipelined uploads: how often to look for newly finished files while the
+# download is still running.
+PIPELINE_POLL_INTERVAL_S = 1.0
 
 async def safe_upload(
     message: types.Message, 
-    path: str, 
+    path: Union[str, MediaResult], 
     lang: str, 
-    media_type: str = "video", 
+    media_type: str = None, 
     caption: str = None, 
     title: str = None, 
     performer: str = None, 
-    thumbnail_url: str = None
+    thumbnail_url: str = None,
+    on_sent: Optional[OnSent] = None,
 ):
     """
     Safely upload media to Telegram with proper error handling and cleanup.
     
     Args:
         message: Telegram message object
-        path: File or directory path
+        path: A downloader's MediaResult, or a file or directory path
         lang: Language code for error messages
-        media_type: Type of media (video, audio, photo)
+        media_type: Type of media (video, audio, photo) of a single file,
+            taken from the file itself if not given
         caption: Optional caption for the media
-        title: Title for audio files
-        performer: Performer for audio files
+        title: Title for audio files (default: the MediaResult's)
+        performer: Performer for audio files (default: the MediaResult's)
         thumbnail_url: Thumbnail URL (deprecated, uses file-based thumbnails)
+        on_sent: Optional callback, called with every item sent and its message
     """
     
+    result = path if isinstance(path, MediaResult) else scan_media(path)
+    
     # Validate path exists
-    if not path or not os.path.exists(path):
-        await message.answer(get_text("error_file_not_found", lang))
+    if result is None:
+        if path and os.path.isdir(path):
+            # Download directory without anything we can send
+            await message.answer(get_text("no_media", lang))
+            asyncio.create_task(_delayed_cleanup(path, delay=5))
+        else:
+            await message.answer(get_text("error_file_not_found", lang))
         return
     
-    # Determine cleanup target (entire downloads directory or parent folder)
-    if os.path.isdir(path):
-        folder_to_clean = path
-    else:
-        folder_to_clean = os.path.dirname(path)
+    # Cleanup target (the download directory)
+    folder_to_clean = result.folder
     
     try:
-        if os.path.isdir(path):
-            # Upload multiple files from directory
-            await _upload_directory(message, path, lang, caption)
-        else:
+        if len(result.items) == 1:
             # Upload single file
-            await _upload_single_file(message, path, lang, media_type, caption, title, performer)
+            item = result.items[0]
+            await _upload_single_file(
+                message,
+                item,
+                lang,
+                media_type or item.kind,
+                caption,
+                title or result.title,
+                performer or result.performer,
+                on_sent,
+            )
+        else:
+            # Upload multiple files
+            await _upload_items(message, result.items, lang, caption, on_sent)
     
     except Exception as e:
         print(f"[Uploader] Critical error: {e}")
@@ -97,140 +141,301 @@ async def _delayed_cleanup(path: str, delay: int):
     await cleanup(path, delay=0)  # No additional delay needed
 
 
+async def _notify_sent(on_sent: Optional[OnSent], items: List[MediaItem], messages: List[types.Message]):
+    """Run the on_sent callback - its failure must never fail the upload."""
+    if not on_sent:
+        return
+    try:
+        result = on_sent(items, messages)
+        if result is not None:
+            await result
+    except Exception as e:
+        print(f"[Uploader] on_sent callback failed: {e}")
+
+
+async def send_cached_media(
+    message: types.Message,
+    items: List[tuple],
+    caption: str = None,
+):
+    """
+    Re-send media Telegram already has, by file_id - no download, no upload.
+
+    Args:
+        message: Telegram message object
+        items: (kind, file_id) pairs, kind being "photo" or "video"
+        caption: Optional caption for the first item of each group
+    """
+    for start in range(0, len(items), MAX_GROUP_SIZE):
+        group = []
+        for kind, file_id in items[start:start + MAX_GROUP_SIZE]:
+            item_caption = caption if not group else None
+            if kind == "video":
+                group.append(InputMediaVideo(media=file_id, caption=item_caption, supports_streaming=True))
+            else:
+                group.append(InputMediaPhoto(media=file_id, caption=item_caption))
+        
+        if len(group) == 1:
+            item = group[0]
+            if isinstance(item, InputMediaVideo):
+                await message.answer_video(item.media, caption=item.caption, supports_streaming=True)
+            else:
+                await message.answer_photo(item.media, caption=item.caption)
+        else:
+            await message.answer_media_group(media=group)
+
+
 async def _upload_single_file(
     message: types.Message,
-    file_path: str,
+    item: MediaItem,
     lang: str,
     media_type: str,
     caption: str,
     title: str,
-    performer: str
+    performer: str,
+    on_sent: Optional[OnSent] = None,
 ):
     """
     Upload a single media file with appropriate type handling.
     
     Handles file size validation and proper media type routing.
     """
-    file_size = os.path.getsize(file_path)
+    if media_type == "video":
+        fitted = await _fit_oversized_videos([item])
+        if len(fitted) > 1:
+            await _upload_video_parts(message, fitted, lang, caption, on_sent)
+            return
+        item = fitted[0]
+    file_path = item.path
+    file_size = _file_size(item)
     
     # Check file size limit
     if file_size > MAX_SINGLE_FILE:
         await message.answer(
             get_text("file_too_large", lang).format(
-                size=round(file_size / (1024 * 1024), 2)
+                size=round(file_size / (1024 * 1024), 2),
+                limit=MAX_SINGLE_FILE // (1024 * 1024),
             )
         )
         return
     
+    # Sent these exact bytes before? Then Telegram already has the file.
+    file_id = (await _known_file_ids([item], media_type)).get(item.content_hash)
+    if file_id:
+        try:
+            sent = await _answer_media(message, media_type, file_id, item, caption, title, performer)
+            print(f"[Uploader] ♻️ Sent by reference: {os.path.basename(file_path)}")
+            await _notify_sent(on_sent, [item], [sent])
+            return
+        except TelegramBadRequest as e:
+            await media_index.forget(item.content_hash, media_type)
+            if media_index.is_fitted(item.content_hash):
+                # A compressed copy / part we no longer have a file for -
+                # the next request fits the original again.
+                print(f"[Uploader] Stored file_id of a fitted video refused: {e}")
+                raise
+            print(f"[Uploader] Stored file_id refused, uploading instead: {e}")
+    
     # Find (or generate) thumbnail + metadata for videos, so Telegram can
     # render an instant poster frame instead of a black placeholder while
     # it processes the file itself.
-    thumbnail = _find_thumbnail(file_path) if media_type == "video" else None
-    metadata = _get_video_metadata(file_path) if media_type == "video" else {}
+    if media_type == "video":
+        await _complete_video_metadata([item])
+    thumbnail = _thumbnail_input(item.thumbnail) if media_type in ("video", "audio") else None
     
     try:
-        input_file = FSInputFile(file_path)
-        
-        if media_type == "audio":
-            await message.answer_audio(
-                input_file, 
-                caption=caption, 
-                title=title, 
-                performer=performer,
-                thumbnail=thumbnail
-            )
-        elif media_type == "video":
-            await message.answer_video(
-                input_file, 
-                caption=caption,
-                thumbnail=thumbnail,
-                width=metadata.get("width"),
-                height=metadata.get("height"),
-                duration=metadata.get("duration"),
-                supports_streaming=True,
-            )
-        else:  # photo
-            await message.answer_photo(input_file, caption=caption)
-        
+        sent = await _answer_media(
+            message, media_type, upload_file(file_path), item, caption, title, performer, thumbnail
+        )
         print(f"[Uploader] ✅ Uploaded: {os.path.basename(file_path)}")
+        await _notify_sent(on_sent, [item], [sent])
+        await media_index.remember([(item.content_hash, media_type, sent)])
         
     except Exception as e:
         print(f"[Uploader] ❌ Failed to upload {file_path}: {e}")
         raise
 
 
-async def _upload_directory(
+async def _answer_media(
+    message: types.Message,
+    media_type: str,
+    media: Union[FSInputFile, str],
+    item: MediaItem,
+    caption: str,
+    title: str = None,
+    performer: str = None,
+    thumbnail: Optional[FSInputFile] = None,
+) -> types.Message:
+    """Send one file (an upload or a file_id) as media_type."""
+    if media_type == "audio":
+        return await message.answer_audio(
+            media, 
+            caption=caption, 
+            title=title, 
+            performer=performer,
+            thumbnail=thumbnail
+        )
+    if media_type == "video":
+        return await message.answer_video(
+            media, 
+            caption=caption,
+            thumbnail=thumbnail,
+            width=item.width,
+            height=item.height,
+            duration=item.duration,
+            supports_streaming=True,
+        )
+    return await message.answer_photo(media, caption=caption)
+
+
+async def _upload_video_parts(
     message: types.Message,
-    directory: str,
+    parts: List[MediaItem],
     lang: str,
-    caption: str
+    caption: Optional[str],
+    on_sent: Optional[OnSent] = None,
 ):
     """
-    Upload all media files from a directory.
-    
-    Groups files into media groups where appropriate.
-    Intelligently filters out thumbnails that belong to videos.
+    Send the parts of a split video one after the other, each captioned
+    with its number ("Part 2/3") so they read as a sequence in the chat.
     """
-    # Find all media files
-    valid_extensions = ['*.jpg', '*.jpeg', '*.png', '*.webp', '*.mp4', '*.mov', '*.m4v', '*.mp3']
-    files = []
-    
-    for ext in valid_extensions:
-        files.extend(glob.glob(os.path.join(directory, ext)))
-        files.extend(glob.glob(os.path.join(directory, ext.upper())))
-    
-    # Remove duplicates and sort
-    files = sorted(list(set(files)))
-    
-    if not files:
-        await message.answer(get_text("no_media", lang))
-        return
-    
-    print(f"[Uploader] Found {len(files)} total files in directory")
-    
-    # Separate files into categories and filter thumbnails
-    audio_files = [f for f in files if f.lower().endswith('.mp3')]
+    for number, part in enumerate(parts, 1):
+        part_caption = get_text("video_part", lang).format(n=number, total=len(parts))
+        if caption:
+            part_caption = f"{caption}\n\n{part_caption}"
+        await _upload_single_file(message, part, lang, "video", part_caption, None, None, on_sent)
+
+
+async def _upload_items(
+    message: types.Message,
+    items: List[MediaItem],
+    lang: str,
+    caption: str,
+    on_sent: Optional[OnSent] = None,
+):
+    """
+    Upload the files of a multi-file download.
     
-    # For media files, filter out thumbnails
-    media_files = []
-    for f in files:
-        if f.lower().endswith('.mp3'):
-            continue  # Skip audio, handled separately
-        
-        # Skip if this file is a thumbnail
-        if _is_thumbnail_file(f, files):
-            continue
-        
-        media_files.append(f)
+    Audio goes out one by one, photos and videos in media groups.
+    """
+    audio_items = [item for item in items if item.kind == "audio"]
+    media_items = [item for item in items if item.kind != "audio"]
     
-    print(f"[Uploader] After filtering: {len(media_files)} media files, {len(audio_files)} audio files")
+    print(f"[Uploader] {len(media_items)} media files, {len(audio_items)} audio files")
     
     # Upload audio files individually (they can't be in media groups)
-    for audio_file in audio_files:
+    for audio_item in audio_items:
         try:
             await _upload_single_file(
                 message, 
-                audio_file, 
+                audio_item, 
                 lang, 
                 "audio", 
                 caption, 
                 None, 
-                None
+                None,
+                on_sent,
             )
-            await asyncio.sleep(1)  # Anti-flood delay
         except Exception as e:
-            print(f"[Uploader] Failed to upload audio {audio_file}: {e}")
+            print(f"[Uploader] Failed to upload audio {audio_item.path}: {e}")
     
     # Group and upload media files
-    if media_files:
-        await _upload_media_groups(message, media_files, lang, caption)
+    if media_items:
+        await _upload_media_groups(message, media_items, lang, caption, on_sent)
+
+
+async def pipelined_upload(
+    message: types.Message,
+    download: Awaitable[Optional[str]],
+    target_dir: str,
+    lang: str,
+    caption: str = None,
+    status_msg: types.Message = None,
+) -> Optional[int]:
+    """
+    Upload a photo/video gallery while it is still downloading.
+
+    Runs the download coroutine (which must write into target_dir) and
+    polls target_dir as it goes: every time a full media group's worth of
+    finished files is there, it is sent straight away, so the first
+    media shows up long before the last item has downloaded. Whatever is
+    left is sent once the download returns.
+
+    In-progress files (gallery-dl / yt-dlp write them as *.part and rename
+    on completion) don't match the media extensions, so only finished
+    files are ever picked up.
+
+    Args:
+        message: Telegram message object
+        download: Download coroutine, e.g. download_pinterest_board(url, target_dir)
+        target_dir: Directory the download writes into
+        lang: Language code for error messages
+        caption: Optional caption, on the first media group only
+        status_msg: Optional status message, deleted before the first upload
+
+    Returns:
+        How many photos/videos were handed to the upload (0 if the
+        download produced none - "no media" is sent then), or None if
+        nothing was downloaded at all (nothing is sent, so the caller can
+        show its own failure message)
+    """
+    task = asyncio.ensure_future(download)
+    sent = set()
+
+    async def send(batch: List[MediaItem]):
+        nonlocal status_msg
+        if status_msg:
+            await _delete_message_safely(status_msg)
+            status_msg = None
+        first = not sent
+        sent.update(item.path for item in batch)
+        await _upload_media_groups(message, batch, lang, caption if first else None)
+
+    try:
+        while not task.done():
+            await asyncio.wait({task}, timeout=PIPELINE_POLL_INTERVAL_S)
+            if task.done():
+                break
+            ready = _pending_gallery_files(target_dir, sent)
+            while len(ready) >= MAX_GROUP_SIZE:
+                await send(ready[:MAX_GROUP_SIZE])
+                ready = ready[MAX_GROUP_SIZE:]
+
+        result = task.result()
+        remaining = _pending_gallery_files(target_dir, sent)
+
+        if not result and not sent and not remaining:
+            return None
+        if remaining:
+            for start in range(0, len(remaining), MAX_GROUP_SIZE):
+                await send(remaining[start:start + MAX_GROUP_SIZE])
+        elif not sent:
+            await message.answer(get_text("no_media", lang))
+        return len(sent)
+
+    finally:
+        if not task.done():
+            task.cancel()
+        if status_msg:
+            await _delete_message_safely(status_msg)
+        print(f"[Uploader] Scheduling cleanup for: {target_dir}")
+        asyncio.create_task(_delayed_cleanup(target_dir, delay=5))
+
+
+def _pending_gallery_files(directory: str, sent: set) -> List[MediaItem]:
+    """Finished photos/videos in directory that haven't been sent yet."""
+    result = scan_media(directory)
+    if result is None:
+        return []
+    return [item for item in result.items if item.kind != "audio" and item.path not in sent]
 
 
 async def _upload_media_groups(
     message: types.Message,
-    files: list,
+    items: List[MediaItem],
     lang: str,
-    caption: str
+    caption: str,
+    on_sent: Optional[OnSent] = None,
 ):
     """
     Upload media files in optimized groups.
@@ -239,45 +444,54 @@ async def _upload_media_groups(
     Groups files respecting Telegram's 10-item and 45MB limits.
     """
     current_group = []
+    current_items: List[MediaItem] = []
     current_group_size = 0
+
+    items = await _fit_oversized_videos(items)
+    known = await _known_file_ids(items)
+
+    # Probe the videos of the batch the downloader didn't fully describe,
+    # up front and concurrently, instead of one after the other while
+    # building the groups. Videos sent by reference need none of it.
+    await _complete_video_metadata([
+        item for item in items
+        if item.kind == "video" and item.content_hash not in known and _fits_single_upload(item)
+    ])
     
     async def send_current_group():
         """Send accumulated media group and reset counters."""
-        nonlocal current_group, current_group_size
+        nonlocal current_group, current_items, current_group_size
         
         if not current_group:
             return
         
         try:
-            await message.answer_media_group(media=current_group)
+            # With a storage chat configured the files go up once, there -
+            # from here on the group and its fallback only use file_ids.
+            current_group = await stash_media_group(message.bot, current_group)
+            sent = await message.answer_media_group(media=current_group)
             print(f"[Uploader] ✅ Sent media group with {len(current_group)} items")
-            await asyncio.sleep(2)  # Anti-flood delay
+            await _notify_sent(on_sent, current_items, sent)
+            await media_index.remember([
+                (item.content_hash, item.kind, sent_message)
+                for item, sent_message in zip(current_items, sent)
+            ])
         except Exception as e:
             print(f"[Uploader] ❌ Media group failed: {e}")
             # Fallback: Send files individually
-            for item in current_group:
-                try:
-                    if isinstance(item, InputMediaVideo):
-                        await message.answer_video(
-                            item.media,
-                            thumbnail=item.thumbnail,
-                            width=item.width,
-                            height=item.height,
-                            duration=item.duration,
-                            supports_streaming=True,
-                        )
-                    else:
-                        await message.answer_photo(item.media)
-                    await asyncio.sleep(1)
-                except Exception as e2:
-                    print(f"[Uploader] Fallback upload failed: {e2}")
+            for media, item in zip(current_group, current_items):
+                sent = await _send_group_item_alone(message, media, item, item.content_hash in known)
+                if sent:
+                    await _notify_sent(on_sent, [item], [sent])
+                    await media_index.remember([(item.content_hash, item.kind, sent)])
         
         finally:
-            current_group, current_group_size = [], 0
+            current_group, current_items, current_group_size = [], [], 0
     
-    for file_path in files:
+    for item in items:
+        file_path = item.path
         try:
-            file_size = os.path.getsize(file_path)
+            file_size = _file_size(item)
             
             # Skip files that are too large
             if file_size > MAX_SINGLE_FILE:
@@ -289,35 +503,36 @@ async def _upload_media_groups(
                 await send_current_group()
             
             # Determine media type
-            is_video = file_path.lower().endswith(('.mp4', '.mov', '.m4v'))
-            is_photo = file_path.lower().endswith(('.jpg', '.jpeg', '.png', '.webp'))
+            is_video = item.kind == "video"
+            is_photo = item.kind == "photo"
             
             if not (is_video or is_photo):
                 continue
             
-            # Create media item
-            file_input = FSInputFile(file_path)
+            # Create media item - by reference if Telegram has the file
+            file_id = known.get(item.content_hash)
+            file_input = file_id or upload_file(file_path)
             
             # Add caption to first item only
             item_caption = caption if (not current_group and caption) else None
             
             if is_video:
-                thumbnail = _find_thumbnail(file_path)
-                metadata = _get_video_metadata(file_path)
                 media_item = InputMediaVideo(
                     media=file_input,
-                    thumbnail=thumbnail,
+                    thumbnail=None if file_id else _thumbnail_input(item.thumbnail),
                     caption=item_caption,
-                    width=metadata.get("width"),
-                    height=metadata.get("height"),
-                    duration=metadata.get("duration"),
+                    width=item.width,
+                    height=item.height,
+                    duration=item.duration,
                     supports_streaming=True,
                 )
             else:
                 media_item = InputMediaPhoto(media=file_input, caption=item_caption)
             
             current_group.append(media_item)
-            current_group_size += file_size
+            current_items.append(item)
+            if not file_id:
+                current_group_size += file_size
             
         except Exception as e:
             print(f"[Uploader] Error processing {file_path}: {e}")
@@ -326,151 +541,160 @@ async def _upload_media_groups(
     await send_current_group()
 
 
-def _get_video_metadata(video_path: str) -> Dict:
+async def _send_group_item_alone(
+    message: types.Message,
+    media: Union[InputMediaPhoto, InputMediaVideo],
+    item: MediaItem,
+    by_reference: bool,
+) -> Optional[types.Message]:
     """
-    Probe a video with ffprobe for width/height/duration.
-
-    Telegram uses this metadata (together with the thumbnail) to render the
-    message instantly. Without it, Telegram has to inspect/process the raw
-    video file itself before it can show anything, which is what produces
-    the black placeholder on larger files.
-
-    Returns an empty dict if ffprobe is unavailable or the probe fails -
-    callers already treat missing keys as "let Telegram figure it out",
-    so this fails safe.
+    Send one item of a media group that failed as a whole. If it went by
+    a file_id from the index and that is refused too, the file is uploaded
+    instead - a stale file_id is the likeliest reason the group failed.
     """
+    thumbnail = media.thumbnail if isinstance(media, InputMediaVideo) else None
     try:
-        result = subprocess.run(
-            [
-                FFPROBE_BIN, "-v", "error",
-                "-select_streams", "v:0",
-                "-show_entries", "stream=width,height:format=duration",
-                "-of", "json",
-                video_path,
-            ],
-            capture_output=True, text=True, timeout=15,
+        return await _answer_media(message, item.kind, media.media, item, media.caption, thumbnail=thumbnail)
+    except Exception as e:
+        if not by_reference:
+            print(f"[Uploader] Fallback upload failed: {e}")
+            return None
+        await media_index.forget(item.content_hash, item.kind)
+        if media_index.is_fitted(item.content_hash):
+            print(f"[Uploader] Stored file_id of a fitted video refused: {e}")
+            return None
+        print(f"[Uploader] Stored file_id refused, uploading instead: {e}")
+
+    try:
+        if item.kind == "video":
+            await _complete_video_metadata([item])
+        return await _answer_media(
+            message, item.kind, upload_file(item.path), item, media.caption,
+            thumbnail=_thumbnail_input(item.thumbnail),
         )
-        data = json.loads(result.stdout or "{}")
-        streams = data.get("streams") or [{}]
-        stream = streams[0]
-        duration_raw = data.get("format", {}).get("duration")
-
-        return {
-            "width": stream.get("width"),
-            "height": stream.get("height"),
-            "duration": int(float(duration_raw)) if duration_raw else None,
-        }
-    except FileNotFoundError:
-        print("[Uploader] ffprobe not found on PATH — skipping video metadata.")
-        return {}
     except Exception as e:
-        print(f"[Uploader] ffprobe metadata failed for {video_path}: {e}")
-        return {}
+        print(f"[Uploader] Fallback upload failed: {e}")
+        return None
 
 
-def _generate_thumbnail(video_path: str) -> Optional[str]:
-    """
-    Extract a poster frame into a sidecar jpg next to the video, e.g.
-    media_001.mp4 -> media_001.jpg.
+def _file_size(item: MediaItem) -> int:
+    if item.size is None:
+        item.size = os.path.getsize(item.path)
+    return item.size
 
-    This matches the exact naming convention _find_thumbnail already looks
-    for, and _is_thumbnail_file already filters that pattern out of
-    carousel uploads - so generating it here is a drop-in fix with no
-    other logic needing to change.
 
-    Grabs the frame at 1s in (skips potential black opening frames some
-    platforms leave), falling back to the very first frame for clips
-    shorter than 1s.
-    """
-    base_name = os.path.splitext(video_path)[0]
-    thumb_path = base_name + ".jpg"
+def _fits_single_upload(item: MediaItem) -> bool:
+    try:
+        return _file_size(item) <= MAX_SINGLE_FILE
+    except OSError:
+        return False
 
-    if os.path.exists(thumb_path):
-        return thumb_path
 
-    def _extract(seek_args: list) -> bool:
-        try:
-            subprocess.run(
-                [FFMPEG_BIN, "-y", *seek_args, "-i", video_path,
-                 "-frames:v", "1", "-q:v", "2", thumb_path],
-                capture_output=True, timeout=15,
-            )
-        except Exception as e:
-            print(f"[Uploader] ffmpeg thumbnail generation failed for {video_path}: {e}")
-            return False
-        return os.path.exists(thumb_path) and os.path.getsize(thumb_path) > 0
+async def _fit_oversized_videos(items: List[MediaItem]) -> List[MediaItem]:
+    """
+    items, with every video over MAX_SINGLE_FILE replaced according to
+    OVERSIZE_VIDEO_MODE: by a compressed copy ("compress") or by its parts,
+    in order, in its place ("split"). Videos that can't be made to fit stay
+    as they are (and are refused as too large).
 
-    try:
-        if _extract(["-ss", "00:00:01"]):
-            return thumb_path
-        # Clip shorter than 1s - retry from the very start.
-        if _extract([]):
-            return thumb_path
-    except FileNotFoundError:
-        print("[Uploader] ffmpeg not found on PATH — cannot generate thumbnails.")
+    An original whose copy/parts were sent before (media_index.fitted_keys)
+    isn't run through ffmpeg again: it's replaced by stand-ins that only
+    carry the index keys, and so go out by file_id.
+    """
+    if OVERSIZE_VIDEO_MODE == "compress":
+        fit, action = compress_video, "Compressing"
+    elif OVERSIZE_VIDEO_MODE == "split":
+        fit, action = split_video, "Splitting"
+    else:
+        return items
+    oversized = [item for item in items if item.kind == "video" and not _fits_single_upload(item)]
+    if not oversized:
+        return items
+    
+    replacements = {}
+    if media_index.DEDUP_ENABLED:
+        await media_index.hash_items(oversized)
+        sent_before = await asyncio.gather(*(
+            media_index.fitted_keys(item.content_hash, OVERSIZE_VIDEO_MODE) for item in oversized
+        ))
+        for item, keys in zip(oversized, sent_before):
+            if keys:
+                # Never uploaded, so size 0: only the file_id is sent.
+                replacements[id(item)] = [
+                    MediaItem(path=item.path, kind="video", size=0, content_hash=key) for key in keys
+                ]
+    
+    to_fit = [item for item in oversized if id(item) not in replacements]
+    if to_fit:
+        print(f"[Uploader] {action} {len(to_fit)} video(s) over {MAX_SINGLE_FILE // (1024 * 1024)}MB")
+        results = await asyncio.gather(*(fit(item, MAX_SINGLE_FILE) for item in to_fit))
+        for old, new in zip(to_fit, results):
+            if not new:
+                continue
+            parts = new if isinstance(new, list) else [new]
+            if old.content_hash:
+                for number, part in enumerate(parts, 1):
+                    part.content_hash = media_index.fitted_hash(
+                        old.content_hash, OVERSIZE_VIDEO_MODE, number, len(parts)
+                    )
+            replacements[id(old)] = new
+    
+    fitted = []
+    for item in items:
+        replacement = replacements.get(id(item), item)
+        if isinstance(replacement, list):
+            fitted.extend(replacement)
+        else:
+            fitted.append(replacement)
+    return fitted
 
-    return None
+
+async def _known_file_ids(items: List[MediaItem], kind: str = None) -> Dict[str, str]:
+    """
+    {content_hash: file_id} for the items whose exact content was sent
+    before (as kind, default each item's own kind) - see media_index.py.
+    """
+    if not media_index.DEDUP_ENABLED:
+        return {}
+    await media_index.hash_items(items)
+    file_ids = await media_index.lookup([(item.content_hash, kind or item.kind) for item in items])
+    return {item.content_hash: file_id for item, file_id in zip(items, file_ids) if file_id}
 
 
-def _find_thumbnail(video_path: str) -> Optional[FSInputFile]:
+async def _complete_video_metadata(items: List[MediaItem]):
     """
-    Find thumbnail file for a video.
-    
-    Looks for an image file with the same base name as the video first
-    (e.g. video.mp4 -> video.jpg). If none exists, generates one from the
-    video itself via ffmpeg.
-    
-    Args:
-        video_path: Path to video file
-        
-    Returns:
-        FSInputFile of thumbnail or None
+    Fill in width/height/duration/thumbnail of videos the downloader didn't
+    fully describe. Videos it did (e.g. from yt-dlp's info dict, with a
+    thumbnail written alongside) aren't probed at all.
     """
-    base_name = os.path.splitext(video_path)[0]
-    
-    # Check for matching thumbnail with various extensions
-    for ext in ['.jpg', '.jpeg', '.png', '.webp']:
-        thumb_path = base_name + ext
-        if os.path.exists(thumb_path):
-            try:
-                return FSInputFile(thumb_path)
-            except Exception as e:
-                print(f"[Uploader] Failed to load thumbnail {thumb_path}: {e}")
-
-    generated = _generate_thumbnail(video_path)
-    if generated:
-        try:
-            return FSInputFile(generated)
-        except Exception as e:
-            print(f"[Uploader] Failed to load generated thumbnail {generated}: {e}")
+    missing = [item for item in items if not item.has_video_metadata]
+    if not missing:
+        return
     
-    return None
+    probes = await probe_videos(item.path for item in missing)
+    for item in missing:
+        metadata = probes.get(item.path, {})
+        item.width = item.width or metadata.get("width")
+        item.height = item.height or metadata.get("height")
+        if item.duration is None:
+            item.duration = metadata.get("duration")
+        item.thumbnail = item.thumbnail or metadata.get("thumbnail")
 
 
-def _is_thumbnail_file(file_path: str, all_files: list) -> bool:
+def _thumbnail_input(thumb_path: Optional[str]) -> Optional[FSInputFile]:
     """
-    Check if a file is a thumbnail for a video.
-    
-    A file is considered a thumbnail if:
-    1. It's an image file (.jpg, .jpeg, .png, .webp)
-    2. A video file with the same base name exists
+    FSInputFile for a thumbnail image, if there is one.
     
     Args:
-        file_path: Path to potential thumbnail
-        all_files: List of all files in directory
+        thumb_path: Local thumbnail path (downloaded or generated)
         
     Returns:
-        True if file is a thumbnail, False otherwise
+        FSInputFile of thumbnail or None
     """
-    if not file_path.lower().endswith(('.jpg', '.jpeg', '.png', '.webp')):
-        return False
-    
-    base_name = os.path.splitext(file_path)[0]
-    
-    # Check if corresponding video exists
-    for ext in ['.mp4', '.mov', '.m4v']:
-        video_path = base_name + ext
-        if video_path in all_files or os.path.exists(video_path):
-            return True
-    
-    return False
\ No newline at end of file
+    if not thumb_path:
+        return None
+    try:
+        return FSInputFile(thumb_path)
+    except Exception as e:
+        print(f"[Uploader] Failed to load thumbnail {thumb_path}: {e}")
+        return None
\ No newline at end of file
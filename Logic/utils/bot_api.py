@@ -0,0 +1,57 @@
+"""
+Bot API
+Which Telegram Bot API server the bot talks to, and what that means for
+uploads.
+
+By default that's the public api.telegram.org: every file is streamed to
+it over HTTP as a multipart upload and may be at most 50MB.
+
+Setting TELEGRAM_API_URL (e.g. http://telegram-bot-api:8081) points the
+bot at a self-hosted telegram-bot-api server instead, which must run with
+--local. Then:
+    - files may be up to 2000MB each
+    - files are passed as file:// URIs of their path on disk - the server
+      reads them itself, so no bytes go through the bot's HTTP session.
+      The server has to see the same paths as the bot (same host, or the
+      downloads directory mounted at the same place in both containers).
+"""
+
+import os
+from pathlib import Path
+from typing import Optional, Union
+
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
+from aiogram.types import FSInputFile
+
+TELEGRAM_API_URL = os.getenv("TELEGRAM_API_URL", "").rstrip("/")
+LOCAL_BOT_API = bool(TELEGRAM_API_URL)
+
+# A local server answers a send only after the file has gone up to
+# Telegram, which for a 2GB video takes far longer than aiogram's default
+# 60s request timeout.
+LOCAL_REQUEST_TIMEOUT_S = int(os.getenv("TELEGRAM_API_TIMEOUT_S", "900"))
+
+
+def create_session() -> Optional[AiohttpSession]:
+    """
+    Session for Bot(session=...) that talks to TELEGRAM_API_URL, or None
+    for aiogram's default (the public Bot API).
+    """
+    if not LOCAL_BOT_API:
+        return None
+    return AiohttpSession(
+        api=TelegramAPIServer.from_base(TELEGRAM_API_URL, is_local=True),
+        timeout=LOCAL_REQUEST_TIMEOUT_S,
+    )
+
+
+def upload_file(path: str) -> Union[FSInputFile, str]:
+    """
+    What to pass to send_video/send_audio/InputMedia* for a file on disk:
+    its file:// URI with a local Bot API server, else an FSInputFile that
+    aiogram streams up.
+    """
+    if LOCAL_BOT_API:
+        return Path(path).resolve().as_uri()
+    return FSInputFile(path)
@@ -0,0 +1,174 @@
+"""
+Circuit Breakers
+Per-dependency circuit breakers for the external services the downloaders
+lean on (TikWM mirrors, Spotify oEmbed, each platform's gallery-dl/yt-dlp
+extractors).
+
+While a dependency is down, every request would otherwise sit through its
+full timeout before falling through to the next tier. A breaker that has
+seen FAILURE_THRESHOLD consecutive failures "opens" and the tier is skipped
+outright; after RESET_TIMEOUT_S one probe request is let through
+("half-open") - if it succeeds the breaker closes again, if not it stays
+open for another RESET_TIMEOUT_S. So an outage costs one timeout, not one
+timeout per user.
+
+Only failures that say something about the dependency itself should be
+recorded as failures (timeouts, connection errors, 5xx/429) - a deleted
+post means the service answered fine.
+
+Breakers are created on first use through get_breaker() and listed in the
+admin menu via breaker_status_lines().
+"""
+
+import os
+import time
+import logging
+import threading
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Consecutive failures before a breaker opens. Override via env var.
+FAILURE_THRESHOLD = int(os.getenv("BREAKER_FAILURE_THRESHOLD", "5"))
+
+# Seconds an open breaker waits before letting a probe request through.
+RESET_TIMEOUT_S = float(os.getenv("BREAKER_RESET_S", "60"))
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """Thread-safe closed/open/half-open breaker for one dependency."""
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = FAILURE_THRESHOLD,
+        reset_timeout_s: float = RESET_TIMEOUT_S,
+    ) -> None:
+        self.name = name
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_timeout_s = reset_timeout_s
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.probe_started_at: Optional[float] = None
+        # Lifetime counters, for the admin menu.
+        self.successes = 0
+        self.failures = 0
+        self.rejected = 0
+        self.times_opened = 0
+        self._lock = threading.Lock()
+
+    def _set_state(self, state: str) -> None:
+        if state != self.state:
+            logger.warning(f"[Breaker] {self.name}: {self.state} -> {state}")
+            self.state = state
+
+    def allow(self) -> bool:
+        """True if a request may go to the dependency right now. In
+        half-open state only one probe is let through at a time."""
+        with self._lock:
+            now = time.monotonic()
+            if self.state == OPEN and now - self.opened_at >= self.reset_timeout_s:
+                self._set_state(HALF_OPEN)
+                self.probe_started_at = None
+
+            if self.state == CLOSED:
+                return True
+            if self.state == HALF_OPEN:
+                # A probe whose caller never reported back must not wedge
+                # the breaker - after a reset period, let another through.
+                if self.probe_started_at is None or now - self.probe_started_at >= self.reset_timeout_s:
+                    self.probe_started_at = now
+                    return True
+
+            self.rejected += 1
+            return False
+
+    def record(self, ok: bool) -> None:
+        """Report the outcome of a request that allow() let through."""
+        with self._lock:
+            if ok:
+                self.successes += 1
+                self.consecutive_failures = 0
+                self.probe_started_at = None
+                self._set_state(CLOSED)
+                return
+
+            self.failures += 1
+            self.consecutive_failures += 1
+            if self.state == HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+                if self.state != OPEN:
+                    self.times_opened += 1
+                self.opened_at = time.monotonic()
+                self.probe_started_at = None
+                self._set_state(OPEN)
+
+    def release(self) -> None:
+        """Hand back a request allow() let through that was never made -
+        nothing is recorded, a half-open breaker just lets the next probe
+        through."""
+        with self._lock:
+            if self.state == HALF_OPEN:
+                self.probe_started_at = None
+
+    def record_success(self) -> None:
+        self.record(True)
+
+    def record_failure(self) -> None:
+        self.record(False)
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            retry_in = None
+            if self.state == OPEN:
+                retry_in = max(0.0, self.reset_timeout_s - (time.monotonic() - self.opened_at))
+            return {
+                "name": self.name,
+                "state": self.state,
+                "consecutive_failures": self.consecutive_failures,
+                "successes": self.successes,
+                "failures": self.failures,
+                "rejected": self.rejected,
+                "times_opened": self.times_opened,
+                "retry_in_s": retry_in,
+            }
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_registry_lock = threading.Lock()
+
+
+def get_breaker(name: str) -> CircuitBreaker:
+    """Process-wide breaker for a dependency, created on first use."""
+    with _registry_lock:
+        breaker = _breakers.get(name)
+        if breaker is None:
+            breaker = _breakers[name] = CircuitBreaker(name)
+        return breaker
+
+
+def all_breakers() -> List[CircuitBreaker]:
+    with _registry_lock:
+        return sorted(_breakers.values(), key=lambda b: b.name)
+
+
+_STATE_ICONS = {CLOSED: "🟢", HALF_OPEN: "🟡", OPEN: "🔴"}
+
+
+def breaker_status_lines() -> List[str]:
+    """One human-readable line per breaker, for the admin menu."""
+    lines = []
+    for breaker in all_breakers():
+        snap = breaker.snapshot()
+        line = (
+            f"{_STATE_ICONS[snap['state']]} {snap['name']} - {snap['state']} "
+            f"(ok {snap['successes']}, failed {snap['failures']}, skipped {snap['rejected']})"
+        )
+        if snap["retry_in_s"] is not None:
+            line += f", probe in {int(snap['retry_in_s'])}s"
+        lines.append(line)
+    return lines
@@ -0,0 +1,356 @@
+"""
+Container Header
+Reads width, height and duration straight out of MP4/MOV and WebM/MKV
+headers, in-process, so the uploader doesn't need an ffmpeg run just to
+learn a video's size.
+
+    - MP4/MOV: walks the box tree to moov/mvhd (timescale + duration) and
+      each trak's tkhd (presentation size + rotation matrix), using the
+      first track whose hdlr says "vide".
+    - WebM/MKV: walks the EBML tree to Segment/Info (TimecodeScale +
+      Duration) and Segment/Tracks (PixelWidth/PixelHeight of the first
+      video track), stopping at the first Cluster.
+
+The file is memory-mapped and only the bytes of the boxes/elements on
+that path are touched - a moov atom at the end of a 50MB file costs a
+seek, not a read of the whole file.
+
+read_video_header() returns None whenever anything is missing or odd
+(fragmented MP4 without a duration, truncated file, other containers) -
+callers fall back to ffmpeg for those.
+
+read_mp4_keyframes() goes one level deeper into an MP4's video track -
+the sample tables (stts/stss/stsz) - for the time and byte position of
+every keyframe, so a video can be split into parts of a given size
+without an ffmpeg pass to find them.
+"""
+
+import mmap
+import struct
+from array import array
+from itertools import accumulate
+from typing import Dict, Iterator, List, Optional, Tuple
+
+# EBML element ids (with their length-marker bits, as they appear on disk).
+_EBML_HEADER = 0x1A45DFA3
+_SEGMENT = 0x18538067
+_INFO = 0x1549A966
+_TIMECODE_SCALE = 0x2AD7B1
+_DURATION = 0x4489
+_TRACKS = 0x1654AE6B
+_TRACK_ENTRY = 0xAE
+_TRACK_TYPE = 0x83
+_VIDEO = 0xE0
+_PIXEL_WIDTH = 0xB0
+_PIXEL_HEIGHT = 0xBA
+_CLUSTER = 0x1F43B675
+
+_EBML_VIDEO_TRACK = 1
+_EBML_UNKNOWN_SIZE = -1
+
+
+# --- MP4 / MOV ---
+
+def _mp4_boxes(buf, start: int, end: int) -> Iterator[Tuple[bytes, int, int]]:
+    """(type, payload_start, box_end) for each box in buf[start:end]."""
+    pos = start
+    while pos + 8 <= end:
+        size, box_type = struct.unpack_from(">I4s", buf, pos)
+        header = 8
+        if size == 1:
+            size = struct.unpack_from(">Q", buf, pos + 8)[0]
+            header = 16
+        elif size == 0:
+            size = end - pos
+        if size < header or pos + size > end:
+            return
+        yield box_type, pos + header, pos + size
+        pos += size
+
+
+def _parse_mvhd(buf, pos: int) -> Optional[float]:
+    version = buf[pos]
+    if version == 1:
+        timescale, duration = struct.unpack_from(">IQ", buf, pos + 20)
+    else:
+        timescale, duration = struct.unpack_from(">II", buf, pos + 12)
+    if not timescale or not duration or duration in (0xFFFFFFFF, 0xFFFFFFFFFFFFFFFF):
+        return None
+    return duration / timescale
+
+
+def _parse_tkhd(buf, pos: int) -> Tuple[int, int, bool]:
+    """(width, height, rotated_90) from a tkhd payload."""
+    version = buf[pos]
+    # version/flags + times/ids/duration (v0: 20 bytes, v1: 32) + reserved(8)
+    # + layer/alternate group/volume/reserved (8) -> matrix
+    matrix_pos = pos + (4 + 32 if version == 1 else 4 + 20) + 16
+    a, b = struct.unpack_from(">ii", buf, matrix_pos)
+    width, height = struct.unpack_from(">II", buf, matrix_pos + 36)
+    # 16.16 fixed point; a 90/270 degree rotation has a == 0, |b| == 1.0
+    rotated = a == 0 and abs(b) == 0x10000
+    return width >> 16, height >> 16, rotated
+
+
+def _trak_is_video(buf, start: int, end: int) -> bool:
+    for box_type, payload, box_end in _mp4_boxes(buf, start, end):
+        if box_type == b"mdia":
+            for inner_type, inner_payload, _ in _mp4_boxes(buf, payload, box_end):
+                if inner_type == b"hdlr":
+                    return buf[inner_payload + 8:inner_payload + 12] == b"vide"
+    return False
+
+
+def _read_mp4(buf) -> Optional[Dict]:
+    for box_type, payload, box_end in _mp4_boxes(buf, 0, len(buf)):
+        if box_type != b"moov":
+            continue
+
+        duration = None
+        size = None
+        for inner_type, inner_payload, inner_end in _mp4_boxes(buf, payload, box_end):
+            if inner_type == b"mvhd":
+                duration = _parse_mvhd(buf, inner_payload)
+            elif inner_type == b"trak" and size is None and _trak_is_video(buf, inner_payload, inner_end):
+                for trak_type, trak_payload, _ in _mp4_boxes(buf, inner_payload, inner_end):
+                    if trak_type == b"tkhd":
+                        width, height, rotated = _parse_tkhd(buf, trak_payload)
+                        size = (height, width) if rotated else (width, height)
+                        break
+
+        if duration is None or not size or not all(size):
+            return None
+        return {"width": size[0], "height": size[1], "duration": int(duration)}
+    return None
+
+
+def _find_box(buf, start: int, end: int, box_type: bytes) -> Optional[Tuple[int, int]]:
+    """(payload_start, box_end) of the first box_type in buf[start:end]."""
+    for found_type, payload, box_end in _mp4_boxes(buf, start, end):
+        if found_type == box_type:
+            return payload, box_end
+    return None
+
+
+def _parse_mdhd_timescale(buf, pos: int) -> int:
+    # version/flags + creation/modification time (v0: 4+4, v1: 8+8)
+    return struct.unpack_from(">I", buf, pos + (20 if buf[pos] == 1 else 12))[0]
+
+
+def _uint32_table(buf, pos: int, count: int) -> array:
+    table = array("I", bytes(buf[pos:pos + 4 * count]))
+    if table.itemsize != 4 or len(table) != count:
+        raise ValueError("truncated sample table")
+    if struct.pack("=I", 1) != struct.pack(">I", 1):
+        table.byteswap()
+    return table
+
+
+def _sample_ticks(buf, stts: int, samples: List[int]) -> List[int]:
+    """Decode time (in media timescale ticks) of each 1-based sample number
+    in samples (ascending), from an stts payload."""
+    entry_count = struct.unpack_from(">I", buf, stts + 4)[0]
+    ticks = []
+    wanted = iter(samples)
+    target = next(wanted, None)
+    sample, t = 1, 0
+    for i in range(entry_count):
+        if target is None:
+            break
+        count, delta = struct.unpack_from(">II", buf, stts + 8 + 8 * i)
+        while target is not None and target < sample + count:
+            ticks.append(t + (target - sample) * delta)
+            target = next(wanted, None)
+        sample += count
+        t += count * delta
+    return ticks
+
+
+def _read_mp4_keyframes(buf) -> Optional[Dict]:
+    moov = _find_box(buf, 0, len(buf), b"moov")
+    if not moov:
+        return None
+    mvhd = _find_box(buf, *moov, b"mvhd")
+    duration = _parse_mvhd(buf, mvhd[0]) if mvhd else None
+    if not duration:
+        return None
+
+    for box_type, payload, box_end in _mp4_boxes(buf, *moov):
+        if box_type != b"trak" or not _trak_is_video(buf, payload, box_end):
+            continue
+        mdia = _find_box(buf, payload, box_end, b"mdia")
+        mdhd = mdia and _find_box(buf, *mdia, b"mdhd")
+        minf = mdia and _find_box(buf, *mdia, b"minf")
+        stbl = minf and _find_box(buf, *minf, b"stbl")
+        if not (mdhd and stbl):
+            return None
+        timescale = _parse_mdhd_timescale(buf, mdhd[0])
+        stts = _find_box(buf, *stbl, b"stts")
+        stsz = _find_box(buf, *stbl, b"stsz")
+        stss = _find_box(buf, *stbl, b"stss")
+        if not (timescale and stts and stsz):
+            return None
+
+        uniform_size, sample_count = struct.unpack_from(">II", buf, stsz[0] + 4)
+        if not sample_count:
+            return None
+        if uniform_size:
+            offsets = [uniform_size * n for n in range(sample_count + 1)]
+        else:
+            offsets = [0, *accumulate(_uint32_table(buf, stsz[0] + 12, sample_count))]
+
+        if stss:
+            # No stss at all means every sample is a keyframe.
+            count = struct.unpack_from(">I", buf, stss[0] + 4)[0]
+            sync = [n for n in _uint32_table(buf, stss[0] + 8, count) if 1 <= n <= sample_count]
+        else:
+            sync = list(range(1, sample_count + 1))
+        if not sync:
+            return None
+
+        ticks = _sample_ticks(buf, stts[0], sync)
+        return {
+            "duration": duration,
+            "video_bytes": offsets[-1],
+            "keyframes": [
+                (tick / timescale, offsets[n - 1]) for tick, n in zip(ticks, sync)
+            ],
+        }
+    return None
+
+
+# --- WebM / Matroska ---
+
+def _ebml_vint(buf, pos: int, keep_marker: bool) -> Tuple[int, int]:
+    """(value, length) of the EBML variable-length integer at pos. Sizes
+    with every value bit set mean "unknown", returned as -1."""
+    first = buf[pos]
+    length = 1
+    mask = 0x80
+    while length <= 8 and not first & mask:
+        length += 1
+        mask >>= 1
+    if length > 8:
+        raise ValueError("invalid EBML vint")
+    value = first if keep_marker else first & (mask - 1)
+    for i in range(1, length):
+        value = (value << 8) | buf[pos + i]
+    if not keep_marker and value == (1 << (7 * length)) - 1:
+        return _EBML_UNKNOWN_SIZE, length
+    return value, length
+
+
+def _ebml_elements(buf, start: int, end: int) -> Iterator[Tuple[int, int, int]]:
+    """(id, payload_start, element_end) for each element in buf[start:end].
+    An element of unknown size (live-written Segment/Cluster) runs to end."""
+    pos = start
+    while pos < end:
+        element_id, id_len = _ebml_vint(buf, pos, keep_marker=True)
+        size, size_len = _ebml_vint(buf, pos + id_len, keep_marker=False)
+        payload = pos + id_len + size_len
+        element_end = end if size == _EBML_UNKNOWN_SIZE else min(payload + size, end)
+        yield element_id, payload, element_end
+        pos = element_end
+
+
+def _ebml_uint(buf, start: int, end: int) -> int:
+    return int.from_bytes(buf[start:end], "big")
+
+
+def _ebml_float(buf, start: int, end: int) -> Optional[float]:
+    if end - start == 4:
+        return struct.unpack_from(">f", buf, start)[0]
+    if end - start == 8:
+        return struct.unpack_from(">d", buf, start)[0]
+    return None
+
+
+def _read_webm(buf) -> Optional[Dict]:
+    elements = _ebml_elements(buf, 0, len(buf))
+    first = next(elements, None)
+    if not first or first[0] != _EBML_HEADER:
+        return None
+    segment = next(elements, None)
+    if not segment or segment[0] != _SEGMENT:
+        return None
+
+    timecode_scale = 1_000_000  # ns per tick, Matroska default
+    duration_ticks = None
+    size = None
+
+    for element_id, payload, element_end in _ebml_elements(buf, segment[1], segment[2]):
+        if element_id == _CLUSTER:
+            break  # media data - muxers write Info and Tracks before it
+        if element_id == _INFO:
+            for child_id, child_payload, child_end in _ebml_elements(buf, payload, element_end):
+                if child_id == _TIMECODE_SCALE:
+                    timecode_scale = _ebml_uint(buf, child_payload, child_end)
+                elif child_id == _DURATION:
+                    duration_ticks = _ebml_float(buf, child_payload, child_end)
+        elif element_id == _TRACKS and size is None:
+            size = _webm_video_size(buf, payload, element_end)
+        if duration_ticks is not None and size:
+            break
+
+    if duration_ticks is None or not size or not all(size):
+        return None
+    return {"width": size[0], "height": size[1], "duration": int(duration_ticks * timecode_scale / 1e9)}
+
+
+def _webm_video_size(buf, start: int, end: int) -> Optional[Tuple[int, int]]:
+    for element_id, payload, element_end in _ebml_elements(buf, start, end):
+        if element_id != _TRACK_ENTRY:
+            continue
+        track_type = None
+        width = height = None
+        for child_id, child_payload, child_end in _ebml_elements(buf, payload, element_end):
+            if child_id == _TRACK_TYPE:
+                track_type = _ebml_uint(buf, child_payload, child_end)
+            elif child_id == _VIDEO:
+                for video_id, video_payload, video_end in _ebml_elements(buf, child_payload, child_end):
+                    if video_id == _PIXEL_WIDTH:
+                        width = _ebml_uint(buf, video_payload, video_end)
+                    elif video_id == _PIXEL_HEIGHT:
+                        height = _ebml_uint(buf, video_payload, video_end)
+        if track_type == _EBML_VIDEO_TRACK and width and height:
+            return width, height
+    return None
+
+
+def read_video_header(path: str) -> Optional[Dict]:
+    """
+    width/height/duration (whole seconds) of an MP4/MOV or WebM/MKV file,
+    read from its container header. None if the file isn't one of those or
+    any of the three values can't be read - use ffmpeg then.
+    """
+    try:
+        with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+            if len(buf) < 16:
+                return None
+            if buf[4:8] in (b"ftyp", b"moov", b"mdat", b"free", b"wide", b"skip"):
+                return _read_mp4(buf)
+            if buf[:4] == b"\x1a\x45\xdf\xa3":
+                return _read_webm(buf)
+            return None
+    except (OSError, ValueError, IndexError, struct.error):
+        return None
+
+
+def read_mp4_keyframes(path: str) -> Optional[Dict]:
+    """
+    Keyframe index of an MP4/MOV's video track:
+
+        {"duration": seconds,
+         "video_bytes": size of all video samples,
+         "keyframes": [(time_s, video bytes before that keyframe), ...]}
+
+    None for other containers, fragmented MP4s (no sample tables in moov)
+    and anything unreadable.
+    """
+    try:
+        with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+            if len(buf) < 16 or buf[4:8] not in (b"ftyp", b"moov", b"mdat", b"free", b"wide", b"skip"):
+                return None
+            return _read_mp4_keyframes(buf)
+    except (OSError, ValueError, IndexError, struct.error):
+        return None
@@ -0,0 +1,233 @@
+"""
+Cookie Manager
+Pools of cookies.txt jars per platform, so one flagged or expired session
+doesn't silently break every cookie tier until someone refreshes the file
+and restarts the bot.
+
+A platform's cookie env var (X_cookies, Tiktok_cookies, Insta_cookies, ...)
+may name:
+    - a single cookies.txt file, as before
+    - several files, comma-separated
+    - a directory - every *.txt file in it is a jar
+
+acquire() hands out the jar with the fewest auth failures in the last
+AUTH_FAILURE_WINDOW_S, least recently used among equals, so load is spread
+across sessions. After BENCH_AFTER consecutive auth failures a jar is
+benched for BENCH_S and not handed out at all. Only auth failures count -
+a deleted post or a timeout says nothing about the session.
+
+Files are re-checked at most every REFRESH_S seconds (pools are also
+consulted from the event loop, e.g. by a tier builder asking whether any
+cookies exist, so not on every call): a directory picks up added and
+removed jars, and a jar whose mtime changed (e.g. re-exported with
+refresh_cookies.py) starts over with a clean score - no restart needed.
+yt-dlp and gallery-dl write the jar back after using it, so the mtime seen
+when a use is reported is taken as the jar's own, not as a refresh.
+"""
+
+import os
+import time
+import logging
+import threading
+from typing import Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+AUTH_FAILURE_WINDOW_S = 30 * 60
+
+# Consecutive auth failures before a jar is benched, and for how long.
+BENCH_AFTER = int(os.getenv("COOKIE_BENCH_AFTER", "3"))
+BENCH_S = int(os.getenv("COOKIE_BENCH_S", "1800"))
+
+# How stale the pool's view of the cookie files may get.
+REFRESH_S = float(os.getenv("COOKIE_REFRESH_S", "5"))
+
+# What gallery-dl/yt-dlp report when the session itself was rejected, as
+# opposed to the content being private/missing.
+AUTH_FAILURE_MARKERS = (
+    "login required",
+    "log in to continue",
+    "you must log in",
+    "not logged in",
+    "sign in to confirm",
+    "confirm you're not a bot",
+    "cookies are no longer valid",
+    "session expired",
+    "invalid or missing login credentials",
+    "authorization failed",
+    "authentication failed",
+    "http error 401",
+    "401 unauthorized",
+    "checkpoint_required",
+    "challenge_required",
+)
+
+
+def is_auth_failure(errors: Iterable[str]) -> bool:
+    text = "\n".join(errors).lower()
+    return any(marker in text for marker in AUTH_FAILURE_MARKERS)
+
+
+def _mtime(path: str) -> Optional[float]:
+    try:
+        return os.stat(path).st_mtime
+    except OSError:
+        return None
+
+
+class _Jar:
+    __slots__ = ("path", "mtime", "auth_failures", "consecutive_failures", "benched_until", "last_used", "uses")
+
+    def __init__(self, path: str, mtime: Optional[float]) -> None:
+        self.path = path
+        self.mtime = mtime
+        self.auth_failures: List[float] = []
+        self.consecutive_failures = 0
+        self.benched_until = 0.0
+        self.last_used = 0.0
+        self.uses = 0
+
+    def reset(self) -> None:
+        self.auth_failures.clear()
+        self.consecutive_failures = 0
+        self.benched_until = 0.0
+
+
+class CookiePool:
+    """Thread-safe rotation over one platform's cookie jars."""
+
+    def __init__(self, platform: str, spec: Optional[str]) -> None:
+        self.platform = platform
+        self.spec = spec or ""
+        self._jars: Dict[str, _Jar] = {}
+        self._refreshed_at: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def _paths(self) -> List[str]:
+        paths = []
+        for entry in self.spec.split(","):
+            entry = entry.strip()
+            if not entry:
+                continue
+            if os.path.isdir(entry):
+                paths.extend(
+                    os.path.join(entry, name)
+                    for name in sorted(os.listdir(entry))
+                    if name.endswith(".txt")
+                )
+            elif os.path.isfile(entry):
+                paths.append(entry)
+        return paths
+
+    def _refresh(self, force: bool = False) -> None:
+        """Sync the pool with what's on disk, unless that was done less
+        than REFRESH_S ago. Caller holds the lock."""
+        now = time.monotonic()
+        if not force and self._refreshed_at is not None and now - self._refreshed_at < REFRESH_S:
+            return
+        self._refreshed_at = now
+        jars = {}
+        for path in self._paths():
+            mtime = _mtime(path)
+            jar = self._jars.get(path)
+            if jar is None:
+                jar = _Jar(path, mtime)
+                if self._jars:
+                    logger.info(f"[Cookies] {self.platform}: new jar {path}")
+            elif mtime != jar.mtime:
+                jar.mtime = mtime
+                if jar.auth_failures or jar.benched_until:
+                    logger.info(f"[Cookies] {self.platform}: {path} changed on disk, score reset")
+                jar.reset()
+            jars[path] = jar
+        self._jars = jars
+
+    def _recent_failures(self, jar: _Jar) -> int:
+        cutoff = time.time() - AUTH_FAILURE_WINDOW_S
+        jar.auth_failures[:] = [t for t in jar.auth_failures if t >= cutoff]
+        return len(jar.auth_failures)
+
+    def available(self) -> bool:
+        """True if at least one jar exists and isn't benched."""
+        with self._lock:
+            self._refresh()
+            now = time.monotonic()
+            return any(jar.benched_until <= now for jar in self._jars.values())
+
+    def acquire(self) -> Optional[str]:
+        """Path of the healthiest, least recently used jar - or None if
+        there are no usable jars right now."""
+        with self._lock:
+            self._refresh()
+            now = time.monotonic()
+            usable = [jar for jar in self._jars.values() if jar.benched_until <= now]
+            if not usable:
+                return None
+            jar = min(usable, key=lambda j: (self._recent_failures(j), j.last_used))
+            jar.last_used = now
+            jar.uses += 1
+            return jar.path
+
+    def report(self, path: Optional[str], ok: bool, errors: Iterable[str] = ()) -> None:
+        """Outcome of a download that used the jar at path (no-op for None).
+        A failure only counts against the jar if it was an auth failure."""
+        if not path:
+            return
+        with self._lock:
+            jar = self._jars.get(path)
+            if jar is None:
+                return
+            # Our own write-back, not a refresh - see module docstring.
+            jar.mtime = _mtime(path)
+
+            if ok:
+                jar.consecutive_failures = 0
+                return
+            if not is_auth_failure(errors):
+                return
+
+            jar.auth_failures.append(time.time())
+            jar.consecutive_failures += 1
+            if jar.consecutive_failures >= BENCH_AFTER and jar.benched_until <= time.monotonic():
+                jar.benched_until = time.monotonic() + BENCH_S
+                logger.warning(
+                    f"[Cookies] {self.platform}: benching {path} for {BENCH_S}s "
+                    f"after {jar.consecutive_failures} auth failures in a row"
+                )
+
+    def status_lines(self) -> List[str]:
+        with self._lock:
+            self._refresh(force=True)
+            now = time.monotonic()
+            lines = []
+            for jar in self._jars.values():
+                recent = self._recent_failures(jar)
+                if jar.benched_until > now:
+                    state = f"🔴 benched {int(jar.benched_until - now)}s"
+                else:
+                    state = "🟡" if recent else "🟢"
+                lines.append(
+                    f"{state} {self.platform}: {os.path.basename(jar.path)} "
+                    f"(used {jar.uses}, auth failures {recent})"
+                )
+            return lines
+
+
+_pools: Dict[str, CookiePool] = {}
+_registry_lock = threading.Lock()
+
+
+def get_cookie_pool(platform: str, spec: Optional[str]) -> CookiePool:
+    """Process-wide cookie pool for a platform, created on first use."""
+    with _registry_lock:
+        pool = _pools.get(platform)
+        if pool is None:
+            pool = _pools[platform] = CookiePool(platform, spec)
+        return pool
+
+
+def cookie_status_lines() -> List[str]:
+    """One human-readable line per cookie jar, for the admin menu."""
+    with _registry_lock:
+        pools = sorted(_pools.values(), key=lambda p: p.platform)
+    return [line for pool in pools for line in pool.status_lines()]
@@ -0,0 +1,142 @@
+"""
+Failure Cache
+Negative cache for links that can't be downloaded no matter how often
+they're retried - deleted, private, login-walled or geo-blocked posts.
+
+Downloaders feed it the error messages their tiers collected after the
+whole cascade failed. If those errors classify as a terminal failure, the
+canonical URL is remembered for a short, per-class TTL, and the next
+request for it fails in milliseconds instead of walking every tier again.
+
+Anything that looks transient (rate limits, timeouts, 5xx) is never
+cached, and neither is a failure we can't classify.
+"""
+
+import threading
+from typing import Iterable, Optional
+
+from Logic.utils.ttl_cache import TTLCache
+
+# Checked first: if any of these show up, the failure might go away on its
+# own, so it's not cached even if a terminal marker is present too.
+#
+# Status codes are matched with their reason phrase / "http error" prefix,
+# never bare - error messages embed post URLs and ids full of digits.
+TRANSIENT_MARKERS = (
+    "http error 429",
+    "too many requests",
+    "rate limit",
+    "rate-limit",
+    "timed out",
+    "timeout",
+    "temporarily",
+    "try again later",
+    "http error 5",
+    "internal server error",
+    "bad gateway",
+    "service unavailable",
+    "gateway timeout",
+    "connection reset",
+    "connection refused",
+    "connection aborted",
+    "remote end closed",
+    "max retries exceeded",
+    "network is unreachable",
+    "name or service not known",
+    "temporary failure in name resolution",
+    "failed to resolve",
+)
+
+# (failure class, markers) - first match wins. Same spirit as yt.py's
+# AUTH_ERROR_MARKERS, widened to what gallery-dl/yt-dlp report for X and
+# Facebook.
+FAILURE_MARKERS = (
+    ("not_found", (
+        "http error 404",
+        "404 not found",
+        "does not exist",
+        "no longer available",
+        "tweet unavailable",
+        "this post is unavailable",
+        "has been deleted",
+        "content isn't available",
+        "content is not available",
+    )),
+    ("private", (
+        "private video",
+        "this account is private",
+        "protected tweet",
+        "tweets are protected",
+        "account is protected",
+    )),
+    ("login_required", (
+        "login required",
+        "log in to continue",
+        "you must log in",
+        "sign in to confirm",
+        "only available for registered users",
+        "age-restricted",
+        "sensitive content",
+        "members-only",
+    )),
+    ("geo_blocked", (
+        "not available in your country",
+        "geo restricted",
+        "geo-restricted",
+        "georestricted",
+        "withheld in",
+    )),
+)
+
+# How long each class of failure is remembered, in seconds. Deleted posts
+# stay deleted; privacy and login walls can be lifted, so they expire sooner.
+FAILURE_TTL_S = {
+    "not_found": 60 * 60,
+    "private": 15 * 60,
+    "login_required": 10 * 60,
+    "geo_blocked": 60 * 60,
+}
+
+_cache = TTLCache(ttl=max(FAILURE_TTL_S.values()), max_entries=4096)
+# Downloaders run in worker threads (asyncio.to_thread), so guard the cache.
+_lock = threading.Lock()
+
+
+def is_transient_failure(errors: Iterable[str]) -> bool:
+    """True if the errors point at the service itself being unwell (rate
+    limited, timing out, 5xx) rather than at the content."""
+    text = "\n".join(errors).lower()
+    return any(marker in text for marker in TRANSIENT_MARKERS)
+
+
+def classify_failure(errors: Iterable[str]) -> Optional[str]:
+    """Failure class for a set of tier error messages, or None if the
+    failure could be transient or isn't recognised."""
+    errors = list(errors)
+    if not errors or is_transient_failure(errors):
+        return None
+    text = "\n".join(errors).lower()
+    for failure, markers in FAILURE_MARKERS:
+        if any(marker in text for marker in markers):
+            return failure
+    return None
+
+
+def _key(platform: str, url: str) -> str:
+    return f"{platform}:{url.rstrip('/').lower()}"
+
+
+def get_known_failure(platform: str, url: str) -> Optional[str]:
+    """Failure class remembered for this canonical URL, if any."""
+    with _lock:
+        return _cache.get(_key(platform, url))
+
+
+def remember_failure(platform: str, url: str, errors: Iterable[str]) -> Optional[str]:
+    """Classify the errors from a fully failed cascade and, if terminal,
+    remember the URL. Returns the failure class (or None)."""
+    failure = classify_failure(errors)
+    if failure:
+        with _lock:
+            _cache.set(_key(platform, url), failure, ttl=FAILURE_TTL_S[failure])
+    return failure
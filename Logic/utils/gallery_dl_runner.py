@@ -0,0 +1,129 @@
+"""
+gallery-dl Runner
+Runs gallery-dl through its Python job API inside the shared worker pool
+(see job_engine.py) instead of spawning the gallery-dl CLI per request.
+
+Each job gets a clean config: exact output directory (-D), optional
+cookie file (--cookies), optional file range (--range), no mtime
+post-processing (--no-mtime) and any extra -o style options, so jobs
+never leak settings into each other even though they share a worker.
+"""
+
+import logging
+import threading
+from typing import Dict, List, NamedTuple, Optional
+
+from Logic.utils.job_engine import get_worker_pool, JobTimeout, JobCancelled, JobError
+
+logger = logging.getLogger(__name__)
+
+GALLERY_DL_TIMEOUT = 120
+
+# Keep at most this many log lines from a job - enough to see why it failed.
+_MAX_ERROR_LINES = 20
+
+
+class GalleryDLResult(NamedTuple):
+    status: int          # gallery-dl exit status: 0 = success, -1 = job never finished
+    errors: List[str]    # warning/error log lines emitted during the job
+    handled: int = 0     # files the job went for (within --range), downloaded or not
+
+
+class _ErrorCollector(logging.Handler):
+    def __init__(self) -> None:
+        super().__init__(level=logging.WARNING)
+        self.lines: List[str] = []
+
+    def emit(self, record: logging.LogRecord) -> None:
+        if len(self.lines) < _MAX_ERROR_LINES:
+            self.lines.append(f"{record.name}: {record.getMessage()}")
+
+
+def _gallery_dl_job(
+    url: str,
+    target_dir: str,
+    cookies: Optional[str],
+    file_range: Optional[str],
+    options: Optional[Dict],
+) -> GalleryDLResult:
+    """Runs inside a worker process - the in-process equivalent of
+    `gallery-dl -D target_dir --no-mtime [--cookies] [--range] [-o ...] url`."""
+    from gallery_dl import config, job
+
+    config.clear()
+    config.load()  # user/system config files, same as the CLI would read
+    config.set((), "base-directory", target_dir)
+    config.set((), "directory", ())
+    config.set((), "mtime", False)
+    config.set(("output",), "mode", "null")
+    if cookies:
+        config.set((), "cookies", cookies)
+    if file_range:
+        config.set((), "file-range", file_range)
+    for key, value in (options or {}).items():
+        *path, name = key.split(".")
+        config.set(tuple(path), name, value)
+
+    handled = 0
+
+    class CountingJob(job.DownloadJob):
+        # Child jobs (queued URLs) are built from self.__class__, so they
+        # count into the same total.
+        def handle_url(self, url, kwdict):
+            nonlocal handled
+            handled += 1
+            super().handle_url(url, kwdict)
+
+    collector = _ErrorCollector()
+    root = logging.getLogger()
+    root.addHandler(collector)
+    try:
+        status = CountingJob(url).run()
+    except Exception as exc:
+        collector.lines.append(f"{type(exc).__name__}: {exc}")
+        status = 1
+    finally:
+        root.removeHandler(collector)
+
+    return GalleryDLResult(status, collector.lines, handled)
+
+
+def run_gallery_dl_sync(
+    url: str,
+    target_dir: str,
+    cookies: Optional[str] = None,
+    file_range: Optional[str] = None,
+    options: Optional[Dict] = None,
+    timeout: float = GALLERY_DL_TIMEOUT,
+    cancel: Optional[threading.Event] = None,
+) -> GalleryDLResult:
+    """Blocking variant, for the downloaders that already run in a thread.
+    Setting cancel kills the job."""
+    try:
+        return get_worker_pool().run_sync(
+            _gallery_dl_job, url, target_dir, cookies, file_range, options,
+            timeout=timeout, cancel=cancel,
+        )
+    except JobTimeout:
+        return GalleryDLResult(-1, [f"timed out after {timeout}s"])
+    except (JobCancelled, JobError) as exc:
+        return GalleryDLResult(-1, [str(exc)])
+
+
+async def run_gallery_dl(
+    url: str,
+    target_dir: str,
+    cookies: Optional[str] = None,
+    file_range: Optional[str] = None,
+    options: Optional[Dict] = None,
+    timeout: float = GALLERY_DL_TIMEOUT,
+) -> GalleryDLResult:
+    """Async variant - cancelling the awaiting task kills the job."""
+    try:
+        return await get_worker_pool().run(
+            _gallery_dl_job, url, target_dir, cookies, file_range, options, timeout=timeout
+        )
+    except JobTimeout:
+        return GalleryDLResult(-1, [f"timed out after {timeout}s"])
+    except JobError as exc:
+        return GalleryDLResult(-1, [str(exc)])
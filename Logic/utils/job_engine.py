@@ -0,0 +1,308 @@
+"""
+Job Engine
+Long-lived worker process pool for heavy extractor jobs (gallery-dl, yt-dlp).
+
+Spawning a CLI per download pays interpreter startup, extractor imports
+and config parsing every single time. Instead, jobs here run as plain
+Python function calls inside a small pool of worker processes that stay
+alive between requests, so those costs are paid once per worker.
+
+Jobs still get what a subprocess gave us:
+    - isolation: a crash or hang only takes down one worker, which is
+      killed and transparently replaced on the next job
+    - timeouts: a job that runs past its timeout has its worker killed
+    - cancellation: cancelling the awaiting task (or setting the cancel
+      event for sync callers) kills the worker running that job.
+      Blocking downloaders that run whole tier cascades in a thread take
+      the event as a cancel= argument - run_cancellable() passes one in
+      and sets it when the awaiting task is cancelled.
+
+Job functions must be top-level, importable functions and their
+arguments/results must be picklable.
+"""
+
+import os
+import time
+import asyncio
+import logging
+import threading
+import multiprocessing
+from typing import Any, Callable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# How many worker processes may run jobs at once. Override via env var.
+WORKER_POOL_SIZE = int(os.getenv("JOB_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+# Recycle a worker after this many jobs, so anything an extractor leaks
+# (sessions, caches, memory) can't pile up forever in one process.
+MAX_JOBS_PER_WORKER = int(os.getenv("JOB_WORKER_MAX_JOBS", "200"))
+
+# Modules every worker imports once at startup - this is the cost the pool
+# exists to pay only once instead of per download.
+PRELOAD_MODULES: Tuple[str, ...] = ("gallery_dl", "yt_dlp")
+
+# How often a waiting caller re-checks its timeout/cancel flag.
+_POLL_INTERVAL_S = 0.25
+
+
+class JobTimeout(Exception):
+    """The job ran past its timeout and its worker was killed."""
+
+
+class JobCancelled(Exception):
+    """The caller cancelled the job and its worker was killed."""
+
+
+class JobError(Exception):
+    """The job raised inside the worker, or the worker died mid-job."""
+
+
+def _worker_main(conn, preload: Tuple[str, ...]) -> None:
+    for module_name in preload:
+        try:
+            __import__(module_name)
+        except ImportError:
+            pass  # the job itself will report the missing dependency
+
+    while True:
+        try:
+            request = conn.recv()
+        except (EOFError, OSError):
+            break
+        if request is None:
+            break
+
+        func, args, kwargs = request
+        try:
+            reply = (True, func(*args, **kwargs))
+        except BaseException as exc:
+            reply = (False, f"{type(exc).__name__}: {exc}")
+
+        try:
+            conn.send(reply)
+        except (OSError, EOFError):
+            break
+
+
+class _Worker:
+    def __init__(self, name: str, preload: Tuple[str, ...]) -> None:
+        ctx = multiprocessing.get_context("spawn")
+        self.conn, child_conn = ctx.Pipe()
+        self.process = ctx.Process(
+            target=_worker_main, args=(child_conn, preload), daemon=True, name=name
+        )
+        self.process.start()
+        child_conn.close()
+        self.jobs_run = 0
+
+    def alive(self) -> bool:
+        return self.process.is_alive()
+
+    def kill(self) -> None:
+        try:
+            self.process.terminate()
+            self.process.join(timeout=2)
+            if self.process.is_alive():
+                self.process.kill()
+                self.process.join(timeout=2)
+        except Exception:
+            pass
+        try:
+            self.conn.close()
+        except Exception:
+            pass
+
+    def stop(self) -> None:
+        try:
+            self.conn.send(None)
+            self.process.join(timeout=5)
+        except Exception:
+            pass
+        if self.process.is_alive():
+            self.kill()
+
+
+class WorkerPool:
+    """
+    Fixed-size pool of worker processes, spawned lazily on demand.
+
+    run_sync() is safe to call from any thread (the downloaders that run
+    under asyncio.to_thread use it directly); run() is the async wrapper
+    for code already on the event loop.
+    """
+
+    def __init__(
+        self,
+        size: int = WORKER_POOL_SIZE,
+        name: str = "job-worker",
+        preload: Tuple[str, ...] = PRELOAD_MODULES,
+    ) -> None:
+        self._size = max(1, size)
+        self._name = name
+        self._preload = preload
+        self._idle: List[_Worker] = []
+        self._spawned = 0
+        self._serial = 0
+        self._closed = False
+        self._cond = threading.Condition()
+
+    def _spawn(self) -> _Worker:
+        with self._cond:
+            self._serial += 1
+            name = f"{self._name}-{self._serial}"
+        try:
+            return _Worker(name, self._preload)
+        except Exception:
+            with self._cond:
+                self._spawned -= 1
+                self._cond.notify()
+            raise
+
+    def _acquire(self, cancel: Optional[threading.Event]) -> _Worker:
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise JobError("worker pool is shut down")
+                if cancel is not None and cancel.is_set():
+                    raise JobCancelled("cancelled while waiting for a free worker")
+                while self._idle:
+                    worker = self._idle.pop()
+                    if worker.alive():
+                        return worker
+                    self._spawned -= 1
+                if self._spawned < self._size:
+                    self._spawned += 1
+                    break
+                self._cond.wait(_POLL_INTERVAL_S)
+        return self._spawn()
+
+    def _release(self, worker: _Worker, healthy: bool) -> None:
+        retire = (
+            not healthy
+            or self._closed
+            or not worker.alive()
+            or worker.jobs_run >= MAX_JOBS_PER_WORKER
+        )
+        with self._cond:
+            if retire:
+                self._spawned -= 1
+            else:
+                self._idle.append(worker)
+            self._cond.notify()
+        if retire and healthy:
+            worker.stop()
+
+    def run_sync(
+        self,
+        func: Callable,
+        *args: Any,
+        timeout: Optional[float] = None,
+        cancel: Optional[threading.Event] = None,
+        **kwargs: Any,
+    ) -> Any:
+        """
+        Run func(*args, **kwargs) in a worker and return its result.
+
+        The timeout covers the job's own run time, not time spent queued
+        for a free worker. Raises JobTimeout, JobCancelled or JobError.
+        """
+        worker = self._acquire(cancel)
+        healthy = False
+        try:
+            worker.conn.send((func, args, kwargs))
+            deadline = None if timeout is None else time.monotonic() + timeout
+
+            while True:
+                if cancel is not None and cancel.is_set():
+                    raise JobCancelled(f"{func.__name__} cancelled")
+                wait = _POLL_INTERVAL_S
+                if deadline is not None:
+                    wait = min(wait, deadline - time.monotonic())
+                    if wait <= 0:
+                        raise JobTimeout(f"{func.__name__} timed out after {timeout}s")
+                if worker.conn.poll(wait):
+                    break
+
+            ok, value = worker.conn.recv()
+            worker.jobs_run += 1
+            healthy = True
+        except (EOFError, OSError, BrokenPipeError) as exc:
+            raise JobError(f"worker process died during {func.__name__}: {exc}") from exc
+        finally:
+            if not healthy:
+                worker.kill()
+            self._release(worker, healthy)
+
+        if not ok:
+            raise JobError(value)
+        return value
+
+    async def run(self, func: Callable, *args: Any, timeout: Optional[float] = None, **kwargs: Any) -> Any:
+        """Async wrapper - cancelling the awaiting task kills the job's worker."""
+        cancel = threading.Event()
+        try:
+            return await asyncio.to_thread(
+                self.run_sync, func, *args, timeout=timeout, cancel=cancel, **kwargs
+            )
+        except asyncio.CancelledError:
+            cancel.set()
+            raise
+
+    def warm_up(self) -> None:
+        """Spawn every worker up front so the first jobs don't pay for it."""
+        workers = []
+        with self._cond:
+            missing = self._size - self._spawned
+            self._spawned += missing
+        for _ in range(missing):
+            try:
+                workers.append(self._spawn())
+            except Exception as e:
+                logger.warning(f"[Jobs] Could not pre-spawn worker: {e}")
+        with self._cond:
+            self._idle.extend(workers)
+            self._cond.notify_all()
+        logger.info(f"[Jobs] Worker pool warmed up ({len(workers)} new worker(s))")
+
+    def shutdown(self) -> None:
+        with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._cond.notify_all()
+        for worker in idle:
+            worker.stop()
+
+
+_pool: Optional[WorkerPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_worker_pool() -> WorkerPool:
+    """Process-wide shared pool, created on first use."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = WorkerPool()
+    return _pool
+
+
+def shutdown_worker_pool() -> None:
+    """Call from the bot's shutdown handler to stop idle workers cleanly."""
+    if _pool is not None:
+        _pool.shutdown()
+
+
+async def run_cancellable(func: Callable, *args: Any, **kwargs: Any) -> Any:
+    """
+    Run blocking func(*args, cancel=<Event>, **kwargs) in a thread. If the
+    awaiting task is cancelled the Event is set, which kills any pool job
+    func is waiting on and tells it to stop trying further tiers.
+    """
+    cancel = threading.Event()
+    try:
+        return await asyncio.to_thread(func, *args, cancel=cancel, **kwargs)
+    except asyncio.CancelledError:
+        cancel.set()
+        raise
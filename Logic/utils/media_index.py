@@ -0,0 +1,225 @@
+"""
+Media Index
+Remembers the Telegram file_id of every file the bot has uploaded, keyed
+by a hash of the file's content, so byte-identical media is sent by
+reference instead of uploaded again - no matter which URL or which user
+it came from (the same TikTok behind a short link and a share link, a
+re-posted video, the same song requested twice).
+
+    - content_hash(): BLAKE2b over the whole file, streamed through one
+      reused buffer. hashlib releases the GIL while hashing, so
+      hash_items() runs a whole batch concurrently in worker threads;
+      ~1s per GB per core, against an upload that takes far longer.
+    - one SQLite table maps (hash, kind) -> file_id. Kind is part of the
+      key because the same bytes sent as audio and as a video are
+      different Telegram files. Reads and writes are batched per call
+      and run in a worker thread, off the event loop.
+    - a video over the upload limit is sent as a compressed copy or as
+      split parts (Uploader.py). Those are stored under keys derived from
+      the original's hash (fitted_hash()), so the next request for the
+      same original finds them with fitted_keys() and skips ffmpeg.
+
+A file_id Telegram no longer accepts is forgotten by the uploader and the
+file is uploaded as usual. MEDIA_DEDUP=off turns the whole thing off.
+"""
+
+import os
+import time
+import asyncio
+import hashlib
+import sqlite3
+import logging
+import threading
+from typing import List, Optional, Sequence, Tuple
+
+from aiogram import types
+
+from Logic.utils.media_result import MediaItem
+
+logger = logging.getLogger(__name__)
+
+DEDUP_ENABLED = os.getenv("MEDIA_DEDUP", "on").lower() != "off"
+MEDIA_INDEX_DB = os.getenv("MEDIA_INDEX_DB", "data/media_index.sqlite3")
+
+HASH_CHUNK = 1024 * 1024
+
+_lock = threading.Lock()
+_conn = None
+
+
+def _db() -> sqlite3.Connection:
+    global _conn
+    if _conn is None:
+        os.makedirs(os.path.dirname(MEDIA_INDEX_DB) or ".", exist_ok=True)
+        _conn = sqlite3.connect(MEDIA_INDEX_DB, timeout=30, check_same_thread=False)
+        _conn.execute(
+            "CREATE TABLE IF NOT EXISTS media_index ("
+            " content_hash TEXT NOT NULL,"
+            " kind TEXT NOT NULL,"
+            " file_id TEXT NOT NULL,"
+            " file_unique_id TEXT NOT NULL,"
+            " sent_at REAL NOT NULL,"
+            " PRIMARY KEY (content_hash, kind))"
+        )
+        _conn.commit()
+    return _conn
+
+
+def content_hash(path: str) -> str:
+    """Size plus BLAKE2b digest of the file's bytes - equal only for
+    byte-identical files."""
+    digest = hashlib.blake2b(digest_size=20)
+    buf = bytearray(HASH_CHUNK)
+    view = memoryview(buf)
+    size = 0
+    with open(path, "rb", buffering=0) as f:
+        while True:
+            n = f.readinto(buf)
+            if not n:
+                break
+            digest.update(view[:n])
+            size += n
+    return f"{size}-{digest.hexdigest()}"
+
+
+async def hash_items(items: List[MediaItem]) -> None:
+    """Fill in content_hash of the items that don't have one yet, all at
+    once in worker threads. An unreadable file is left without a hash."""
+    missing = [item for item in items if item.content_hash is None]
+    if not missing:
+        return
+    results = await asyncio.gather(
+        *(asyncio.to_thread(content_hash, item.path) for item in missing),
+        return_exceptions=True,
+    )
+    for item, result in zip(missing, results):
+        if isinstance(result, Exception):
+            logger.info(f"[MediaIndex] Could not hash {item.path}: {result}")
+        else:
+            item.content_hash = result
+
+
+def _media_of(message: types.Message, kind: str):
+    """The sent file of kind in message (largest size for photos), or None
+    if Telegram stored it as something else (e.g. a video as an animation)."""
+    if kind == "video":
+        return message.video
+    if kind == "audio":
+        return message.audio
+    if kind == "photo" and message.photo:
+        return message.photo[-1]
+    return None
+
+
+def _lookup_sync(keys: List[Tuple[str, str]]) -> List[Optional[str]]:
+    with _lock:
+        conn = _db()
+        rows = [
+            conn.execute(
+                "SELECT file_id FROM media_index WHERE content_hash = ? AND kind = ?", key
+            ).fetchone()
+            for key in keys
+        ]
+    return [row[0] if row else None for row in rows]
+
+
+def _store_sync(rows: List[tuple]) -> None:
+    with _lock:
+        conn = _db()
+        conn.executemany("INSERT OR REPLACE INTO media_index VALUES (?, ?, ?, ?, ?)", rows)
+        conn.commit()
+
+
+def _fitted_keys_sync(prefix: str) -> List[Tuple[str, float]]:
+    with _lock:
+        # Every key starting with prefix (which ends in ":"; ";" sorts
+        # right after it).
+        return _db().execute(
+            "SELECT content_hash, sent_at FROM media_index"
+            " WHERE kind = 'video' AND content_hash >= ? AND content_hash < ?",
+            (prefix, prefix[:-1] + ";"),
+        ).fetchall()
+
+
+def _forget_sync(digest: str, kind: str) -> None:
+    with _lock:
+        conn = _db()
+        conn.execute("DELETE FROM media_index WHERE content_hash = ? AND kind = ?", (digest, kind))
+        conn.commit()
+
+
+async def lookup(keys: Sequence[Tuple[Optional[str], str]]) -> List[Optional[str]]:
+    """For each (content_hash, kind), the file_id of a file with that
+    content already sent as kind, or None."""
+    found: List[Optional[str]] = [None] * len(keys)
+    wanted = [i for i, (digest, _) in enumerate(keys) if digest]
+    if not DEDUP_ENABLED or not wanted:
+        return found
+    file_ids = await asyncio.to_thread(_lookup_sync, [keys[i] for i in wanted])
+    for i, file_id in zip(wanted, file_ids):
+        found[i] = file_id
+    return found
+
+
+def fitted_hash(digest: str, mode: str, number: int, total: int) -> str:
+    """Index key of part number of total that an oversized video with
+    content digest was sent as, in OVERSIZE_VIDEO_MODE mode (a compressed
+    copy is part 1 of 1)."""
+    return f"{digest}:{mode}:{number}/{total}"
+
+
+def is_fitted(digest: Optional[str]) -> bool:
+    """True for a fitted_hash() key rather than a real content hash."""
+    return bool(digest) and ":" in digest
+
+
+def fitted_part(digest: Optional[str]) -> Optional[int]:
+    """Part number of a fitted_hash() key, None for a real content hash."""
+    if not is_fitted(digest):
+        return None
+    return int(digest.rsplit(":", 1)[1].partition("/")[0])
+
+
+async def fitted_keys(digest: Optional[str], mode: str) -> Optional[List[str]]:
+    """The fitted_hash() keys, in order, of what an oversized video with
+    content digest was last sent as in mode - None unless every part of
+    it is still known."""
+    if not DEDUP_ENABLED or not digest:
+        return None
+    prefix = f"{digest}:{mode}:"
+    by_total = {}
+    for key, sent_at in await asyncio.to_thread(_fitted_keys_sync, prefix):
+        number, _, total = key[len(prefix):].partition("/")
+        if number.isdigit() and total.isdigit():
+            parts = by_total.setdefault(int(total), {})
+            parts[int(number)] = sent_at
+    complete = [
+        (max(parts.values()), total) for total, parts in by_total.items()
+        if set(parts) == set(range(1, total + 1))
+    ]
+    if not complete:
+        return None
+    _, total = max(complete)
+    return [fitted_hash(digest, mode, number, total) for number in range(1, total + 1)]
+
+
+async def remember(sent: Sequence[Tuple[Optional[str], str, Optional[types.Message]]]) -> None:
+    """Store the file_ids of files just sent, given as (content_hash,
+    kind, message) - in one transaction."""
+    if not DEDUP_ENABLED:
+        return
+    now = time.time()
+    rows = []
+    for digest, kind, message in sent:
+        media = _media_of(message, kind) if digest and message is not None else None
+        if media is not None:
+            rows.append((digest, kind, media.file_id, media.file_unique_id, now))
+    if rows:
+        await asyncio.to_thread(_store_sync, rows)
+
+
+async def forget(digest: Optional[str], kind: str) -> None:
+    """Drop a file_id Telegram refused, so the file is uploaded next time."""
+    if not DEDUP_ENABLED or not digest:
+        return
+    await asyncio.to_thread(_forget_sync, digest, kind)
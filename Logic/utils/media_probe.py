@@ -0,0 +1,188 @@
+"""
+Media Probe
+Async video inspection for the uploader: width/height/duration plus a
+poster-frame thumbnail, without ever blocking the event loop.
+
+Width/height/duration are read from the MP4/WebM container header
+in-process (container_header.py) - no process at all when the video
+already has a sidecar thumbnail (e.g. downloaded alongside it). Otherwise
+ONE ffmpeg invocation per video extracts the poster frame, and for
+containers the header reader can't handle, its stderr banner (input
+duration and stream info) stands in for a separate ffprobe run.
+
+ffmpeg runs as an asyncio subprocess, so a slow probe only delays the
+upload it belongs to. probe_videos() inspects a whole carousel
+concurrently, bounded by PROBE_CONCURRENCY.
+"""
+
+import os
+import re
+import asyncio
+import logging
+from typing import Dict, Iterable, Optional
+
+from Logic.utils.container_header import read_video_header
+
+logger = logging.getLogger(__name__)
+
+# ffmpeg binary - overridable per environment (e.g. SpoonLab uses the .exe
+# binaries checked into the repo root, spoonserver would point this at a
+# Linux install). Defaults to whatever's on PATH.
+FFMPEG_BIN = os.getenv("FFMPEG_PATH", "ffmpeg")
+
+PROBE_TIMEOUT_S = 15
+
+# Max ffmpeg processes probing at once, across all uploads.
+PROBE_CONCURRENCY = int(os.getenv("MEDIA_PROBE_CONCURRENCY", "4"))
+
+THUMBNAIL_EXTENSIONS = (".jpg", ".jpeg", ".png", ".webp")
+
+_DURATION_RE = re.compile(r"Duration: (\d+):(\d+):(\d+(?:\.\d+)?)")
+# "Stream #0:0[0x1](und): Video: h264 (High) (avc1 / 0x31637661), yuv420p, 1280x720 [SAR 1:1 DAR 16:9], ..."
+# The 2-digit minimum and the lookahead keep codec tags like 0x31637661 out.
+_VIDEO_SIZE_RE = re.compile(r"Stream #\d+:\d+.*?: Video: .*?\s(\d{2,5})x(\d{2,5})(?=[\s,\]])")
+# Phone videos are often stored sideways with a rotation flag - Telegram
+# wants the size as displayed.
+_ROTATION_RE = re.compile(r"rotation of (-?\d+(?:\.\d+)?) degrees|rotate\s*:\s*(-?\d+)")
+
+_semaphore: Optional[asyncio.Semaphore] = None
+
+
+def _get_semaphore() -> asyncio.Semaphore:
+    global _semaphore
+    if _semaphore is None:
+        _semaphore = asyncio.Semaphore(PROBE_CONCURRENCY)
+    return _semaphore
+
+
+def find_sidecar_thumbnail(video_path: str) -> Optional[str]:
+    """An image next to the video with the same base name, e.g.
+    media_001.mp4 -> media_001.jpg, if one exists."""
+    base_name = os.path.splitext(video_path)[0]
+    for ext in THUMBNAIL_EXTENSIONS:
+        if os.path.exists(base_name + ext):
+            return base_name + ext
+    return None
+
+
+def parse_ffmpeg_info(stderr: str) -> Dict:
+    """width/height/duration of the first video stream of ffmpeg's first
+    input, from its stderr banner. Missing values are None."""
+    # Only look at the input section - output streams are listed after it.
+    stderr = stderr.split("Output #0", 1)[0].split("Stream mapping:", 1)[0]
+
+    info: Dict = {"width": None, "height": None, "duration": None}
+
+    duration = _DURATION_RE.search(stderr)
+    if duration:
+        hours, minutes, seconds = duration.groups()
+        info["duration"] = int(int(hours) * 3600 + int(minutes) * 60 + float(seconds))
+
+    size = _VIDEO_SIZE_RE.search(stderr)
+    if size:
+        width, height = int(size.group(1)), int(size.group(2))
+        rotation = _ROTATION_RE.search(stderr[size.start():])
+        if rotation:
+            degrees = abs(int(float(rotation.group(1) or rotation.group(2))))
+            if degrees % 180 == 90:
+                width, height = height, width
+        info["width"], info["height"] = width, height
+
+    return info
+
+
+async def run_ffmpeg(
+    args: list,
+    timeout: float = PROBE_TIMEOUT_S,
+    require_success: bool = False,
+) -> Optional[str]:
+    """Run ffmpeg and return its stderr, or None if it couldn't run or
+    timed out. With require_success, also None if ffmpeg exited with an
+    error - for jobs whose output file is only usable if it finished
+    (a bare `ffmpeg -i` probe always exits non-zero)."""
+    try:
+        process = await asyncio.create_subprocess_exec(
+            FFMPEG_BIN, "-hide_banner", "-nostdin", *args,
+            stdout=asyncio.subprocess.DEVNULL,
+            stderr=asyncio.subprocess.PIPE,
+        )
+    except FileNotFoundError:
+        logger.warning("[MediaProbe] ffmpeg not found on PATH — no video metadata, thumbnails or compression.")
+        return None
+    except OSError as e:
+        logger.warning(f"[MediaProbe] Could not run ffmpeg: {e}")
+        return None
+
+    try:
+        _, stderr = await asyncio.wait_for(process.communicate(), timeout=timeout)
+    except asyncio.TimeoutError:
+        process.kill()
+        await process.wait()
+        return None
+    except asyncio.CancelledError:
+        process.kill()
+        raise
+    text = stderr.decode("utf-8", errors="replace")
+    if require_success and process.returncode != 0:
+        logger.info(f"[MediaProbe] ffmpeg exited with {process.returncode}: {text.strip()[-300:]}")
+        return None
+    return text
+
+
+async def probe_video(video_path: str) -> Dict:
+    """
+    Inspect one video. Returns a dict with width, height, duration (any of
+    which may be None) and thumbnail - the path of an existing sidecar
+    image or a freshly extracted poster frame, or None.
+
+    The poster frame is taken 1s in (skips the black opening frames some
+    platforms leave) into a sidecar jpg, e.g. media_001.mp4 ->
+    media_001.jpg - the name the uploader already filters out of
+    carousels. Clips shorter than 1s get their very first frame instead.
+
+    Never raises for a bad file or a missing ffmpeg - callers treat missing
+    values as "let Telegram figure it out".
+    """
+    # A few KB of memory-mapped reads - microseconds, fine on the event loop.
+    header = read_video_header(video_path)
+    thumbnail = find_sidecar_thumbnail(video_path)
+    if thumbnail and header:
+        return {**header, "thumbnail": thumbnail}
+
+    async with _get_semaphore():
+        if thumbnail:
+            stderr = await run_ffmpeg(["-i", video_path])
+            info = parse_ffmpeg_info(stderr or "")
+            info["thumbnail"] = thumbnail
+            return info
+
+        thumb_path = os.path.splitext(video_path)[0] + ".jpg"
+        frame_args = ["-frames:v", "1", "-q:v", "2", "-y", thumb_path]
+
+        # Known-short clip: go straight for the first frame.
+        seek_args = [] if header and header["duration"] < 1 else ["-ss", "00:00:01"]
+        stderr = await run_ffmpeg([*seek_args, "-i", video_path, *frame_args])
+        if stderr is None:
+            return {"width": None, "height": None, "duration": None, "thumbnail": None, **(header or {})}
+        info = header or parse_ffmpeg_info(stderr)
+
+        if seek_args and not _nonempty(thumb_path):
+            # Clip shorter than 1s - retry from the very start.
+            await run_ffmpeg(["-i", video_path, *frame_args])
+
+        info["thumbnail"] = thumb_path if _nonempty(thumb_path) else None
+        if info["thumbnail"] is None:
+            logger.info(f"[MediaProbe] Could not extract a thumbnail from {video_path}")
+        return info
+
+
+def _nonempty(path: str) -> bool:
+    return os.path.exists(path) and os.path.getsize(path) > 0
+
+
+async def probe_videos(video_paths: Iterable[str]) -> Dict[str, Dict]:
+    """probe_video() for several videos at once, e.g. a whole carousel.
+    Returns {path: info}."""
+    paths = list(dict.fromkeys(video_paths))
+    results = await asyncio.gather(*(probe_video(path) for path in paths))
+    return dict(zip(paths, results))
@@ -0,0 +1,213 @@
+"""
+Media Result
+The one return type every downloader hands to the uploader: which files
+came out of a download and what is already known about each of them.
+
+Downloaders used to return a bare file path, a directory path or an ad-hoc
+dict, and the uploader then re-derived everything from disk - globbing the
+directory, pairing thumbnails with videos, and running ffmpeg for width,
+height and duration yt-dlp had already reported. A MediaResult carries
+that knowledge along instead:
+
+    - items: one MediaItem per uploadable file, with its kind (video,
+      photo or audio), size, and - where the downloader knew them -
+      width, height, duration and a local thumbnail image.
+    - folder: the download directory, cleaned up after the upload.
+    - title/performer/thumbnail_url: audio metadata (YouTube, Spotify).
+    - page_items: for one page of a paged gallery (Pinterest), how many
+      items the source had in that page, whether they downloaded or not.
+
+scan_media() builds one from a file or directory in a single os.scandir()
+pass, and apply_ytdlp_info() fills in what yt-dlp's info dict knows. The
+uploader only probes videos whose metadata is still incomplete.
+"""
+
+import os
+from dataclasses import dataclass
+from typing import Dict, Iterator, List, Optional
+
+VIDEO_EXTENSIONS = (".mp4", ".mov", ".m4v")
+PHOTO_EXTENSIONS = (".jpg", ".jpeg", ".png", ".webp")
+AUDIO_EXTENSIONS = (".mp3",)
+# Other formats downloaders may produce. Galleries leave them out, but one
+# on its own is still sent (as a video), as single files always were.
+OTHER_MEDIA_EXTENSIONS = (".webm", ".avi", ".mkv", ".heic", ".gif")
+
+_KIND_BY_EXTENSION = {
+    **{ext: "video" for ext in VIDEO_EXTENSIONS},
+    **{ext: "photo" for ext in PHOTO_EXTENSIONS},
+    **{ext: "audio" for ext in AUDIO_EXTENSIONS},
+}
+
+
+@dataclass(slots=True)
+class MediaItem:
+    path: str
+    kind: str  # "video", "photo" or "audio"
+    width: Optional[int] = None
+    height: Optional[int] = None
+    duration: Optional[int] = None
+    size: Optional[int] = None
+    thumbnail: Optional[str] = None  # local image file, not a URL
+    content_hash: Optional[str] = None  # see media_index.py
+
+    @property
+    def has_video_metadata(self) -> bool:
+        """True if nothing is left for the uploader to probe."""
+        return bool(self.width and self.height and self.duration is not None and self.thumbnail)
+
+
+@dataclass(slots=True)
+class MediaResult:
+    items: List[MediaItem]
+    folder: str
+    title: Optional[str] = None
+    performer: Optional[str] = None
+    thumbnail_url: Optional[str] = None
+    page_items: Optional[int] = None
+
+    @property
+    def path(self) -> str:
+        """The file of a single-item result, else the download directory."""
+        return self.items[0].path if len(self.items) == 1 else self.folder
+
+
+def media_kind(path: str) -> Optional[str]:
+    """Item kind ("video", "photo" or "audio") by file extension, None for
+    anything the uploader doesn't send."""
+    return _KIND_BY_EXTENSION.get(os.path.splitext(path)[1].lower())
+
+
+def _sidecar_thumbnail(video_path: str, names: set) -> Optional[str]:
+    base_name = os.path.splitext(video_path)[0]
+    for ext in PHOTO_EXTENSIONS:
+        if os.path.basename(base_name + ext) in names:
+            return base_name + ext
+    return None
+
+
+def _scan_file(path: str, size: int) -> MediaResult:
+    folder = os.path.dirname(path)
+    try:
+        names = set(os.listdir(folder or "."))
+    except OSError:
+        names = set()
+    # Unknown extensions keep the old single-file behaviour: sent as video.
+    kind = media_kind(path) or "video"
+    thumbnail = _sidecar_thumbnail(path, names) if kind == "video" else None
+    return MediaResult([MediaItem(path, kind, size=size, thumbnail=thumbnail)], folder)
+
+
+def scan_media(path: Optional[str]) -> Optional[MediaResult]:
+    """
+    MediaResult for a downloaded file or directory, None if there's nothing
+    to upload.
+
+    A directory is listed once: every video, photo and mp3 directly inside
+    it becomes an item, in name order, except images sharing a video's
+    base name (media_001.jpg next to media_001.mp4) - those are attached
+    as that video's thumbnail instead. In-progress downloads (*.part) never
+    match, so a directory can be scanned while it's still being written.
+
+    This is the one listing of a download: downloaders return it as is
+    and the uploader works from its items, so nothing lists the directory
+    again or stats a file twice.
+    """
+    if not path:
+        return None
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    if not os.path.isdir(path):
+        return _scan_file(path, st.st_size)
+
+    sizes: Dict[str, int] = {}
+    others: Dict[str, int] = {}
+    try:
+        with os.scandir(path) as entries:
+            for entry in entries:
+                if media_kind(entry.name):
+                    found = sizes
+                elif entry.name.lower().endswith(OTHER_MEDIA_EXTENSIONS):
+                    found = others
+                else:
+                    continue
+                try:
+                    if entry.is_file():
+                        found[entry.name] = entry.stat().st_size
+                except OSError:
+                    continue  # renamed/removed while listing
+    except OSError:
+        return None
+
+    if not sizes and len(others) == 1:
+        name, size = others.popitem()
+        return MediaResult([MediaItem(os.path.join(path, name), "video", size=size)], path)
+
+    names = set(sizes)
+    videos = {os.path.splitext(name)[0] for name in names if media_kind(name) == "video"}
+
+    items = []
+    for name in sorted(names):
+        kind = media_kind(name)
+        if kind == "photo" and os.path.splitext(name)[0] in videos:
+            continue  # a video's thumbnail
+        file_path = os.path.join(path, name)
+        thumbnail = _sidecar_thumbnail(file_path, names) if kind == "video" else None
+        items.append(MediaItem(file_path, kind, size=sizes[name], thumbnail=thumbnail))
+
+    if not items:
+        return None
+    return MediaResult(items, path)
+
+
+def _ytdlp_entries(info: Dict) -> Iterator[Dict]:
+    """The individual videos of a yt-dlp info dict (itself, or a playlist's entries)."""
+    entries = info.get("entries")
+    if entries is None:
+        yield info
+        return
+    for entry in entries:
+        if entry:
+            yield from _ytdlp_entries(entry)
+
+
+def _int(value) -> Optional[int]:
+    try:
+        return int(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+def apply_ytdlp_info(result: Optional[MediaResult], info: Optional[Dict]) -> Optional[MediaResult]:
+    """
+    Copy width/height/duration from yt-dlp's info dict (the return value of
+    extract_info(download=True)) onto the matching video items. Items are
+    matched by the final file path yt-dlp reports; a lone video with a lone
+    entry is matched regardless (e.g. renamed by a postprocessor).
+    Values already on an item are kept.
+    """
+    if not result or not info:
+        return result
+
+    by_path: Dict[str, Dict] = {}
+    entries = list(_ytdlp_entries(info))
+    for entry in entries:
+        for download in entry.get("requested_downloads") or [entry]:
+            file_path = download.get("filepath") or download.get("_filename")
+            if file_path:
+                by_path[os.path.abspath(file_path)] = {**entry, **download}
+
+    videos = [item for item in result.items if item.kind == "video"]
+    for item in videos:
+        meta = by_path.get(os.path.abspath(item.path))
+        if meta is None and len(videos) == 1 and len(entries) == 1:
+            meta = entries[0]
+        if meta is None:
+            continue
+        item.width = item.width or _int(meta.get("width"))
+        item.height = item.height or _int(meta.get("height"))
+        if item.duration is None:
+            item.duration = _int(meta.get("duration"))
+    return result
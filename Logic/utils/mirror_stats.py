@@ -0,0 +1,80 @@
+"""
+Mirror Stats
+Keeps an exponentially weighted moving average (EWMA) of latency and error
+rate for each of several interchangeable endpoints (e.g. the TikWM API
+mirrors), so callers can try the currently fastest healthy one first
+instead of always walking the list in configured order.
+
+Mirrors are ranked by their expected cost per request:
+
+    score = ewma_latency + ewma_error_rate * failure_cost_s
+
+i.e. a mirror that answers in 0.4s but fails a third of the time ranks
+behind one that answers in 1s and never fails, when a failure costs a
+30s timeout. Mirrors nobody has measured yet score 0, so a newly added
+mirror gets tried (and measured) early. Ties keep the configured order.
+
+Samples come from real requests and from periodic background probes.
+"""
+
+import threading
+from typing import Dict, Iterable, List, Optional
+
+# Weight of the newest sample. Higher reacts faster, lower is steadier.
+EWMA_ALPHA = 0.3
+
+
+class _Stats:
+    __slots__ = ("latency", "error_rate", "samples")
+
+    def __init__(self) -> None:
+        self.latency: Optional[float] = None
+        self.error_rate = 0.0
+        self.samples = 0
+
+
+class MirrorStats:
+    """Thread-safe latency/error-rate EWMA per mirror."""
+
+    def __init__(self, mirrors: Iterable[str], failure_cost_s: float, alpha: float = EWMA_ALPHA) -> None:
+        # dict keeps the configured order, which breaks ties in ordered()
+        self._stats: Dict[str, _Stats] = {mirror: _Stats() for mirror in mirrors}
+        self.failure_cost_s = failure_cost_s
+        self.alpha = alpha
+        self._lock = threading.Lock()
+
+    def record(self, mirror: str, latency_s: float, ok: bool) -> None:
+        """Add one observation. A failure only moves the error rate - its
+        "latency" is usually just the timeout, which says nothing about
+        how fast the mirror is when it works."""
+        with self._lock:
+            stats = self._stats.setdefault(mirror, _Stats())
+            stats.samples += 1
+            stats.error_rate += self.alpha * ((0.0 if ok else 1.0) - stats.error_rate)
+            if ok:
+                if stats.latency is None:
+                    stats.latency = latency_s
+                else:
+                    stats.latency += self.alpha * (latency_s - stats.latency)
+
+    def _score(self, stats: _Stats) -> float:
+        return (stats.latency or 0.0) + stats.error_rate * self.failure_cost_s
+
+    def ordered(self) -> List[str]:
+        """Mirrors, cheapest expected request first."""
+        with self._lock:
+            # sorted() is stable, so equal scores keep the configured order
+            return sorted(self._stats, key=lambda mirror: self._score(self._stats[mirror]))
+
+    def snapshot(self) -> List[Dict]:
+        with self._lock:
+            return [
+                {
+                    "mirror": mirror,
+                    "latency_s": stats.latency,
+                    "error_rate": stats.error_rate,
+                    "samples": stats.samples,
+                    "score": self._score(stats),
+                }
+                for mirror, stats in self._stats.items()
+            ]
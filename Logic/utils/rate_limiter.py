@@ -0,0 +1,180 @@
+"""
+Rate Limiter
+One outbound rate limiter for every Bot API call the bot makes, as an
+aiogram session middleware - instead of fixed sleeps after each send.
+
+Telegram's flood limits are roughly 30 messages/s for the whole bot, about
+one message/s per private chat (short bursts are fine) and 20/min per
+group. Each of those is a token bucket here:
+
+    - one global bucket, GLOBAL_RATE per second
+    - one bucket per chat, CHAT_RATE per second for private chats and
+      GROUP_RATE_PER_MIN per minute for groups/channels, created on demand
+      - or the chat's own rate, for chats given one with set_chat_rate()
+
+A send waits until both its chat's bucket and the global one allow it, so
+messages go out as fast as Telegram accepts them and no faster. A media
+group counts as one send for its chat but one per item against the
+global rate.
+
+If Telegram still answers 429 (TelegramRetryAfter), the chat concerned -
+or the whole bot, for calls without a chat - is paused for the requested
+time and the call is retried, up to MAX_RETRIES times, before the error
+reaches the caller.
+
+Only calls that post something (send*, copy*, forward*) are limited;
+chat actions, edits, deletes and polling pass straight through.
+"""
+
+import os
+import time
+import weakref
+import asyncio
+import logging
+from typing import Dict, Optional
+
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware
+from aiogram.exceptions import TelegramRetryAfter
+
+logger = logging.getLogger(__name__)
+
+GLOBAL_RATE = float(os.getenv("TG_GLOBAL_RATE", "30"))
+CHAT_RATE = float(os.getenv("TG_CHAT_RATE", "1"))
+GROUP_RATE_PER_MIN = float(os.getenv("TG_GROUP_RATE_PER_MIN", "20"))
+
+# Messages a bucket lets through back to back before the rate applies.
+GLOBAL_BURST = 30
+CHAT_BURST = 3
+
+MAX_RETRIES = int(os.getenv("TG_MAX_RETRIES", "3"))
+
+# Per-chat buckets are dropped once idle; checked when there are this many.
+_PRUNE_AT = 1000
+
+# Chats with a rate of their own (per minute), see set_chat_rate().
+_chat_rates: Dict[object, float] = {}
+
+# Live middlewares, for chat_backlog_s().
+_middlewares: "weakref.WeakSet[RateLimitMiddleware]" = weakref.WeakSet()
+
+_UNLIMITED_METHODS = ("sendChatAction",)
+_LIMITED_PREFIXES = ("send", "copy", "forward")
+
+
+class TokenBucket:
+    """
+    Token bucket in "virtual time" form: instead of counting tokens it
+    tracks when the bucket would be full again, so reserving never blocks
+    and a cost larger than the burst just pushes later sends back.
+    Not thread-safe - used from the event loop only.
+    """
+
+    __slots__ = ("interval", "tolerance", "_full_at")
+
+    def __init__(self, rate: float, burst: int) -> None:
+        self.interval = 1.0 / rate
+        self.tolerance = self.interval * max(burst - 1, 0)
+        self._full_at = 0.0
+
+    def reserve(self, cost: int, not_before: float) -> float:
+        """Book cost tokens; returns the monotonic time the send may go,
+        no earlier than not_before."""
+        start = max(not_before, self._full_at - self.tolerance)
+        self._full_at = max(self._full_at, start) + cost * self.interval
+        return start
+
+    def pause(self, seconds: float) -> None:
+        """Let nothing through for the next seconds (after a 429)."""
+        resume = time.monotonic() + seconds
+        self._full_at = max(self._full_at, resume + self.tolerance)
+
+    def idle(self, now: float) -> bool:
+        return self._full_at <= now
+
+    def delay(self, now: float) -> float:
+        """Seconds a send reserved now would wait."""
+        return max(0.0, self._full_at - self.tolerance - now)
+
+
+def set_chat_rate(chat_id, per_minute: float) -> None:
+    """Give chat_id its own rate instead of the private/group default."""
+    _chat_rates[chat_id] = per_minute
+
+
+def chat_backlog_s(chat_id) -> float:
+    """Seconds a send to chat_id would currently wait for its chat's turn."""
+    now = time.monotonic()
+    return max(
+        (m._chats[chat_id].delay(now) for m in list(_middlewares) if chat_id in m._chats),
+        default=0.0,
+    )
+
+
+def _is_limited(api_method: str) -> bool:
+    return api_method not in _UNLIMITED_METHODS and api_method.startswith(_LIMITED_PREFIXES)
+
+
+async def _sleep_until(start: float) -> None:
+    delay = start - time.monotonic()
+    if delay > 0:
+        await asyncio.sleep(delay)
+
+
+def _cost(method) -> int:
+    media = getattr(method, "media", None)
+    return len(media) if isinstance(media, list) else 1
+
+
+class RateLimitMiddleware(BaseRequestMiddleware):
+    """Register with bot.session.middleware(RateLimitMiddleware())."""
+
+    def __init__(self) -> None:
+        self._global = TokenBucket(GLOBAL_RATE, GLOBAL_BURST)
+        self._chats: Dict[object, TokenBucket] = {}
+        _middlewares.add(self)
+
+    def _chat_bucket(self, chat_id) -> TokenBucket:
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            if len(self._chats) >= _PRUNE_AT:
+                now = time.monotonic()
+                self._chats = {k: b for k, b in self._chats.items() if not b.idle(now)}
+            # Private chats have positive ids; groups, channels and
+            # @usernames (always channels) get the per-minute group rate.
+            if chat_id in _chat_rates:
+                bucket = TokenBucket(_chat_rates[chat_id] / 60, CHAT_BURST)
+            elif isinstance(chat_id, int) and chat_id > 0:
+                bucket = TokenBucket(CHAT_RATE, CHAT_BURST)
+            else:
+                bucket = TokenBucket(GROUP_RATE_PER_MIN / 60, CHAT_BURST)
+            self._chats[chat_id] = bucket
+        return bucket
+
+    async def _wait_turn(self, chat_id, cost: int) -> None:
+        # The chat goes first, and the global slot is only booked once the
+        # chat allows the send - booking it ahead would hold up every other
+        # chat behind one busy conversation.
+        if chat_id is not None:
+            await _sleep_until(self._chat_bucket(chat_id).reserve(1, time.monotonic()))
+        await _sleep_until(self._global.reserve(cost, time.monotonic()))
+
+    async def __call__(self, make_request, bot, method):
+        api_method = getattr(method, "__api_method__", "")
+        if not _is_limited(api_method):
+            return await make_request(bot, method)
+
+        chat_id: Optional[object] = getattr(method, "chat_id", None)
+        cost = _cost(method)
+        for attempt in range(MAX_RETRIES + 1):
+            await self._wait_turn(chat_id, cost)
+            try:
+                return await make_request(bot, method)
+            except TelegramRetryAfter as e:
+                if attempt == MAX_RETRIES:
+                    raise
+                logger.warning(
+                    f"[RateLimit] {api_method} to {chat_id}: flood control, "
+                    f"retrying in {e.retry_after}s ({attempt + 1}/{MAX_RETRIES})"
+                )
+                bucket = self._chat_bucket(chat_id) if chat_id is not None else self._global
+                bucket.pause(e.retry_after)
@@ -0,0 +1,159 @@
+"""
+Storage Chat
+Uploads gallery media to a private "storage" chat first, so the message
+to the user - and any retry of it - only has to reference file_ids.
+
+Without it, a media group is uploaded straight into the user's chat, and
+if answer_media_group fails the uploader falls back to sending each item
+on its own, uploading every byte a second time (up to 45MB per group),
+often after Telegram had already taken part of them.
+
+With STORAGE_CHAT_ID set (a private channel or group the bot can post in,
+e.g. -1001234567890), stash_media_group():
+    - sends the group's files to the storage chat as one media group
+      (one by one if that fails)
+    - returns the same group rebuilt around the file_ids Telegram gave
+      back, captions kept
+
+Sending those to the user, or falling back to one by one, is then a
+matter of references - no file is uploaded twice. An item the storage
+chat wouldn't take is left as it was and uploaded to the user directly,
+so a wrong STORAGE_CHAT_ID costs an extra upload, never the media.
+
+Every user's uploads go through the one storage chat, and Telegram rate
+limits a group or channel to about 20 messages a minute (rate_limiter.py)
+- so it gets its own rate, STORAGE_CHAT_RATE_PER_MIN, and once sends to
+it are queued for more than STORAGE_MAX_WAIT_S, groups skip the stash
+and are uploaded to the user directly, as without a storage chat.
+"""
+
+import os
+import logging
+from typing import List, Optional, Union
+
+from aiogram import Bot
+from aiogram.types import InputMediaPhoto, InputMediaVideo, Message
+
+from Logic.utils.rate_limiter import GROUP_RATE_PER_MIN, chat_backlog_s, set_chat_rate
+
+logger = logging.getLogger(__name__)
+
+InputMedia = Union[InputMediaPhoto, InputMediaVideo]
+
+
+def _chat_id(value: Optional[str]) -> Optional[Union[int, str]]:
+    if not value:
+        return None
+    value = value.strip()
+    return int(value) if value.lstrip("-").isdigit() else value
+
+
+STORAGE_CHAT_ID = _chat_id(os.getenv("STORAGE_CHAT_ID"))
+
+# Sends per minute to the storage chat - raise it only if Telegram lets
+# the bot post there faster than in an ordinary group.
+STORAGE_CHAT_RATE_PER_MIN = float(os.getenv("STORAGE_CHAT_RATE_PER_MIN", str(GROUP_RATE_PER_MIN)))
+
+# Longest a send may queue for the storage chat before the group is
+# uploaded to the user directly instead.
+STORAGE_MAX_WAIT_S = float(os.getenv("STORAGE_MAX_WAIT_S", "5"))
+
+if STORAGE_CHAT_ID is not None:
+    set_chat_rate(STORAGE_CHAT_ID, STORAGE_CHAT_RATE_PER_MIN)
+
+# Set once a whole group failed to store, so the warning is logged once.
+_unusable_reported = False
+
+
+def _stored_copy(original: InputMedia, sent: Message) -> Optional[InputMedia]:
+    """original, pointing at the file_id of its copy in the storage chat."""
+    if isinstance(original, InputMediaVideo) and sent.video:
+        return InputMediaVideo(
+            media=sent.video.file_id,
+            caption=original.caption,
+            width=original.width,
+            height=original.height,
+            duration=original.duration,
+            supports_streaming=True,
+        )
+    if isinstance(original, InputMediaPhoto) and sent.photo:
+        return InputMediaPhoto(media=sent.photo[-1].file_id, caption=original.caption)
+    return None
+
+
+def _backlogged() -> bool:
+    backlog = chat_backlog_s(STORAGE_CHAT_ID)
+    if backlog > STORAGE_MAX_WAIT_S:
+        logger.info(f"[Storage] Storage chat has {backlog:.0f}s of sends queued, uploading directly")
+        return True
+    return False
+
+
+async def _store_one(bot: Bot, item: InputMedia) -> Optional[Message]:
+    try:
+        if isinstance(item, InputMediaVideo):
+            return await bot.send_video(
+                STORAGE_CHAT_ID,
+                item.media,
+                thumbnail=item.thumbnail,
+                width=item.width,
+                height=item.height,
+                duration=item.duration,
+                supports_streaming=True,
+                disable_notification=True,
+            )
+        return await bot.send_photo(STORAGE_CHAT_ID, item.media, disable_notification=True)
+    except Exception as e:
+        logger.warning(f"[Storage] Could not store {item.media}: {e}")
+        return None
+
+
+async def stash_media_group(bot: Bot, group: List[InputMedia]) -> List[InputMedia]:
+    """
+    Upload group to the storage chat and return it rebuilt around file_ids,
+    in the same order. Items the storage chat wouldn't take are returned
+    as they were. Returns group untouched if no STORAGE_CHAT_ID is
+    configured, or the storage chat is backlogged.
+    """
+    global _unusable_reported
+    if STORAGE_CHAT_ID is None or not group or _backlogged():
+        return group
+
+    # The storage copies go without captions - they're only for the file_ids.
+    uncaptioned = [item.model_copy(update={"caption": None}) for item in group]
+
+    sent: List[Optional[Message]] = []
+    if len(uncaptioned) > 1:
+        try:
+            sent = await bot.send_media_group(STORAGE_CHAT_ID, uncaptioned, disable_notification=True)
+        except Exception as e:
+            logger.warning(f"[Storage] Media group of {len(group)} failed, storing items one by one: {e}")
+            sent = []
+    if len(sent) != len(group):
+        # One send each now - stop adding to the queue once it's backed up.
+        sent = []
+        for item in uncaptioned:
+            if _backlogged():
+                break
+            sent.append(await _store_one(bot, item))
+        if len(sent) < len(group):
+            sent += [None] * (len(group) - len(sent))
+            if not any(sent):
+                return group
+
+    stored = []
+    for original, message in zip(group, sent):
+        copy = _stored_copy(original, message) if message else None
+        stored.append(copy or original)
+
+    count = sum(copy is not original for copy, original in zip(stored, group))
+    if count == 0:
+        if not _unusable_reported:
+            _unusable_reported = True
+            logger.error(
+                f"[Storage] Nothing could be stored in chat {STORAGE_CHAT_ID} - check "
+                f"STORAGE_CHAT_ID and that the bot can post there. Uploading directly."
+            )
+    elif count < len(group):
+        logger.warning(f"[Storage] Only {count} of {len(group)} items could be stored, uploading the rest directly")
+    return stored
@@ -0,0 +1,160 @@
+"""
+Story Archive
+Remembers which Instagram stories each chat has already been sent, so a
+repeat "stories" request only downloads and uploads the new ones.
+
+One SQLite table, sent_stories, holds a row per story message we sent:
+its Telegram file_id, so stories a chat has already seen can be re-sent
+instantly on request without downloading them again, and an "entry" key
+of "<chat_id>:<username>:<media_id>" - the same key gallery-dl builds for
+its download archive. gallery-dl is pointed at this table read-only and
+skips every story in it, so a story only counts as seen once it actually
+reached the chat: a download whose upload failed is offered again. A
+story video sent split in parts has a row per part; parts after the
+first are keyed "<media_id>/<part>", which gallery-dl never looks up.
+
+Stories expire after 24h, so rows older than that are pruned. All the
+SQLite work runs in a worker thread, off the event loop.
+"""
+
+import os
+import time
+import asyncio
+import sqlite3
+import threading
+from typing import Dict, List, Tuple
+
+from aiogram import types
+
+from Logic.utils import media_index
+from Logic.utils.media_result import MediaItem
+
+STORY_ARCHIVE_DB = os.getenv("STORY_ARCHIVE_DB", "data/story_archive.sqlite3")
+
+# Instagram stories live for 24h - no point keeping file_ids any longer.
+STORY_TTL_S = 24 * 60 * 60
+
+_lock = threading.Lock()
+_conn = None
+
+
+def _db() -> sqlite3.Connection:
+    global _conn
+    if _conn is None:
+        os.makedirs(os.path.dirname(STORY_ARCHIVE_DB) or ".", exist_ok=True)
+        conn = sqlite3.connect(STORY_ARCHIVE_DB, timeout=30, check_same_thread=False)
+        columns = [row[1] for row in conn.execute("PRAGMA table_info(sent_stories)")]
+        if columns and "entry" not in columns:
+            # Older layout, with gallery-dl writing its own "archive" table.
+            # Everything in there expires within a day anyway.
+            conn.execute("DROP TABLE sent_stories")
+            conn.execute("DROP TABLE IF EXISTS archive")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS sent_stories ("
+            " entry TEXT PRIMARY KEY,"
+            " chat_id INTEGER NOT NULL,"
+            " username TEXT NOT NULL,"
+            " kind TEXT NOT NULL,"
+            " file_id TEXT NOT NULL,"
+            " sent_at REAL NOT NULL)"
+        )
+        conn.commit()
+        _conn = conn
+    return _conn
+
+
+def _prefix(chat_id: int, username: str) -> str:
+    return f"{chat_id}:{username.lower()}:"
+
+
+def _prune_sync() -> sqlite3.Connection:
+    """The connection, with expired stories removed. Caller holds _lock."""
+    conn = _db()
+    conn.execute("DELETE FROM sent_stories WHERE sent_at < ?", (time.time() - STORY_TTL_S,))
+    conn.commit()
+    return conn
+
+
+def _prepare_sync() -> None:
+    with _lock:
+        _prune_sync()
+
+
+async def gallery_dl_archive_options(chat_id: int, username: str) -> Dict:
+    """gallery-dl options that skip stories this chat has already been sent.
+
+    gallery-dl only reads the archive (archive-event is empty) - entries
+    are added by record_sent() once a story has been delivered."""
+    await asyncio.to_thread(_prepare_sync)
+    return {
+        "archive": os.path.abspath(STORY_ARCHIVE_DB),
+        "archive-table": "sent_stories",
+        "archive-prefix": _prefix(chat_id, username),
+        "archive-format": "{media_id}",
+        "archive-event": [],
+        # Keeps the media_id in the file name, for record_sent().
+        "filename": "{media_id}.{extension}",
+    }
+
+
+def _media_of(message: types.Message) -> Tuple[str, str]:
+    """(kind, file_id) of a sent photo/video message."""
+    if message.video:
+        return "video", message.video.file_id
+    if message.photo:
+        return "photo", message.photo[-1].file_id
+    return "", ""
+
+
+def _story_part(item: MediaItem) -> Tuple[str, int]:
+    """(media_id, part number) of a sent file - part 1 unless it is one
+    part of a split video."""
+    # "<media_id>.jpg", or "<media_id>.000.mp4" for a part of a split video.
+    name = os.path.basename(item.path).split(".")
+    part = media_index.fitted_part(item.content_hash)
+    if part is None:
+        part = int(name[1]) + 1 if len(name) == 3 and name[1].isdigit() else 1
+    return name[0], part
+
+
+def _record_sync(rows: List[tuple]) -> None:
+    with _lock:
+        conn = _db()
+        conn.executemany("INSERT OR IGNORE INTO sent_stories VALUES (?, ?, ?, ?, ?, ?)", rows)
+        conn.commit()
+
+
+async def record_sent(
+    chat_id: int,
+    username: str,
+    items: List[MediaItem],
+    messages: List[types.Message],
+) -> None:
+    """Mark the stories just sent to chat_id as seen and store their
+    file_ids. items are the downloaded files, named by media_id."""
+    now = time.time()
+    prefix = _prefix(chat_id, username)
+    rows = []
+    for item, message in zip(items, messages):
+        kind, file_id = _media_of(message)
+        media_id, part = _story_part(item)
+        if kind and media_id:
+            entry = prefix + media_id if part == 1 else f"{prefix}{media_id}/{part}"
+            rows.append((entry, chat_id, username.lower(), kind, file_id, now))
+    if rows:
+        await asyncio.to_thread(_record_sync, rows)
+
+
+def _get_sent_sync(chat_id: int, username: str) -> List[Tuple[str, str]]:
+    with _lock:
+        return _prune_sync().execute(
+            "SELECT kind, file_id FROM sent_stories"
+            " WHERE chat_id = ? AND username = ? ORDER BY sent_at, rowid",
+            (chat_id, username.lower()),
+        ).fetchall()
+
+
+async def get_sent(chat_id: int, username: str) -> List[Tuple[str, str]]:
+    """(kind, file_id) of every unexpired story already sent to chat_id,
+    oldest first - every part of a split video, in order."""
+    return await asyncio.to_thread(_get_sent_sync, chat_id, username)
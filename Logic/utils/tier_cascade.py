@@ -0,0 +1,58 @@
+"""
+Tier Cascade
+The loop the multi-tier downloaders (X, Facebook, TikTok) run their
+download tiers through: each tier is tried in turn behind its
+dependency's circuit breaker (circuit_breaker.py) until one returns a
+result.
+
+A tier's outcome is recorded on its breaker only if the tier actually
+reached the dependency. One that bails out before making a request - a
+cookie tier with no usable cookie file, say - raises TierSkipped, and its
+breaker slot is handed back untouched, so a half-open breaker is never
+closed by a "probe" that never probed anything.
+"""
+
+import threading
+from typing import Callable, List, Optional, Sequence, Tuple
+
+from Logic.utils.circuit_breaker import get_breaker
+from Logic.utils.failure_cache import is_transient_failure
+from Logic.utils.media_result import MediaResult
+
+
+class TierSkipped(Exception):
+    """Raised by a tier that gave up without making a request."""
+
+
+def run_tiers(
+    tiers: Sequence[Tuple[str, str, Callable[[], Optional[MediaResult]]]],
+    errors: List[str],
+    log: Callable[[str], None],
+    cancel: Optional[threading.Event] = None,
+) -> Optional[MediaResult]:
+    """
+    Run (label, breaker name, tier) entries in order until one returns a
+    result. Tiers append their error messages to errors, which decide
+    whether a failed tier counts against its breaker. Returns None once
+    every tier failed or was skipped, or as soon as cancel is set.
+    """
+    for label, breaker_name, tier in tiers:
+        breaker = get_breaker(breaker_name)
+        if not breaker.allow():
+            log(f"Skipping {label} — {breaker_name} circuit is open.")
+            continue
+        log(f"Trying {label}...")
+        tier_errors_from = len(errors)
+        try:
+            result = tier()
+        except TierSkipped as e:
+            breaker.release()
+            log(f"Skipped {label} — {e}.")
+            continue
+        if cancel is not None and cancel.is_set():
+            log("Cancelled — not trying any further tiers.")
+            return None
+        breaker.record(bool(result) or not is_transient_failure(errors[tier_errors_from:]))
+        if result:
+            return result
+    return None
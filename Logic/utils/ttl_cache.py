@@ -0,0 +1,112 @@
+"""
+TTL Cache
+Small in-memory async cache with per-entry expiry, used for upstream
+metadata lookups that several handlers make for the same key within a
+few seconds of each other (e.g. an Instagram profile shown, then its
+details, then its highlights).
+
+    - positive results live for `ttl` seconds
+    - a loader returning None (or anything get_or_load's `miss` says is
+      a miss) is cached too, for `negative_ttl` seconds, so repeated
+      lookups of a missing/private target don't hit upstream
+    - a loader raising is NOT cached - the next caller simply retries
+    - concurrent misses for the same key share one in-flight load
+      (single-flight), so a burst of users asking for the same profile
+      costs one upstream request
+"""
+
+import time
+import asyncio
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+
+class TTLCache:
+    def __init__(self, ttl: float, negative_ttl: Optional[float] = None, max_entries: int = 1024) -> None:
+        self.ttl = ttl
+        self.negative_ttl = ttl if negative_ttl is None else negative_ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Cached value for key, or default if absent/expired."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return default
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            return default
+        self._entries.move_to_end(key)
+        return value
+
+    def __contains__(self, key: Hashable) -> bool:
+        sentinel = object()
+        return self.get(key, sentinel) is not sentinel
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        if ttl is None:
+            ttl = self.ttl if value is not None else self.negative_ttl
+        self._entries[key] = (time.monotonic() + ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, key: Hashable) -> None:
+        self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    async def get_or_load(
+        self,
+        key: Hashable,
+        loader: Callable[[], Awaitable[Any]],
+        miss: Optional[Callable[[Any], bool]] = None,
+    ) -> Any:
+        """
+        Return the cached value for key, or await loader() once to fill it.
+        A loaded value is kept for negative_ttl if it is None or miss(value)
+        is true, else for ttl.
+
+        Callers that arrive while a load for the same key is running wait
+        for that load instead of starting their own.
+        """
+        sentinel = object()
+        value = self.get(key, sentinel)
+        if value is not sentinel:
+            self.hits += 1
+            return value
+
+        pending = self._inflight.get(key)
+        if pending is not None:
+            self.hits += 1
+            try:
+                return await asyncio.shield(pending)
+            except asyncio.CancelledError:
+                if not pending.cancelled():
+                    raise  # we were cancelled, not the load we were waiting on
+                return await self.get_or_load(key, loader, miss)
+
+        self.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            value = await loader()
+        except BaseException as exc:
+            if isinstance(exc, asyncio.CancelledError):
+                future.cancel()
+            else:
+                future.set_exception(exc)
+                future.exception()  # mark retrieved if nobody was waiting
+            raise
+        else:
+            is_miss = value is None or (miss is not None and miss(value))
+            self.set(key, value, self.negative_ttl if is_miss else None)
+            future.set_result(value)
+            return value
+        finally:
+            self._inflight.pop(key, None)
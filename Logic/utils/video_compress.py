@@ -0,0 +1,152 @@
+"""
+Video Compress
+Re-encodes a video that is over Telegram's upload limit so it lands just
+under it, instead of the uploader turning it away as "file too large".
+
+The target bitrate follows from the duration:
+
+    video_kbps = max_bytes * 8 * SIZE_HEADROOM / duration / 1000 - AUDIO_KBPS
+
+with SIZE_HEADROOM leaving room for container overhead and the encoder's
+rate-control overshoot. The resolution is capped to what that bitrate can
+carry (RESOLUTION_STEPS) - a sharp 480p beats a smeared 1080p. A video so
+long that even MIN_VIDEO_KBPS won't fit isn't attempted at all.
+
+Encodes are expensive, so they are budgeted:
+    - COMPRESS_CONCURRENCY encodes at once across the whole bot, the rest
+      queue (a process-wide cap, like media_probe's PROBE_CONCURRENCY)
+    - COMPRESS_THREADS encoder threads each, so an encode never takes
+      every core from the event loop and the other downloads
+    - COMPRESS_TIMEOUT_S per encode, after which ffmpeg is killed
+
+The compressed copy is written to a ".compressed" folder inside the
+video's download directory, so it's cleaned up with it and a directory
+scan (pipelined uploads) never mistakes it for a new file.
+"""
+
+import os
+import asyncio
+import logging
+from typing import Optional
+
+from Logic.utils.media_probe import run_ffmpeg, probe_video
+from Logic.utils.container_header import read_video_header
+from Logic.utils.media_result import MediaItem
+
+logger = logging.getLogger(__name__)
+
+COMPRESS_CONCURRENCY = int(os.getenv("VIDEO_COMPRESS_CONCURRENCY", "1"))
+COMPRESS_THREADS = int(os.getenv("VIDEO_COMPRESS_THREADS", "2"))
+COMPRESS_TIMEOUT_S = int(os.getenv("VIDEO_COMPRESS_TIMEOUT_S", "900"))
+
+COMPRESSED_DIR = ".compressed"
+
+AUDIO_KBPS = 96
+MIN_VIDEO_KBPS = 150
+SIZE_HEADROOM = 0.92
+
+# (video kbps at least, max short side) - first match wins.
+RESOLUTION_STEPS = (
+    (2500, 1080),
+    (1200, 720),
+    (600, 480),
+    (0, 360),
+)
+
+_semaphore: Optional[asyncio.Semaphore] = None
+
+
+def _get_semaphore() -> asyncio.Semaphore:
+    global _semaphore
+    if _semaphore is None:
+        _semaphore = asyncio.Semaphore(COMPRESS_CONCURRENCY)
+    return _semaphore
+
+
+def target_video_kbps(duration_s: float, max_bytes: int) -> Optional[int]:
+    """Video bitrate that makes a duration_s clip (plus audio) fit in
+    max_bytes, or None if it would have to go below MIN_VIDEO_KBPS."""
+    if duration_s <= 0:
+        return None
+    total_kbps = max_bytes * 8 * SIZE_HEADROOM / duration_s / 1000
+    video_kbps = int(total_kbps - AUDIO_KBPS)
+    return video_kbps if video_kbps >= MIN_VIDEO_KBPS else None
+
+
+def _max_short_side(video_kbps: int) -> int:
+    for min_kbps, short_side in RESOLUTION_STEPS:
+        if video_kbps >= min_kbps:
+            return short_side
+    return RESOLUTION_STEPS[-1][1]
+
+
+def _scale_filter(short_side: int) -> str:
+    # Caps the shorter side, so portrait videos shrink the same as
+    # landscape ones; -2 keeps the aspect ratio with an even dimension.
+    return (
+        f"scale=w='if(lt(iw,ih),min(iw,{short_side}),-2)'"
+        f":h='if(lt(iw,ih),-2,min(ih,{short_side}))'"
+    )
+
+
+async def compress_video(item: MediaItem, max_bytes: int) -> Optional[MediaItem]:
+    """
+    Re-encode item to fit in max_bytes. Returns the compressed copy as a new
+    MediaItem (same duration and thumbnail), or None if the video is too
+    long to fit, ffmpeg isn't available, or the result still didn't fit.
+    """
+    duration, thumbnail = item.duration, item.thumbnail
+    if duration is None:
+        header = read_video_header(item.path)
+        if header:
+            duration = header["duration"]
+        else:
+            info = await probe_video(item.path)
+            duration, thumbnail = info["duration"], thumbnail or info["thumbnail"]
+    if not duration:
+        logger.info(f"[Compress] Unknown duration, not compressing {item.path}")
+        return None
+
+    video_kbps = target_video_kbps(duration, max_bytes)
+    if video_kbps is None:
+        logger.info(f"[Compress] {item.path} is too long ({duration}s) to fit in {max_bytes} bytes")
+        return None
+
+    out_dir = os.path.join(os.path.dirname(item.path), COMPRESSED_DIR)
+    os.makedirs(out_dir, exist_ok=True)
+    out_path = os.path.join(out_dir, os.path.splitext(os.path.basename(item.path))[0] + ".mp4")
+
+    args = [
+        "-i", item.path,
+        "-vf", _scale_filter(_max_short_side(video_kbps)),
+        "-c:v", "libx264", "-preset", "veryfast",
+        "-b:v", f"{video_kbps}k", "-maxrate", f"{video_kbps}k", "-bufsize", f"{video_kbps * 2}k",
+        "-c:a", "aac", "-b:a", f"{AUDIO_KBPS}k",
+        "-movflags", "+faststart",
+        "-threads", str(COMPRESS_THREADS),
+        "-y", out_path,
+    ]
+
+    async with _get_semaphore():
+        logger.info(f"[Compress] {item.path}: {duration}s at {video_kbps}kbps")
+        stderr = await run_ffmpeg(args, timeout=COMPRESS_TIMEOUT_S, require_success=True)
+
+    size = os.path.getsize(out_path) if os.path.exists(out_path) else 0
+    # An encode cut short leaves a file without its index (moov) - small
+    # enough, but not playable.
+    header = read_video_header(out_path) if stderr is not None and size else None
+    if header is None or size > max_bytes:
+        logger.info(f"[Compress] Could not compress {item.path} under {max_bytes} bytes (got {size})")
+        if os.path.exists(out_path):
+            os.remove(out_path)
+        return None
+
+    return MediaItem(
+        out_path,
+        "video",
+        width=header.get("width"),
+        height=header.get("height"),
+        duration=header.get("duration", duration),
+        size=size,
+        thumbnail=thumbnail,
+    )
@@ -0,0 +1,178 @@
+"""
+Video Split
+Cuts a video that is over Telegram's upload limit into parts that each
+fit, without re-encoding - the alternative to video_compress.py when the
+full quality matters more than getting a single file.
+
+Parts can only start on a keyframe when the streams are copied, so the
+cut points are planned up front from the MP4's own sample tables
+(container_header.read_mp4_keyframes): each part runs to the last
+keyframe that keeps its estimated size - the video samples in it, plus
+its share of the audio and container overhead - under the limit. One
+ffmpeg pass with the segment muxer then writes every part, cutting
+exactly on those keyframes.
+
+Containers without a readable index (WebM, fragmented MP4) are cut at
+even intervals by average bitrate with more headroom, since ffmpeg moves
+each cut forward to the next keyframe. Either way the parts are checked
+against the limit afterwards, and if any is still too big nothing is
+sent split.
+
+Parts are written to a ".parts" folder inside the video's download
+directory, so they're cleaned up with it and never picked up by a
+directory scan.
+"""
+
+import os
+import math
+import itertools
+import logging
+from typing import List, Optional
+
+from Logic.utils.media_probe import run_ffmpeg, probe_video
+from Logic.utils.container_header import read_mp4_keyframes, read_video_header
+from Logic.utils.media_result import MediaItem
+
+logger = logging.getLogger(__name__)
+
+SPLIT_TIMEOUT_S = int(os.getenv("VIDEO_SPLIT_TIMEOUT_S", "600"))
+
+PARTS_DIR = ".parts"
+
+# Share of the limit a part is planned to - from the keyframe index, and
+# from average bitrate (where the real cut lands up to a GOP later).
+INDEXED_HEADROOM = 0.95
+ESTIMATED_HEADROOM = 0.80
+
+
+def plan_keyframe_cuts(index: dict, file_size: int, max_bytes: int) -> Optional[List[float]]:
+    """
+    Cut times (seconds, each on a keyframe) that keep every part under
+    max_bytes, from a read_mp4_keyframes() index. [] if the video already
+    fits, None if a single keyframe interval is too big on its own.
+    """
+    duration = index["duration"]
+    target = max_bytes * INDEXED_HEADROOM
+    # Audio and container overhead, spread evenly over the running time.
+    other_per_s = max(file_size - index["video_bytes"], 0) / duration
+
+    def part_size(start, end):
+        return (end[1] - start[1]) + other_per_s * (end[0] - start[0])
+
+    cuts = []
+    start = index["keyframes"][0]
+    last_fit = None
+    for point in [*index["keyframes"][1:], (duration, index["video_bytes"])]:
+        if part_size(start, point) <= target:
+            last_fit = point
+            continue
+        if last_fit is None:
+            return None
+        cuts.append(last_fit[0])
+        start, last_fit = last_fit, None
+        if part_size(start, point) > target:
+            return None
+        last_fit = point
+    return cuts
+
+
+def plan_even_cuts(duration: float, file_size: int, max_bytes: int) -> List[float]:
+    """Evenly spaced cut times by average bitrate, for videos without a
+    keyframe index."""
+    parts = math.ceil(file_size / (max_bytes * ESTIMATED_HEADROOM))
+    return [duration * i / parts for i in range(1, parts)]
+
+
+async def _duration(item: MediaItem) -> Optional[float]:
+    if item.duration:
+        return item.duration
+    header = read_video_header(item.path)
+    if header:
+        return header["duration"]
+    return (await probe_video(item.path))["duration"]
+
+
+def _remove_parts(paths: List[str]):
+    for path in paths:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+async def split_video(item: MediaItem, max_bytes: int) -> Optional[List[MediaItem]]:
+    """
+    Split item into parts of at most max_bytes each, in playback order.
+    None if it can't be done: no duration, a keyframe interval bigger than
+    the limit, ffmpeg unavailable, or a part that still came out too big.
+    The first part keeps the original's thumbnail.
+    """
+    file_size = item.size or os.path.getsize(item.path)
+    index = read_mp4_keyframes(item.path)
+    if index:
+        cuts = plan_keyframe_cuts(index, file_size, max_bytes)
+        if cuts is None:
+            logger.info(f"[Split] {item.path} has a keyframe interval over {max_bytes} bytes")
+            return None
+    else:
+        duration = await _duration(item)
+        if not duration:
+            logger.info(f"[Split] Unknown duration, not splitting {item.path}")
+            return None
+        cuts = plan_even_cuts(duration, file_size, max_bytes)
+    if not cuts:
+        return None
+
+    out_dir = os.path.join(os.path.dirname(item.path), PARTS_DIR)
+    os.makedirs(out_dir, exist_ok=True)
+    stem = os.path.splitext(os.path.basename(item.path))[0]
+    # Also a %-format for ffmpeg and below, so a literal % is doubled.
+    pattern = os.path.join(out_dir, stem.replace("%", "%%") + ".%03d.mp4")
+
+    args = [
+        "-i", item.path,
+        "-map", "0:v:0", "-map", "0:a?",
+        "-c", "copy",
+        "-f", "segment",
+        # Rounded down, so a cut never lands past its keyframe.
+        "-segment_times", ",".join(f"{math.floor(t * 1000) / 1000:.3f}" for t in cuts),
+        "-segment_format", "mp4",
+        "-segment_format_options", "movflags=+faststart",
+        "-reset_timestamps", "1",
+        "-y", pattern,
+    ]
+    logger.info(f"[Split] {item.path}: {len(cuts) + 1} parts ({'keyframe index' if index else 'estimated'})")
+    stderr = await run_ffmpeg(args, timeout=SPLIT_TIMEOUT_S, require_success=True)
+
+    paths = []
+    for number in itertools.count():
+        path = pattern % number
+        if not os.path.exists(path):
+            break
+        paths.append(path)
+
+    sizes = [os.path.getsize(path) for path in paths]
+    # Cuts on the keyframe index are exact, so every planned part must be
+    # there; estimated cuts may move past each other and merge two parts.
+    complete = len(paths) == len(cuts) + 1 if index else 2 <= len(paths) <= len(cuts) + 1
+    if stderr is None or not complete or not all(0 < size <= max_bytes for size in sizes):
+        logger.info(
+            f"[Split] Could not split {item.path} into {len(cuts) + 1} parts under "
+            f"{max_bytes} bytes (got {sizes})"
+        )
+        _remove_parts(paths)
+        return None
+
+    parts = []
+    for number, (path, size) in enumerate(zip(paths, sizes)):
+        header = read_video_header(path) or {}
+        parts.append(MediaItem(
+            path,
+            "video",
+            width=header.get("width", item.width),
+            height=header.get("height", item.height),
+            duration=header.get("duration"),
+            size=size,
+            thumbnail=item.thumbnail if number == 0 else None,
+        ))
+    return parts
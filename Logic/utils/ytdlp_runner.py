@@ -0,0 +1,67 @@
+"""
+yt-dlp Impersonation Runner
+Runs the "yt-dlp with browser impersonation" last-resort tier through the
+yt-dlp Python API inside the shared worker pool (see job_engine.py),
+instead of starting a fresh `yt-dlp --impersonate chrome` CLI process
+per attempt.
+
+Same options the CLI tiers used (best video+audio, res/fps/tbr sort, mp4
+merge, no playlist); the job's worker is killed on timeout or when the
+caller's cancel Event is set, so a stuck extractor can always be
+interrupted.
+"""
+
+import os
+import threading
+from typing import Optional
+
+from Logic.utils.job_engine import get_worker_pool, JobTimeout, JobCancelled, JobError
+
+YTDLP_IMPERSONATE_TIMEOUT = 120
+
+# curl_cffi impersonation target, e.g. "chrome", "chrome-124", "safari".
+IMPERSONATE_TARGET = os.getenv("YTDLP_IMPERSONATE_TARGET", "chrome")
+
+
+def _ytdlp_impersonate_job(url: str, outtmpl: str, cookiefile: Optional[str], target: str) -> None:
+    """Runs inside a worker process - the in-process equivalent of
+    `yt-dlp --impersonate <target> -f bestvideo*+bestaudio/best ... url`."""
+    import yt_dlp
+    from yt_dlp.networking.impersonate import ImpersonateTarget
+
+    opts = {
+        "outtmpl": outtmpl,
+        "impersonate": ImpersonateTarget.from_str(target),
+        "format": "bestvideo*+bestaudio/best",
+        "format_sort": ["res", "fps", "tbr"],
+        "merge_output_format": "mp4",
+        "noplaylist": True,
+        "quiet": True,
+        "no_warnings": True,
+    }
+    if cookiefile:
+        opts["cookiefile"] = cookiefile
+
+    with yt_dlp.YoutubeDL(opts) as ydl:
+        ydl.download([url])
+
+
+def run_ytdlp_impersonated_sync(
+    url: str,
+    outtmpl: str,
+    cookiefile: Optional[str] = None,
+    timeout: float = YTDLP_IMPERSONATE_TIMEOUT,
+    cancel: Optional[threading.Event] = None,
+) -> Optional[str]:
+    """Run the job, blocking. Returns None on success, otherwise a short
+    error. Setting cancel kills the job."""
+    try:
+        get_worker_pool().run_sync(
+            _ytdlp_impersonate_job, url, outtmpl, cookiefile, IMPERSONATE_TARGET,
+            timeout=timeout, cancel=cancel,
+        )
+        return None
+    except JobTimeout:
+        return f"timed out after {timeout}s"
+    except (JobCancelled, JobError) as exc:
+        return str(exc)
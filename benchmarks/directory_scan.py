@@ -0,0 +1,126 @@
+"""
+Benchmark: listing a finished gallery download
+
+Builds a gallery directory like a gallery-dl run leaves behind - photos,
+videos with their sidecar .jpg thumbnails, and gallery-dl's .json
+metadata - and times what it takes to turn it into the list of files to
+send:
+
+    before: the downloader's own listdir + extension filter, then the
+            uploader's 16 glob() patterns, an exists() per photo and
+            video extension to spot thumbnails, and a getsize() per file
+    after:  one scan_media() - a single os.scandir() whose entries carry
+            the sizes
+
+Usage:
+    python benchmarks/directory_scan.py [--items 30] [--runs 2000]
+"""
+
+import argparse
+import glob
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from Logic.utils.media_result import scan_media  # noqa: E402
+
+LEGACY_DOWNLOADER_EXTENSIONS = (".jpg", ".jpeg", ".png", ".webp", ".mp4", ".mov", ".m4v", ".webm")
+LEGACY_UPLOADER_PATTERNS = ("*.jpg", "*.jpeg", "*.png", "*.webp", "*.mp4", "*.mov", "*.m4v", "*.mp3")
+LEGACY_VIDEO_EXTENSIONS = (".mp4", ".mov", ".m4v")
+
+
+def _make_gallery(items: int) -> str:
+    directory = tempfile.mkdtemp(prefix="scan_bench_")
+    for i in range(items):
+        stem = os.path.join(directory, f"media_{i:03d}")
+        if i % 3 == 0:
+            with open(stem + ".mp4", "wb") as f:
+                f.write(b"\0" * 4096)
+            with open(stem + ".jpg", "wb") as f:
+                f.write(b"\0" * 512)
+        else:
+            with open(stem + ".jpg", "wb") as f:
+                f.write(b"\0" * 2048)
+        with open(stem + ".json", "w") as f:
+            f.write("{}")
+    return directory
+
+
+def _legacy(directory: str) -> list:
+    # Downloader: confirm something was downloaded.
+    found = sorted(
+        os.path.join(directory, name)
+        for name in os.listdir(directory)
+        if name.lower().endswith(LEGACY_DOWNLOADER_EXTENSIONS)
+    )
+    if not found:
+        return []
+
+    # Uploader: list it again, case by case.
+    files = []
+    for pattern in LEGACY_UPLOADER_PATTERNS:
+        files.extend(glob.glob(os.path.join(directory, pattern)))
+        files.extend(glob.glob(os.path.join(directory, pattern.upper())))
+    files = sorted(set(files))
+
+    sendable = []
+    for path in files:
+        if path.lower().endswith((".jpg", ".jpeg", ".png", ".webp")):
+            base = os.path.splitext(path)[0]
+            if any(base + ext in files or os.path.exists(base + ext) for ext in LEGACY_VIDEO_EXTENSIONS):
+                continue
+        sendable.append((path, os.path.getsize(path)))
+    return sendable
+
+
+def _current(directory: str) -> list:
+    result = scan_media(directory)
+    return [(item.path, item.size) for item in result.items] if result else []
+
+
+def _time(fn, directory: str, runs: int) -> list:
+    fn(directory)  # warm the dentry cache
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        fn(directory)
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--items", type=int, default=30)
+    parser.add_argument("--runs", type=int, default=2000)
+    args = parser.parse_args()
+
+    directory = _make_gallery(args.items)
+    try:
+        legacy, current = _legacy(directory), _current(directory)
+        if [p for p, _ in legacy] != sorted(p for p, _ in current):
+            sys.exit("before and after disagree on the files to send")
+
+        scenarios = [
+            ("before (listdir+glob)", _time(_legacy, directory, args.runs)),
+            ("after (scan_media)", _time(_current, directory, args.runs)),
+        ]
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+    print(f"{args.items} items, {len(current)} to send")
+    print(f"{'scenario':<22} {'median us':>10} {'min us':>8} {'max us':>9}")
+    for name, timings in scenarios:
+        print(
+            f"{name:<22} {1e6 * statistics.median(timings):>10.1f} "
+            f"{1e6 * min(timings):>8.1f} {1e6 * max(timings):>9.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
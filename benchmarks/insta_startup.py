@@ -0,0 +1,103 @@
+"""
+Benchmark: Instagram module startup cost
+
+Times `import Logic.Social_Media_Download.insta` in fresh interpreters -
+the import index.py triggers (via instagramHandle) before the bot can
+start polling. Runs once with no Instagram credentials and once with
+credentials configured while Instagram is "slow": HTTPS traffic is sent
+through a local proxy that accepts the connection and then stalls for
+--stall-s seconds before dropping it, like a rate-limited login would.
+
+Usage:
+    python benchmarks/insta_startup.py [--runs 5] [--stall-s 5]
+"""
+
+import argparse
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+IMPORT_SNIPPET = "import Logic.Social_Media_Download.insta"
+
+
+def _start_stalling_proxy(stall_s: float):
+    server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    server.bind(("127.0.0.1", 0))
+    server.listen(16)
+
+    def _hold(conn: socket.socket) -> None:
+        time.sleep(stall_s)
+        conn.close()
+
+    def _serve() -> None:
+        while True:
+            try:
+                conn, _ = server.accept()
+            except OSError:
+                break
+            threading.Thread(target=_hold, args=(conn,), daemon=True).start()
+
+    threading.Thread(target=_serve, daemon=True).start()
+    return server
+
+
+def _time_import(env: dict, runs: int) -> list:
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(
+            [sys.executable, "-c", IMPORT_SNIPPET],
+            cwd=ROOT,
+            env=env,
+            check=True,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--stall-s", type=float, default=5.0)
+    args = parser.parse_args()
+
+    base_env = {k: v for k, v in os.environ.items() if not k.startswith("Insta_")}
+    # Keep a real session file (if any) out of the way so every run logs in.
+    base_env["Insta_session_file"] = os.path.join(tempfile.mkdtemp(), "session")
+
+    proxy = _start_stalling_proxy(args.stall_s)
+    proxy_url = f"http://127.0.0.1:{proxy.getsockname()[1]}"
+    login_env = dict(
+        base_env,
+        Insta_username="benchmark_user",
+        Insta_password="benchmark_password",
+        HTTPS_PROXY=proxy_url,
+        https_proxy=proxy_url,
+    )
+
+    # Warm the bytecode cache so the first timed run isn't penalised.
+    _time_import(base_env, 1)
+
+    scenarios = [
+        ("no credentials", _time_import(base_env, args.runs)),
+        (f"login, {args.stall_s:g}s stall", _time_import(login_env, args.runs)),
+    ]
+    proxy.close()
+
+    print(f"{'scenario':<22} {'median s':>9} {'min s':>7} {'max s':>7}")
+    for name, timings in scenarios:
+        print(f"{name:<22} {statistics.median(timings):>9.2f} {min(timings):>7.2f} {max(timings):>7.2f}")
+
+
+if __name__ == "__main__":
+    main()
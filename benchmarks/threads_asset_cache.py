@@ -0,0 +1,147 @@
+"""
+Benchmark: Threads static bundle cache (THREADS_ASSET_CACHE)
+
+Serves a local fixture page that pulls in a few large JS/CSS bundles plus
+one image, then renders it repeatedly through the real Threads browser
+manager - once with the asset cache off and once per cache mode - and
+reports how many bytes the "origin" had to serve and how long each render
+took. The fixture server plays the part of static.cdninstagram.com, so the
+cache is pointed at 127.0.0.1 for the run.
+
+Needs playwright + chromium, same as the Threads downloader itself:
+    pip install playwright
+    playwright install --with-deps chromium
+
+Usage:
+    python benchmarks/threads_asset_cache.py [--renders 10] [--bundle-mb 3]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from Logic.Social_Media_Download import threads  # noqa: E402
+
+
+FIXTURE_PAGE = """<!doctype html>
+<html>
+<head>
+  <link rel="stylesheet" href="/static/app.css">
+  <script src="/static/vendor.js"></script>
+  <script src="/static/app.js"></script>
+</head>
+<body><img src="/media/post.jpg"></body>
+</html>
+"""
+
+
+def _write_fixtures(root: str, bundle_mb: int) -> None:
+    os.makedirs(os.path.join(root, "static"), exist_ok=True)
+    os.makedirs(os.path.join(root, "media"), exist_ok=True)
+
+    with open(os.path.join(root, "index.html"), "w", encoding="utf-8") as fh:
+        fh.write(FIXTURE_PAGE)
+
+    # Comment padding stands in for minified bundle weight.
+    padding = "/*" + "x" * (bundle_mb * 1024 * 1024) + "*/\n"
+    with open(os.path.join(root, "static", "vendor.js"), "w", encoding="utf-8") as fh:
+        fh.write(padding + "window.vendor = 1;\n")
+    with open(os.path.join(root, "static", "app.js"), "w", encoding="utf-8") as fh:
+        fh.write(padding[: len(padding) // 2] + "*/\nwindow.app = 1;\n")
+    with open(os.path.join(root, "static", "app.css"), "w", encoding="utf-8") as fh:
+        fh.write(padding[: len(padding) // 4] + "*/\nbody { margin: 0; }\n")
+    with open(os.path.join(root, "media", "post.jpg"), "wb") as fh:
+        fh.write(b"\xff\xd8\xff\xe0" + os.urandom(64 * 1024))
+
+
+def _start_server(root: str):
+    counters = {"bytes": 0}
+    lock = threading.Lock()
+
+    class Handler(SimpleHTTPRequestHandler):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, directory=root, **kwargs)
+
+        def copyfile(self, source, outputfile):
+            data = source.read()
+            with lock:
+                counters["bytes"] += len(data)
+            outputfile.write(data)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, counters
+
+
+def _run(mode: str, url: str, counters: dict, renders: int, cache_dir: str) -> dict:
+    if mode == "off":
+        threads._asset_cache = None
+    else:
+        threads._asset_cache = threads._StaticAssetCache(
+            mode, directory=cache_dir, hosts=("127.0.0.1",)
+        )
+
+    manager = threads._ThreadsBrowserManager()
+    out_dir = tempfile.mkdtemp(prefix="threads_bench_out_")
+    # Warm the browser so launch cost isn't charged to the first render.
+    manager.capture(url, out_dir)
+
+    counters["bytes"] = 0
+    timings = []
+    for _ in range(renders):
+        start = time.perf_counter()
+        manager.capture(url, out_dir)
+        timings.append(time.perf_counter() - start)
+    served = counters["bytes"]
+    manager.shutdown()
+
+    cache = threads._asset_cache
+    return {
+        "mode": mode,
+        "bytes_per_render": served / renders,
+        "ms_per_render": 1000 * sum(timings) / renders,
+        "hits": cache.hits if cache else 0,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--renders", type=int, default=10)
+    parser.add_argument("--bundle-mb", type=int, default=3)
+    args = parser.parse_args()
+
+    # Page settle time is a fixed sleep, not something the cache affects.
+    threads.POST_LOAD_SETTLE_MS = 0
+
+    with tempfile.TemporaryDirectory(prefix="threads_bench_") as root:
+        _write_fixtures(root, args.bundle_mb)
+        server, counters = _start_server(root)
+        url = f"http://127.0.0.1:{server.server_address[1]}/index.html"
+
+        results = [
+            _run(mode, url, counters, args.renders, os.path.join(root, f"cache_{mode}"))
+            for mode in ("off", "memory", "disk")
+        ]
+        server.shutdown()
+
+    baseline = results[0]
+    print(f"{'mode':<8} {'KB/render':>12} {'ms/render':>10} {'saved KB':>10} {'saved ms':>9} {'hits':>6}")
+    for r in results:
+        print(
+            f"{r['mode']:<8} {r['bytes_per_render'] / 1024:>12.1f} {r['ms_per_render']:>10.1f} "
+            f"{(baseline['bytes_per_render'] - r['bytes_per_render']) / 1024:>10.1f} "
+            f"{baseline['ms_per_render'] - r['ms_per_render']:>9.1f} {r['hits']:>6}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,3 @@
-import asyncio
 from aiogram import Router, F, types
 from aiogram.filters import Command
 from aiogram.fsm.context import FSMContext
@@ -107,7 +106,6 @@ async def receive_report(message: types.Message, state: FSMContext):
                     chat_id=admin_id,
                     text=admin_message
                 )
-                await asyncio.sleep(0.1)
             except Exception as e:
                 print(f"⚠️ Failed to notify admin {admin_id}: {e}")
     
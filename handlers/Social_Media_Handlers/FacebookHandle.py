@@ -3,13 +3,12 @@ Social Media Handlers
 Module for handling Facebook
 """
 
-import os
-import asyncio
 from aiogram import Router, F, types
 from aiogram.enums import ChatAction
 
 from Logic.Social_Media_Download.facebook import download_facebook
 from Logic.utils.helpers import _delete_message_safely, _handle_download_error
+from Logic.utils.job_engine import run_cancellable
 
 from languages import get_text
 from Logic.utils.Uploader import safe_upload
@@ -35,19 +34,14 @@ async def handle_facebook(message: types.Message):
         print(f"[Facebook] Processing URL: {url}")
 
         # Download in separate thread
-        result = await asyncio.to_thread(download_facebook, url, verbose=True)
+        result = await run_cancellable(download_facebook, url, verbose=True)
 
         # Delete status message
         await _delete_message_safely(status_msg)
 
         if result:
-            path = result.get("path") if isinstance(result, dict) else result
-
-            if path and os.path.exists(path):
-                print(f"[Facebook] Upload starting for: {path}")
-                await safe_upload(message, path, lang, caption=get_text("spoon", lang))
-            else:
-                await message.answer(get_text("no_media", lang))
+            print(f"[Facebook] Upload starting for: {result.path}")
+            await safe_upload(message, result, lang, caption=get_text("spoon", lang))
         else:
             await message.answer(get_text("no_media", lang))
 
@@ -37,14 +37,12 @@ async def handle_spotify(message: types.Message):
 
         await status_msg.delete()
 
-        if result and result.get("path"):
+        if result:
             await safe_upload(
                 message,
-                path=result["path"],
+                path=result,
                 lang=lang,
                 media_type="audio",
-                title=result.get("title"),
-                performer=result.get("performer"),
             )
         else:
             await message.answer(get_text("no_media", lang))
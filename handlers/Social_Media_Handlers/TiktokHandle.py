@@ -3,13 +3,12 @@ Social Media Handlers
 Module for handling TikTok
 """
 
-import os
-import asyncio
 from aiogram import Router, F, types
 from aiogram.enums import ChatAction
 
 from Logic.Social_Media_Download.tiktok import download_tiktok
 from Logic.utils.helpers import _delete_message_safely, _handle_download_error
+from Logic.utils.job_engine import run_cancellable
 
 from languages import get_text
 from Logic.utils.Uploader import safe_upload
@@ -32,22 +31,17 @@ async def handle_tiktok(message: types.Message):
         print(f"[TikTok] Processing URL: {url}")
 
         # Download in separate thread
-        result = await asyncio.to_thread(download_tiktok, url, verbose=True)
+        result = await run_cancellable(download_tiktok, url, verbose=True)
 
         # Delete status message
         await _delete_message_safely(status_msg)
 
         if result:
-            path = result.get("path") if isinstance(result, dict) else result
+            print(f"[TikTok] Upload starting for: {result.path}")
             
-            if path and os.path.exists(path):
-                print(f"[TikTok] Upload starting for: {path}")
-                
-                # REMOVED: Button selection logic (lines 47-101)
-                # Now directly uploads video/carousel without asking user
-                await safe_upload(message, path, lang, caption=get_text("spoon", lang))
-            else:
-                await message.answer(get_text("no_media", lang))
+            # REMOVED: Button selection logic (lines 47-101)
+            # Now directly uploads video/carousel without asking user
+            await safe_upload(message, result, lang, caption=get_text("spoon", lang))
         else:
             await message.answer(get_text("no_media", lang))
 
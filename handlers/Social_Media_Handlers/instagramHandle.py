@@ -1,4 +1,6 @@
 
+from contextlib import aclosing
+
 from aiogram import Router, F, types
 from aiogram.enums import ChatAction
 from aiogram.fsm.context import FSMContext
@@ -14,16 +16,58 @@ from Logic.Social_Media_Download.insta import (
     download_insta_story,
     download_insta_post,
     download_insta_highlight,
+    iter_highlight_downloads,
     search_instagram_profile,
     get_profile_highlights,
 )
 
 from languages import get_text
-from Logic.utils.Uploader import safe_upload
+from Logic.utils.Uploader import safe_upload, send_cached_media
+from Logic.utils.story_archive import record_sent, get_sent
 
 router = Router()
 
 
+async def _send_new_stories(
+    target: types.Message,
+    username: str,
+    lang: str,
+    status_msg: types.Message = None,
+) -> bool:
+    """
+    Send the stories of @username this chat hasn't been sent yet.
+
+    If there are none but the chat got some earlier, offer to send those
+    again (by file_id). Returns False if there was nothing to offer at all.
+    """
+    chat_id = target.chat.id
+    path = await download_insta_story(username, chat_id=chat_id)
+
+    if status_msg:
+        await _delete_message_safely(status_msg)
+
+    if path:
+        await safe_upload(
+            target,
+            path,
+            lang,
+            caption=get_text("insta_stories", lang).format(username=username),
+            on_sent=lambda items, sent: record_sent(chat_id, username, items, sent),
+        )
+        return True
+
+    if await get_sent(chat_id, username):
+        builder = InlineKeyboardBuilder()
+        builder.button(text=get_text("btn_resend_stories", lang), callback_data=f"ig_story_resend_{username}")
+        await target.answer(
+            get_text("no_new_stories", lang).format(username=username),
+            reply_markup=builder.as_markup(),
+        )
+        return True
+
+    return False
+
+
 
 
 @router.message(F.text.contains("instagram.com"))
@@ -40,14 +84,7 @@ async def handle_instagram_url(message: types.Message):
             # Story
             username = url.split("/stories/")[1].split("/")[0]
             print(f"[Instagram] Downloading stories for @{username}")
-            path = await download_insta_story(username)
-
-            await _delete_message_safely(status_msg)
-            
-            if path:
-                caption = get_text("insta_stories", lang).format(username=username)
-                await safe_upload(message, path, lang, caption=caption)
-            else:
+            if not await _send_new_stories(message, username, lang, status_msg):
                 await message.answer(get_text("update", lang))
 
         elif "/reel/" in url or "/reels/" in url:
@@ -299,22 +336,35 @@ async def handle_highlight_download(callback: types.CallbackQuery, state: FSMCon
         status_msg = await callback.message.answer(get_text("downloading_highlight", lang))
         await callback.bot.send_chat_action(callback.message.chat.id, ChatAction.UPLOAD_VIDEO)
         
-        if selection == "all":
-            # Download all highlights - pass None to download all
-            print(f"[Instagram] Downloading all highlights for @{username}")
-            path = await download_insta_highlight(username, None)
+        if selection == "all" and highlights_list:
+            # Download every highlight as its own job, a few at a time, and
+            # upload each one as soon as it's done.
+            print(f"[Instagram] Downloading {len(highlights_list)} highlights for @{username}")
+            delivered = 0
             
-            await _delete_message_safely(status_msg)
+            async with aclosing(iter_highlight_downloads(username, highlights_list)) as results:
+                async for hl, path in results:
+                    if status_msg:
+                        await _delete_message_safely(status_msg)
+                        status_msg = None
+                    if not path:
+                        continue
+                    await safe_upload(
+                        callback.message,
+                        path,
+                        lang,
+                        caption=get_text("highlight_success", lang).format(title=hl["title"]),
+                    )
+                    delivered += 1
             
-            if path:
-                await safe_upload(
-                    callback.message,
-                    path,
-                    lang,
-                    caption=get_text("all_highlights_success", lang).format(count=len(highlights_list)),
-                )
-            else:
+            if status_msg:
+                await _delete_message_safely(status_msg)
+            if not delivered:
                 await callback.message.answer(get_text("no_media", lang))
+        elif selection == "all":
+            # The menu was built from an empty highlight list.
+            await _delete_message_safely(status_msg)
+            await callback.message.answer(get_text("no_highlights", lang).format(username=username))
         else:
             # Download specific highlight - convert selection to int
             highlight_id = int(selection)
@@ -365,22 +415,41 @@ async def handle_stories_download(callback: types.CallbackQuery, state: FSMConte
     try:
         print(f"[Instagram] Downloading stories for @{username}")
         
-        path = await download_insta_story(username)
-        
-        await _delete_message_safely(status_msg)
-        
-        if path:
-            await safe_upload(
-                callback.message,
-                path,
-                lang,
-                caption=get_text("insta_stories", lang).format(username=username),
-            )
-        else:
+        if not await _send_new_stories(callback.message, username, lang, status_msg):
             await callback.message.answer(get_text("no_stories", lang).format(username=username))
         
         await state.clear()
         
     except Exception as e:
         await _handle_download_error(callback, lang, e, status_msg)
-        await state.clear()
\ No newline at end of file
+        await state.clear()
+
+
+# ============================================================================
+# Instagram Stories Re-send Callback
+# ============================================================================
+
+@router.callback_query(F.data.startswith("ig_story_resend_"))
+async def handle_stories_resend(callback: types.CallbackQuery):
+    """Re-send stories this chat already received, by cached file_id."""
+    lang = callback.from_user.language_code or "en"
+    username = callback.data.split("_", 3)[3]
+    
+    await callback.answer()
+    await _delete_message_safely(callback.message)
+    
+    try:
+        items = await get_sent(callback.message.chat.id, username)
+        
+        if not items:
+            await callback.message.answer(get_text("no_active_stories", lang).format(username=username))
+            return
+        
+        await send_cached_media(
+            callback.message,
+            items,
+            caption=get_text("insta_stories", lang).format(username=username),
+        )
+        
+    except Exception as e:
+        await _handle_download_error(callback, lang, e)
\ No newline at end of file
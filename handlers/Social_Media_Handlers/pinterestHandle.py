@@ -1,5 +1,8 @@
+import hashlib
+
 from aiogram import Router, F, types
 from aiogram.enums import ChatAction
+from aiogram.utils.keyboard import InlineKeyboardBuilder
 
 from Logic.utils.helpers import _delete_message_safely, _handle_download_error
 
@@ -8,13 +11,78 @@ from Logic.Social_Media_Download.pinterest import (
     download_pinterest_board,
     download_pinterest_profile,
     classify_pinterest_url,
+    MAX_GALLERY_ITEMS,
 )
 
 from languages import get_text
-from Logic.utils.Uploader import safe_upload
+from Logic.utils.Uploader import safe_upload, pipelined_upload
+from Logic.utils.path import generate_target_dir
+from Logic.utils.ttl_cache import TTLCache
 
 router = Router()
 
+# Where each (chat, board/profile) left off, so "next 30" downloads only the
+# next slice. Keyed by a short token - callback_data is capped at 64 bytes,
+# too small for a full board URL.
+_gallery_cursors = TTLCache(ttl=6 * 60 * 60)
+
+
+def _cursor_token(chat_id: int, url: str) -> str:
+    return hashlib.sha1(f"{chat_id}:{url}".encode()).hexdigest()[:16]
+
+
+async def _send_gallery_page(
+    message: types.Message,
+    url: str,
+    content_type: str,
+    start: int,
+    lang: str,
+    status_msg: types.Message = None,
+) -> bool:
+    """
+    Download and upload one page of a board/profile, pins start..start+29.
+
+    Media groups are uploaded as soon as they've downloaded. If the page
+    was full - counting pins that failed or weren't media, not just what
+    was sent - offers a button for the next one. Returns False if the page
+    had nothing in it.
+    """
+    target_dir = generate_target_dir(f"pinterest_{content_type}")
+    page = None
+
+    async def download():
+        nonlocal page
+        if content_type == "board":
+            page = await download_pinterest_board(url, target_dir, start=start)
+        else:
+            page = await download_pinterest_profile(url, target_dir, start=start)
+        return page
+
+    sent_count = await pipelined_upload(
+        message,
+        download(),
+        target_dir,
+        lang,
+        caption=get_text("pinterest_board_success", lang),
+        status_msg=status_msg,
+    )
+    if sent_count is None:
+        return False
+
+    page_items = page.page_items if page and page.page_items is not None else sent_count
+    if page_items >= MAX_GALLERY_ITEMS:
+        token = _cursor_token(message.chat.id, url)
+        _gallery_cursors.set(token, {"url": url, "content_type": content_type, "next_start": start + MAX_GALLERY_ITEMS})
+
+        builder = InlineKeyboardBuilder()
+        builder.button(
+            text=get_text("btn_next_page", lang).format(count=MAX_GALLERY_ITEMS),
+            callback_data=f"pin_next_{token}",
+        )
+        await message.answer(get_text("pinterest_more", lang), reply_markup=builder.as_markup())
+
+    return True
+
 
 @router.message(F.text.contains("pinterest.") | F.text.contains("pin.it/"))
 async def handle_pinterest_url(message: types.Message):
@@ -31,24 +99,49 @@ async def handle_pinterest_url(message: types.Message):
         if content_type == "pin":
             print("[Pinterest] Downloading pin")
             path = await download_pinterest_pin(url)
-            success_key = "pinterest_pin_success"
 
-        elif content_type == "board":
-            print("[Pinterest] Downloading board")
-            path = await download_pinterest_board(url)
-            success_key = "pinterest_board_success"
+            await _delete_message_safely(status_msg)
 
-        else:
-            print("[Pinterest] Downloading profile")
-            path = await download_pinterest_profile(url)
-            success_key = "pinterest_board_success"
-
-        await _delete_message_safely(status_msg)
+            if path:
+                await safe_upload(message, path, lang, caption=get_text("pinterest_pin_success", lang))
+            else:
+                await message.answer(get_text("update", lang))
+            return
 
-        if path:
-            await safe_upload(message, path, lang, caption=get_text(success_key, lang))
-        else:
+        # Boards/profiles are galleries - fetched a page at a time, and each
+        # media group is uploaded as soon as it has downloaded.
+        print(f"[Pinterest] Downloading {content_type}")
+        if not await _send_gallery_page(message, url, content_type, 1, lang, status_msg):
             await message.answer(get_text("update", lang))
 
     except Exception as e:
-        await _handle_download_error(message, lang, e, status_msg)
\ No newline at end of file
+        await _handle_download_error(message, lang, e, status_msg)
+
+
+@router.callback_query(F.data.startswith("pin_next_"))
+async def handle_pinterest_next_page(callback: types.CallbackQuery):
+    """Download the next page of a board/profile."""
+    lang = callback.from_user.language_code or "en"
+    token = callback.data[len("pin_next_"):]
+
+    await callback.answer()
+    await _delete_message_safely(callback.message)
+
+    cursor = _gallery_cursors.get(token)
+    if not cursor:
+        await callback.message.answer(get_text("error_session_expired", lang))
+        return
+
+    status_msg = await callback.message.answer(get_text("uploading", lang))
+    await callback.bot.send_chat_action(callback.message.chat.id, ChatAction.UPLOAD_PHOTO)
+
+    try:
+        start = cursor["next_start"]
+        print(f"[Pinterest] Downloading {cursor['content_type']} pins {start}-{start + MAX_GALLERY_ITEMS - 1}")
+        if not await _send_gallery_page(
+            callback.message, cursor["url"], cursor["content_type"], start, lang, status_msg
+        ):
+            await callback.message.answer(get_text("pinterest_no_more", lang))
+
+    except Exception as e:
+        await _handle_download_error(callback, lang, e, status_msg)
\ No newline at end of file
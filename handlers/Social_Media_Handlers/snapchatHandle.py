@@ -3,7 +3,6 @@ Social Media Handlers
 Module for handling TikTok, Snapchat, and Instagram downloads.
 """
 
-import os
 import asyncio
 from aiogram import Router, F, types
 from aiogram.enums import ChatAction
@@ -28,12 +27,12 @@ async def handle_snapchat(message: types.Message):
         url = message.text.strip()
         print(f"[Snapchat] Processing URL: {url}")
 
-        path = await asyncio.to_thread(download_snapchat, url)
+        result = await asyncio.to_thread(download_snapchat, url)
 
         await _delete_message_safely(status_msg)
 
-        if path and os.path.exists(path):
-            await safe_upload(message, path, lang, caption=get_text("", lang))
+        if result:
+            await safe_upload(message, result, lang, caption=get_text("", lang))
         else:
             await message.answer(get_text("no_media", lang))
 
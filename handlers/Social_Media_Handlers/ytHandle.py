@@ -5,7 +5,6 @@ Supports both video and audio downloads with quality options.
 """
 
 import asyncio
-import os
 from aiogram import Router, F, types
 from aiogram.fsm.context import FSMContext
 from aiogram.enums import ChatAction
@@ -15,7 +14,7 @@ from keyboards.yt_buttons import yt_options_keyboard, yt_quality_keyboard
 
 
 from Logic.Social_Media_Download.yt import get_video_info, download_youtube
-from Logic.utils.Uploader import safe_upload
+from Logic.utils.Uploader import safe_upload, DOWNLOAD_SIZE_HINT
 
 from languages import get_text
 
@@ -146,22 +145,15 @@ async def _handle_youtube_short(
 
     try:
         result = await asyncio.to_thread(
-            download_youtube, url, quality="720", is_audio=False
+            download_youtube, url, quality="720", is_audio=False,
+            max_filesize=DOWNLOAD_SIZE_HINT,
         )
 
         await status.delete()
 
-        if result and result.get("path"):
-            video_path = result["path"]
-            
-            # Find thumbnail
-            thumbnail_path = None
-            base_name = os.path.splitext(video_path)[0]
-            for ext in ['.jpg', '.jpeg', '.png', '.webp']:
-                thumb = base_name + ext
-                if os.path.exists(thumb):
-                    thumbnail_path = thumb
-                    break
+        if result:
+            # Thumbnail yt-dlp wrote next to the video
+            thumbnail_path = result.items[0].thumbnail
             
             # Build download options keyboard
             builder = await yt_options_keyboard(lang, message)
@@ -173,7 +165,7 @@ async def _handle_youtube_short(
                 message.bot._download_data = {}
             
             message.bot._download_data[storage_key] = {
-                "video_path": video_path,
+                "result": result,
                 "title": title,
                 "url": url,
                 "lang": lang,
@@ -192,7 +184,7 @@ async def _handle_youtube_short(
                     print(f"[YouTube] Failed to send thumbnail: {e}")
                     await safe_upload(
                         message,
-                        video_path,
+                        result,
                         lang,
                         media_type="video",
                         caption=f"✅ {title}",
@@ -200,7 +192,7 @@ async def _handle_youtube_short(
             else:
                 await safe_upload(
                     message,
-                    video_path,
+                    result,
                     lang,
                     media_type="video",
                     caption=f"✅ {title}",
@@ -341,7 +333,8 @@ async def process_youtube_quality(
 
         # Download video/audio
         result = await asyncio.to_thread(
-            download_youtube, url, quality=choice, is_audio=is_audio
+            download_youtube, url, quality=choice, is_audio=is_audio,
+            max_filesize=None if is_audio else DOWNLOAD_SIZE_HINT,
         )
 
         await status_msg.delete()
@@ -358,19 +351,16 @@ async def process_youtube_quality(
             # Audio file with metadata
             await safe_upload(
                 callback.message,
-                result["path"],
+                result,
                 lang,
                 media_type="audio",
                 caption=botname,
-                title=result.get("title"),
-                performer=result.get("performer"),
-                thumbnail_url=result.get("thumb"),
             )
         else:
             # Video file
             await safe_upload(
                 callback.message,
-                result["path"],
+                result,
                 lang,
                 media_type="video",
                 caption=f"✅ {title}",
@@ -442,7 +432,7 @@ async def process_short_download(callback: types.CallbackQuery):
         await callback.message.answer(get_text("error_session", lang))
         return
     
-    video_path = short_data.get("video_path")
+    video_result = short_data.get("result")
     title = short_data.get("title", "Video")
     url = short_data.get("url")
     user_lang = short_data.get("lang", lang)
@@ -455,7 +445,7 @@ async def process_short_download(callback: types.CallbackQuery):
             # Send as video
             await safe_upload(
                 callback.message,
-                video_path,
+                video_result,
                 user_lang,
                 media_type="video",
                 caption=f"✅ {title}"
@@ -467,15 +457,13 @@ async def process_short_download(callback: types.CallbackQuery):
                 download_youtube, url, quality="720", is_audio=True
             )
             
-            if audio_result and audio_result.get("path"):
+            if audio_result:
                 await safe_upload(
                     callback.message,
-                    audio_result["path"],
+                    audio_result,
                     user_lang,
                     media_type="audio",
                     caption=botname,
-                    title=audio_result.get("title"),
-                    performer=audio_result.get("performer"),
                 )
             else:
                 await callback.message.answer(
@@ -488,12 +476,12 @@ async def process_short_download(callback: types.CallbackQuery):
                 download_youtube, url, quality="720", is_audio=True
             )
             
-            if audio_result and audio_result.get("path"):
-                from aiogram.types import FSInputFile
+            if audio_result:
+                from Logic.utils.bot_api import upload_file
                 
-                audio_path = audio_result["path"]
+                audio_path = audio_result.path
                 await callback.message.answer_voice(
-                    voice=FSInputFile(audio_path),
+                    voice=upload_file(audio_path),
                     caption=f"🎤 {title}"
                 )
             else:
@@ -1,10 +1,9 @@
 """
 Admin Control Panel Handler
 Module for managing admin operations including broadcasts, admin management,
-statistics viewing, and report handling.
+statistics viewing, report handling, and download dependency health.
 """
 
-import asyncio
 from aiogram import Router, F, types
 from aiogram.filters import Command
 from aiogram.fsm.context import FSMContext
@@ -32,6 +31,8 @@ from Logic.utils.report_tracker import (
     get_pending_count,
     get_report_count,
 )
+from Logic.utils.circuit_breaker import breaker_status_lines
+from Logic.utils.cookie_manager import cookie_status_lines
 
 # Router initialization
 router = Router()
@@ -159,19 +160,9 @@ async def receive_broadcast(message: types.Message, state: FSMContext):
             sent += 1
 
         except TelegramRetryAfter as e:
-            # Telegram is explicitly telling us how long to wait — respect it,
-            # then retry this user once before moving on.
-            print(f"⏳ Flood control hit, sleeping {e.retry_after}s")
-            await asyncio.sleep(e.retry_after)
-            try:
-                await message.bot.send_message(
-                    chat_id=user_id,
-                    text=f"{broadcast_message}"
-                )
-                sent += 1
-            except Exception as e2:
-                print(f"⚠️ Retry failed for {user_id}: {e2}")
-                failed += 1
+            # The rate limiter already waited and retried - still flooded.
+            print(f"⚠️ Flood control persisted for user {user_id}: {e}")
+            failed += 1
 
         except TelegramForbiddenError:
             # User blocked the bot / deactivated account
@@ -187,9 +178,6 @@ async def receive_broadcast(message: types.Message, state: FSMContext):
             print(f"⚠️ Unexpected error sending to user {user_id}: {e}")
             failed += 1
 
-        # Baseline delay to stay safely under bot-wide rate limits
-        await asyncio.sleep(0.15)
-
     # Optional: stop tracking users who blocked the bot so future broadcasts skip them.
     # Implement remove_user_id() in Logic/utils/user_tracker.py if you want this.
     # for uid in blocked_users:
@@ -404,6 +392,42 @@ async def report_stats_button(query: types.CallbackQuery):
     await query.message.answer(stats_text)
 
 
+@router.callback_query(F.data == "admin_breakers")
+async def breakers_button(query: types.CallbackQuery):
+    """
+    Display the circuit breaker state of every external download dependency,
+    and the health of every cookie jar.
+    
+    Shows, per dependency (TikWM mirrors, gallery-dl/yt-dlp per platform,
+    Spotify oEmbed):
+    - State: 🟢 closed, 🟡 half-open (probing), 🔴 open (being skipped)
+    - Successful / failed requests and requests skipped while open
+    
+    Shows, per cookie jar:
+    - State: 🟢 healthy, 🟡 recent auth failures, 🔴 benched
+    - Times used and recent auth failures
+    """
+    if not await _check_admin_authorization(query.from_user.id, query=query):
+        return
+    
+    # Delete the button message
+    try:
+        await query.message.delete()
+    except Exception:
+        pass
+
+    lines = breaker_status_lines()
+    cookie_lines = cookie_status_lines()
+    if not lines and not cookie_lines:
+        await query.message.answer("🔌 No dependencies used yet.")
+        return
+
+    text = "🔌 **Download Dependencies**\n\n" + ("\n".join(lines) or "None used yet.")
+    if cookie_lines:
+        text += "\n\n🍪 **Cookie Jars**\n\n" + "\n".join(cookie_lines)
+    await query.message.answer(text)
+
+
 # ============================================================================
 # Report Handlers
 # ============================================================================
@@ -483,6 +507,7 @@ async def help_menu_button(query: types.CallbackQuery):
         "📊 **View Stats** - Display bot statistics and admin list\n\n"
         "🚨 **Pending Reports** - View all pending user reports\n\n"
         "📋 **Report Stats** - View report handling statistics\n\n"
+        "🔌 **Dependencies** - Health of the external services downloads rely on\n\n"
         "💡 **Tip:** Use `/admin_menu` to open this panel anytime!"
     )
 
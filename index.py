@@ -33,8 +33,13 @@ from handlers.Commands_Handlers.test import router as test_router
 
 from handlers.adminHandle import router as admin_router
 
+from Logic.utils.bot_api import create_session, TELEGRAM_API_URL
+from Logic.utils.rate_limiter import RateLimitMiddleware
 from Logic.utils.cleanUp import cleanup_old_downloads, check_disk_space, periodic_cleanup
 from Logic.Social_Media_Download.threads import shutdown_threads_browser
+from Logic.Social_Media_Download.insta import start_instagram_client
+from Logic.Social_Media_Download.tiktok import start_tikwm_health_probes
+from Logic.utils.job_engine import get_worker_pool, shutdown_worker_pool
 
 # Bot metadata
 botname = "-@spoonDbot"
@@ -45,6 +50,7 @@ async def on_shutdown(bot: Bot):
     """
     logger.info("🛑 Bot is shutting down...")
     shutdown_threads_browser()
+    shutdown_worker_pool()
     # Optional: Final cleanup
     try:
         await cleanup_old_downloads(downloads_dir="downloads", max_age_hours=0)
@@ -76,6 +82,18 @@ async def on_startup(bot: Bot):
     # Start periodic cleanup task
     asyncio.create_task(periodic_cleanup())
     logger.info("✅ Periodic cleanup task started")
+
+    # Spawn the gallery-dl/yt-dlp worker processes in the background so the
+    # first download doesn't pay their startup + import cost.
+    asyncio.create_task(asyncio.to_thread(get_worker_pool().warm_up))
+
+    # Log in to Instagram (or load the saved session) in the background -
+    # profile lookups wait for it, bot startup doesn't.
+    start_instagram_client()
+
+    # Measure the TikWM mirrors now and every few minutes, so TikTok
+    # requests go to the fastest healthy one.
+    start_tikwm_health_probes()
     
     logger.info("🚀 Bot is ready!")
 
@@ -90,11 +108,17 @@ async def main():
         # so this must not be a module-level singleton reused across restarts.
         dp = Dispatcher()
 
-        # Initialize bot with HTML parse mode
+        # Initialize bot with HTML parse mode - against a local Bot API
+        # server if TELEGRAM_API_URL is set (see Logic/utils/bot_api.py)
         bot = Bot(
             token=os.getenv("TTOKEN"),
+            session=create_session(),
             default=DefaultBotProperties(parse_mode=ParseMode.HTML)
         )
+        if TELEGRAM_API_URL:
+            logger.info(f"🛰️ Using local Bot API server: {TELEGRAM_API_URL}")
+        # Paces every outgoing send and retries on flood control
+        bot.session.middleware(RateLimitMiddleware())
         
         # Test bot token
         bot_info = await bot.get_me()
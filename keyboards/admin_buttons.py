@@ -13,6 +13,7 @@ async def admin_menu_builder(message):
     builder.button(text="🚨 Pending Reports", callback_data="admin_reports")
     builder.button(text="📋 Report Stats", callback_data="admin_report_stats")
 
+    builder.button(text="🔌 Dependencies", callback_data="admin_breakers")
     builder.button(text="❓ Help", callback_data="admin_help_menu")
 
     builder.adjust(2)
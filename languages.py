@@ -27,7 +27,8 @@ TEXTS = {
         "fetching": "🔍 Fetching information...",
         "no_media": "❌ No media found or download failed.",
         "upload_failed": "❌ Upload failed. Please try again.",
-        "file_too_large": "⚠️ File is too large ({size}MB). Telegram limit is 50MB.",
+        "file_too_large": "⚠️ File is too large ({size}MB). Telegram limit is {limit}MB.",
+        "video_part": "🎞 Part {n}/{total}",
         "error_general": "❌ Error: {e}",
         "error_file_not_found": "❌ File not found.",
         "error_invalid": "❌ Invalid request.",
@@ -35,6 +36,8 @@ TEXTS = {
         "error_unsupported_url": "❌ Unsupported URL format.",
         "error_private_profile": "❌ This profile is private.",
         "error_session_expired": "❌ Session expired. Please try again.",
+        "pinterest_more": "📌 There's more on this board.",
+        "pinterest_no_more": "ℹ️ That's everything on this board.",
         "error_audio": "❌ Audio extraction failed.",
         
         # Success messages
@@ -79,6 +82,7 @@ TEXTS = {
         "no_bio": "No bio available",
         "no_highlights": "ℹ️ No highlights found for @{username}.",
         "no_active_stories": "ℹ️ No active stories found for @{username}.",
+        "no_new_stories": "ℹ️ No new stories from @{username} since last time.",
         "downloading_stories": "📥 Downloading stories...",
         "downloading_highlight": "📥 Downloading highlight...",
         "select_highlight": "📋 Select a highlight to download ({count} available):",
@@ -96,6 +100,8 @@ TEXTS = {
         "btn_highlights": "📚 Highlights",
         "btn_stories": "📸 Stories",
         "btn_download_all_highlights": "📥 Download All Highlights",
+        "btn_resend_stories": "🔁 Send them again",
+        "btn_next_page": "➡️ Next {count}",
         
         # Yes/No
         "yes": "Yes",
@@ -129,7 +135,8 @@ TEXTS = {
         "fetching": "🔍 جاري جلب المعلومات...",
         "no_media": "❌ لم يتم العثور على ملفات أو فشل التحميل.",
         "upload_failed": "❌ فشل الرفع. الرجاء المحاولة مرة أخرى.",
-        "file_too_large": "⚠️ الملف كبير جدًا ({size} ميجابايت). الحد الأقصى في تليجرام هو 50 ميجابايت.",
+        "file_too_large": "⚠️ الملف كبير جدًا ({size} ميجابايت). الحد الأقصى في تليجرام هو {limit} ميجابايت.",
+        "video_part": "🎞 الجزء {n}/{total}",
         "error_general": "❌ خطأ: {e}",
         "error_file_not_found": "❌ الملف غير موجود.",
         "error_invalid": "❌ طلب غير صالح.",
@@ -137,6 +144,8 @@ TEXTS = {
         "error_unsupported_url": "❌ تنسيق الرابط غير مدعوم.",
         "error_private_profile": "❌ هذا الحساب خاص.",
         "error_session_expired": "❌ انتهت الجلسة. الرجاء المحاولة مرة أخرى.",
+        "pinterest_more": "📌 يوجد المزيد في هذه اللوحة.",
+        "pinterest_no_more": "ℹ️ هذا كل ما في هذه اللوحة.",
         "error_audio": "❌ فشل استخراج الصوت.",
         
         # Success messages
@@ -181,6 +190,7 @@ TEXTS = {
         "no_bio": "لا يوجد بايو",
         "no_highlights": " لم يتم العثور على هايلايتس لـ @{username}.",
         "no_active_stories": "لم يتم العثور على ستوريات نشطة لـ @{username}.",
+        "no_new_stories": "ℹ️ لا توجد ستوريات جديدة من @{username} منذ آخر مرة.",
         "downloading_stories": "جار تحميل الستوريات...",
         "downloading_highlight": "جار تحميل الهايلايت...",
         "select_highlight": "اختر هايلايت للتحميل ({count} متاح):",
@@ -198,6 +208,8 @@ TEXTS = {
         "btn_highlights": "الهايلايت",
         "btn_stories": " الستوريات",
         "btn_download_all_highlights": " تحميل كل الهايلايت",
+        "btn_resend_stories": "🔁 إرسالها مرة أخرى",
+        "btn_next_page": "➡️ التالي {count}",
         
         # Yes/No
         "yes": "نعم",
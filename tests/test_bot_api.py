@@ -0,0 +1,122 @@
+"""
+Uploads against a fake Bot API server (Logic/utils/bot_api.py).
+
+A small aiohttp app on 127.0.0.1 stands in for Telegram and records what
+each sendVideo request carried. With TELEGRAM_API_URL set the uploader
+must pass the file as a file:// URI and allow up to 2000MB; without it
+the file's bytes must go up as a multipart upload, capped at 50MB.
+"""
+
+import asyncio
+import importlib
+from pathlib import Path
+from typing import Callable
+
+import pytest
+from aiohttp import web
+from aiogram import Bot
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
+from aiogram.types import Message
+
+from Logic.utils import bot_api, media_index
+from Logic.utils import Uploader
+from Logic.utils.media_result import MediaItem
+
+TOKEN = "42:TEST"
+VIDEO_BYTES = b"\x00\x00\x00\x18ftypmp42" + b"\x00" * 2048
+
+
+def _reload(monkeypatch, api_url):
+    if api_url:
+        monkeypatch.setenv("TELEGRAM_API_URL", api_url)
+    else:
+        monkeypatch.delenv("TELEGRAM_API_URL", raising=False)
+    importlib.reload(bot_api)
+    importlib.reload(Uploader)
+    monkeypatch.setattr(media_index, "DEDUP_ENABLED", False)
+
+
+@pytest.fixture(autouse=True)
+def restore_modules(monkeypatch):
+    yield
+    monkeypatch.delenv("TELEGRAM_API_URL", raising=False)
+    importlib.reload(bot_api)
+    importlib.reload(Uploader)
+
+
+@pytest.fixture
+def media(tmp_path):
+    video = tmp_path / "clip.mp4"
+    video.write_bytes(VIDEO_BYTES)
+    thumbnail = tmp_path / "clip.jpg"
+    thumbnail.write_bytes(b"\xff\xd8\xff\xe0" + b"\x00" * 64)
+    return MediaItem(
+        str(video), "video", width=640, height=360, duration=3, size=len(VIDEO_BYTES), thumbnail=str(thumbnail)
+    )
+
+
+async def _send_video(api_server: Callable[[str], TelegramAPIServer], item: MediaItem) -> list:
+    """Run _upload_single_file() for item against a fake server; returns
+    the "video" field of every sendVideo request it received."""
+    received = []
+
+    async def send_video(request: web.Request) -> web.Response:
+        form = await request.post()
+        video = form["video"]
+        if isinstance(video, str) and video.startswith("attach://"):
+            # aiogram puts an upload in its own multipart field
+            video = form[video[len("attach://"):]]
+        if isinstance(video, web.FileField):
+            received.append(("upload", video.filename, video.file.read()))
+        else:
+            received.append(("value", video))
+        return web.json_response({
+            "ok": True,
+            "result": {
+                "message_id": 2,
+                "date": 0,
+                "chat": {"id": 1, "type": "private"},
+                "video": {
+                    "file_id": "VIDEO", "file_unique_id": "V", "width": 640, "height": 360, "duration": 3,
+                },
+            },
+        })
+
+    app = web.Application()
+    app.router.add_post(f"/bot{TOKEN}/sendVideo", send_video)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+
+    bot = Bot(TOKEN, session=AiohttpSession(api=api_server(f"http://127.0.0.1:{port}")))
+    try:
+        message = Message.model_validate({
+            "message_id": 1, "date": 0, "chat": {"id": 1, "type": "private"},
+        }).as_(bot)
+        await Uploader._upload_single_file(message, item, "en", "video", None, None, None)
+    finally:
+        await bot.session.close()
+        await runner.cleanup()
+    return received
+
+
+def test_local_server_gets_file_uri(monkeypatch, media):
+    _reload(monkeypatch, "http://127.0.0.1:1")
+    assert Uploader.MAX_SINGLE_FILE == 2000 * 1024 * 1024
+
+    received = asyncio.run(_send_video(lambda url: TelegramAPIServer.from_base(url, is_local=True), media))
+
+    assert received == [("value", Path(media.path).resolve().as_uri())]
+
+
+def test_public_api_gets_multipart_upload(monkeypatch, media):
+    _reload(monkeypatch, None)
+    assert Uploader.MAX_SINGLE_FILE == 50 * 1024 * 1024
+    assert not isinstance(bot_api.upload_file(media.path), str)
+
+    received = asyncio.run(_send_video(TelegramAPIServer.from_base, media))
+
+    assert received == [("upload", "clip.mp4", VIDEO_BYTES)]